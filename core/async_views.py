@@ -0,0 +1,122 @@
+from abc import ABC, abstractmethod
+
+from asgiref.sync import sync_to_async
+from django.utils.translation import gettext_lazy as _
+from django.views import View
+from rest_framework.exceptions import APIException, AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+class AsyncJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication, в которой пользователь по токену читается через async ORM."""
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        # Подпись и срок действия проверяются без базы
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        try:
+            user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+        ):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
+
+
+class AsyncAPIView(ABC, View):
+    """
+    Асинхронный вариант GET синхронного DRF-представления view_class для ASGI
+    (DRF 3.14 async-представления не поддерживает). Аутентификация и выборка
+    страницы идут через async ORM; классы аутентификации, права, троттлинг,
+    запросы, фильтры, пагинация и сериализатор берутся у view_class, а ошибки
+    обрабатывает его обработчик исключений, поэтому ответ совпадает с
+    синхронным (кроме пути в ссылке next). Сериализаторы синхронные (кэш
+    карточек, подгрузка связей) и выполняются одним переходом в поток на запрос.
+    """
+    view_class = None
+    renderer = JSONRenderer()
+
+    async def get(self, request, *args, **kwargs):
+        view = self.sync_view(request)
+        try:
+            await self.aauthenticate(view.request)
+            # Согласование формата, права и троттлинг view_class в базу не ходят
+            view.initial(view.request, *args, **kwargs)
+            response = Response(await self.aget_data(view))
+        except Exception as exc:
+            # Http404 и PermissionDenied Django переводятся в ответы DRF там же
+            response = view.handle_exception(exc)
+        return self.render(response)
+
+    def sync_view(self, request):
+        view = self.view_class(args=self.args, kwargs=self.kwargs)
+        view.request = view.initialize_request(request, *self.args, **self.kwargs)
+        # JWTAuthentication из настроек заменяется вариантом с async ORM
+        view.request.authenticators = tuple(
+            AsyncJWTAuthentication() if type(authenticator) is JWTAuthentication else authenticator
+            for authenticator in view.request.authenticators
+        )
+        return view
+
+    async def aauthenticate(self, request):
+        # Как Request._authenticate; аутентификаторы без aauthenticate работают в потоке
+        for authenticator in request.authenticators:
+            authenticate = getattr(authenticator, 'aauthenticate', None) or sync_to_async(authenticator.authenticate)
+            try:
+                user_auth_tuple = await authenticate(request)
+            except APIException:
+                request._not_authenticated()
+                raise
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+        request._not_authenticated()
+
+    @abstractmethod
+    async def aget_data(self, view):
+        """Данные ответа для view - синхронного представления с готовым request."""
+
+    def render(self, response):
+        # Всегда JSON: Browsable API рисовал бы формы синхронными запросами к базе
+        response.accepted_renderer = self.renderer
+        response.accepted_media_type = self.renderer.media_type
+        response.renderer_context = {}
+        return response.render()
+
+
+class AsyncListAPIView(AsyncAPIView):
+    """Список view_class (generics.ListAPIView) курсорными страницами KeysetPagination."""
+
+    async def aget_queryset(self, view):
+        return view.filter_queryset(view.get_queryset())
+
+    async def aget_data(self, view):
+        queryset = await self.aget_queryset(view)
+        paginator = view.paginator
+        page = await paginator.apaginate_queryset(queryset, view.request, view=view)
+        data = await sync_to_async(lambda: view.get_serializer(page, many=True).data)()
+        return paginator.get_paginated_response(data).data
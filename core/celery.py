@@ -0,0 +1,69 @@
+import inspect
+import os
+from functools import wraps
+
+from celery import Celery, current_task
+from django.core.cache import cache
+from django.db import OperationalError, transaction
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+app = Celery('core')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
+
+# Повторы при временной недоступности базы или брокера/Redis
+RETRY_POLICY = {
+    'autoretry_for': (OperationalError, ConnectionError),
+    'retry_backoff': True,
+    'retry_jitter': True,
+    'max_retries': 5,
+}
+
+
+def enqueue(task, *args, **kwargs):
+    """
+    Ставит задачу в очередь после коммита текущей транзакции.
+    В eager-режиме (тесты, локальный запуск без брокера) выполняет ее сразу.
+    """
+    if app.conf.task_always_eager:
+        return task.apply(args=args, kwargs=kwargs)
+    transaction.on_commit(lambda: task.apply_async(args=args, kwargs=kwargs))
+
+
+def run_once(key_template, timeout=60 * 60 * 24, lease=60 * 5):
+    """
+    Делает задачу идемпотентной: повторная доставка с тем же ключом после
+    успешного выполнения ничего не делает. Отметка о выполнении ставится
+    только после успеха, а на время выполнения берется аренда на lease
+    секунд: параллельная доставка ждет ее повтором задачи. Если воркер
+    упал посреди задачи (acks_late), аренда истекает, и повторная
+    доставка выполнит задачу. Ключ строится из аргументов задачи:
+    run_once('likes:{interaction_id}').
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            arguments = signature.bind(*args, **kwargs).arguments
+            key = f'task-once:{func.__name__}:' + key_template.format(**arguments)
+            lease_key = f'{key}:lease'
+            if cache.get(key):
+                return None
+            if not cache.add(lease_key, True, lease):
+                # Задачу выполняет другой воркер - или упавший, чья аренда еще не истекла
+                if current_task is None or current_task.request.called_directly:
+                    return None
+                raise current_task.retry(countdown=lease)
+            try:
+                # Отметка могла появиться между проверкой и арендой
+                if cache.get(key):
+                    return None
+                result = func(*args, **kwargs)
+                cache.set(key, True, timeout)
+                return result
+            finally:
+                cache.delete(lease_key)
+        return wrapper
+    return decorator
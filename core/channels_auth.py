@@ -0,0 +1,46 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+
+
+@database_sync_to_async
+def get_user_for_token(raw_token):
+    authentication = JWTAuthentication()
+    try:
+        validated_token = authentication.get_validated_token(raw_token)
+        return authentication.get_user(validated_token)
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Аутентификация WebSocket-соединений тем же access-токеном SimpleJWT,
+    что и в REST API: ?token=<access> или заголовок Authorization: Bearer.
+    """
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        scope['user'] = AnonymousUser()
+
+        raw_token = self.get_raw_token(scope)
+        if raw_token:
+            scope['user'] = await get_user_for_token(raw_token)
+        return await super().__call__(scope, receive, send)
+
+    @staticmethod
+    def get_raw_token(scope):
+        query = parse_qs(scope.get('query_string', b'').decode())
+        if query.get('token'):
+            return query['token'][0]
+
+        headers = dict(scope.get('headers', []))
+        authorization = headers.get(b'authorization', b'').decode()
+        scheme, _, token = authorization.partition(' ')
+        if scheme == 'Bearer' and token:
+            return token
+        return None
@@ -0,0 +1,241 @@
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+
+import numpy as np
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from interactions.models import Interaction, Match
+from users.models import UserPhoto
+
+
+# Бюджет эндпоинта: максимум SQL-запросов на один запрос и p95 задержки в мс
+# (None - не проверять). Переопределяется настройкой LOAD_TEST_BUDGETS.
+Endpoint = namedtuple('Endpoint', ['method', 'name', 'max_queries', 'p95_ms', 'build'])
+EndpointResult = namedtuple('EndpointResult', ['endpoint', 'timings', 'queries', 'errors', 'elapsed'])
+
+MOCK_PASSWORD = 'password123'
+SWIPE_BATCH = 10
+SAVEPOINT_STATEMENTS = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Точки сохранения не считаются: в тестах ими становится каждый atomic
+        if not sql.lstrip().upper().startswith(SAVEPOINT_STATEMENTS):
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+class LoadClient:
+    """Имитация клиента: пользователь с JWT, запас не свайпнутых кандидатов и свой мэтч."""
+
+    def __init__(self, user, population, rng, swipes):
+        self.user = user
+        self.rng = rng
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+        sample = rng.sample(population, min(len(population), swipes * 2 + 1))
+        candidates = [user_id for user_id in sample if user_id != user.id]
+        swiped = set(
+            Interaction.objects.filter(from_user=user, to_user_id__in=candidates)
+            .values_list('to_user_id', flat=True)
+        )
+        self.targets = iter([user_id for user_id in candidates if user_id not in swiped])
+
+        # Приглашение и обмен контактами возможны только внутри мэтча
+        self.match = Match.objects.filter(memberships__user=user, memberships__is_active=True).first()
+        if self.match is None:
+            partner_id = candidates[-1]
+            self.match, _ = Match.objects.get_or_create(
+                user1_id=min(user.id, partner_id), user2_id=max(user.id, partner_id)
+            )
+        self.partner_id = self.match.user2_id if self.match.user1_id == user.id else self.match.user1_id
+
+        words = [word.strip() for word in (user.hobbies or '').split(',') if word.strip()]
+        self.search_word = words[0] if words else 'кино'
+
+    def next_target(self):
+        return next(self.targets, None)
+
+    def call(self, endpoint):
+        """Время ответа в мс, число SQL-запросов и код ответа."""
+        path, data, fmt = endpoint.build(self)
+        counter = QueryCounter()
+        started = time.perf_counter()
+        # connection свой у каждого потока - считаются только запросы этого клиента
+        with connection.execute_wrapper(counter):
+            if endpoint.method == 'GET':
+                response = self.api.get(path, data)
+            else:
+                response = getattr(self.api, endpoint.method.lower())(path, data, format=fmt)
+        return (time.perf_counter() - started) * 1000, counter.count, response.status_code
+
+
+def register(client):
+    email = f'load-{uuid.uuid4().hex}@example.com'
+    return reverse('register'), {
+        'email': email, 'first_name': 'Load', 'last_name': 'Test', 'gender': 'F', 'age': 30,
+        'city': 'Москва', 'password': 'Load-test-password-1', 'password_confirm': 'Load-test-password-1',
+    }, 'json'
+
+
+def upload_photo(client):
+    buffer = BytesIO()
+    Image.new('RGB', (800, 600), 'blue').save(buffer, 'JPEG')
+    return reverse('user-photos'), {
+        'photo': SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg'),
+    }, 'multipart'
+
+
+def set_main_photo(client):
+    photo_id = UserPhoto.objects.filter(user=client.user).values_list('id', flat=True).last()
+    return reverse('set-main-photo', args=[photo_id or 0]), {}, 'json'
+
+
+def swipe(client):
+    action = 'like' if client.rng.random() < 0.6 else 'dislike'
+    return reverse('interact'), {'to_user': client.next_target(), 'action': action}, 'json'
+
+
+def swipe_batch(client):
+    items = [
+        {'to_user': target, 'action': 'like' if client.rng.random() < 0.6 else 'dislike'}
+        for target in (client.next_target() for _ in range(SWIPE_BATCH)) if target is not None
+    ]
+    return reverse('interact-batch'), {'items': items}, 'json'
+
+
+def invite(client):
+    return reverse('date-invitations'), {
+        'to_user': client.partner_id,
+        'message': 'Кофе в субботу?',
+        'proposed_date': (timezone.now() + timedelta(days=3)).isoformat(),
+    }, 'json'
+
+
+def get(name, params=None):
+    return lambda client: (reverse(name), params(client) if params else {}, None)
+
+
+# Порядок важен: записи идут раньше списков, которые их читают
+ENDPOINTS = [
+    Endpoint('POST', 'register', 12, 1000, register),
+    Endpoint('POST', 'login', 5, 1000, lambda client: (
+        reverse('login'), {'email': client.user.email, 'password': MOCK_PASSWORD}, 'json'
+    )),
+    Endpoint('GET', 'profile', 4, 100, get('profile')),
+    Endpoint('PATCH', 'profile', 12, 150, lambda client: (
+        reverse('profile'), {'status': client.rng.choice(['looking', 'complicated'])}, 'json'
+    )),
+    Endpoint('GET', 'user-list', 4, 150, get('user-list')),
+    Endpoint('GET', 'user-list-async', 4, 150, get('user-list-async')),
+    Endpoint('GET', 'user-search', 3, 200, get('user-search', lambda client: {'q': client.search_word})),
+    Endpoint('GET', 'random-user', 15, 150, get('random-user')),
+    Endpoint('GET', 'random-user-async', 15, 150, get('random-user-async')),
+    Endpoint('GET', 'recommended-users', 8, 150, get('recommended-users')),
+    Endpoint('POST', 'user-photos', 6, 1000, upload_photo),
+    Endpoint('GET', 'user-photos', 3, 100, get('user-photos')),
+    Endpoint('PATCH', 'set-main-photo', 6, 150, set_main_photo),
+    Endpoint('GET', 'city-autocomplete', 2, 50, get('city-autocomplete', lambda client: {'q': 'мо'})),
+    Endpoint('POST', 'interact', 12, 150, swipe),
+    Endpoint('POST', 'interact-batch', 13, 250, swipe_batch),
+    Endpoint('GET', 'view-history', 3, 100, get('view-history')),
+    Endpoint('GET', 'view-history-async', 3, 100, get('view-history-async')),
+    Endpoint('GET', 'liked-users', 4, 100, get('liked-users')),
+    Endpoint('GET', 'disliked-users', 4, 100, get('disliked-users')),
+    Endpoint('GET', 'received-likes', 3, 100, get('received-likes')),
+    Endpoint('GET', 'received-likes-async', 3, 100, get('received-likes-async')),
+    Endpoint('GET', 'matches', 3, 100, get('matches')),
+    Endpoint('GET', 'matches-async', 3, 100, get('matches-async')),
+    Endpoint('POST', 'date-invitations', 5, 150, invite),
+    Endpoint('GET', 'date-invitations', 3, 100, get('date-invitations')),
+    Endpoint('POST', 'contact-exchange', 6, 100, lambda client: (
+        reverse('contact-exchange'), {'match': client.match.id, 'contact_info': '@load_test'}, 'json'
+    )),
+]
+
+
+def endpoint_label(endpoint):
+    return f'{endpoint.method} {endpoint.name}'
+
+
+def endpoint_budget(endpoint):
+    """(max_queries, p95_ms) с учетом LOAD_TEST_BUDGETS."""
+    return getattr(settings, 'LOAD_TEST_BUDGETS', {}).get(
+        endpoint_label(endpoint), (endpoint.max_queries, endpoint.p95_ms)
+    )
+
+
+def run_endpoint(endpoint, clients, requests, warmup=1):
+    """
+    Все клиенты параллельно (по потоку на клиента) шлют запросы к одному
+    эндпоинту, всего requests штук. Первые warmup запросов каждого клиента
+    не учитываются: в них прогреваются соединение, кэши и пулы.
+    """
+    counts = [requests // len(clients) + (index < requests % len(clients)) for index in range(len(clients))]
+
+    def drive(client, count):
+        results = []
+        for index in range(warmup + count):
+            result = client.call(endpoint)
+            if index >= warmup:
+                results.append(result)
+        return results
+
+    started = time.perf_counter()
+    if len(clients) == 1:
+        batches = [drive(clients[0], counts[0])]
+    else:
+        def drive_in_thread(client, count):
+            try:
+                return drive(client, count)
+            finally:
+                # У каждого потока свое соединение с базой
+                connection.close()
+
+        with ThreadPoolExecutor(len(clients)) as pool:
+            batches = list(pool.map(drive_in_thread, clients, counts))
+    elapsed = time.perf_counter() - started
+
+    results = [result for batch in batches for result in batch]
+    return EndpointResult(
+        endpoint,
+        [timing for timing, _, _ in results],
+        [queries for _, queries, _ in results],
+        [status for _, _, status in results if status >= 400],
+        elapsed,
+    )
+
+
+def percentiles(timings):
+    return np.percentile(timings, [50, 95, 99]) if timings else np.zeros(3)
+
+
+def budget_violations(result, latency_scale=1.0):
+    """Список нарушений бюджета эндпоинта; ошибки ответа тоже нарушение."""
+    max_queries, p95_ms = endpoint_budget(result.endpoint)
+    violations = []
+    if result.errors:
+        violations.append(f'{len(result.errors)} error responses ({sorted(set(result.errors))})')
+    if max_queries is not None and result.queries and max(result.queries) > max_queries:
+        violations.append(f'{max(result.queries)} queries > budget {max_queries}')
+    if p95_ms is not None and latency_scale and result.timings:
+        p95 = percentiles(result.timings)[1]
+        if p95 > p95_ms * latency_scale:
+            violations.append(f'p95 {p95:.1f} ms > budget {p95_ms * latency_scale:.0f} ms')
+    return violations
@@ -0,0 +1,31 @@
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.core.cache import cache
+
+
+# Блокировка истекает раньше, чем ее перестают ждать
+LOCK_TIMEOUT = 2
+LOCK_WAIT = 3.0
+
+
+@contextmanager
+def cache_lock(key, timeout=LOCK_TIMEOUT, wait=LOCK_WAIT):
+    """
+    Блокировка на cache.add, общая для всех процессов с одним кэшем.
+    Дает False, если ее не дождались за wait секунд; снимает ее только
+    тот, кто взял.
+    """
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + wait
+    while not cache.add(key, token, timeout):
+        if time.monotonic() >= deadline:
+            yield False
+            return
+        time.sleep(0.005)
+    try:
+        yield True
+    finally:
+        if cache.get(key) == token:
+            cache.delete(key)
@@ -0,0 +1,298 @@
+import json
+import logging
+import threading
+import time
+import weakref
+from bisect import bisect_left
+
+from django.conf import settings
+
+
+METRICS_DEFAULTS = {
+    'ENABLED': True,
+    'BACKEND': 'memory',
+    'FLUSH_INTERVAL': 5,
+    'PREFIX': 'dating',
+    'TOKEN': '',
+}
+
+# Границы корзин гистограммы задержек, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+logger = logging.getLogger('core.metrics')
+
+
+def metrics_setting(name):
+    return getattr(settings, 'METRICS', {}).get(name, METRICS_DEFAULTS[name])
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=()):
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class MemoryMetricsBackend:
+    """Итоги в памяти процесса: метрики видны только процессу, который их записал."""
+
+    def __init__(self):
+        self.values = {}
+
+    def push(self, deltas):
+        for field, delta in deltas.items():
+            self.values[field] = self.values.get(field, 0) + delta
+
+    def totals(self):
+        return dict(self.values)
+
+
+class RedisMetricsBackend:
+    """Итоги в хэше Redis: каждый процесс прибавляет свои приращения, /metrics видит сумму."""
+
+    def __init__(self):
+        import redis
+
+        self.client = redis.Redis.from_url(settings.REDIS_URL)
+        self.key = f'{metrics_setting("PREFIX")}:metrics'
+
+    def push(self, deltas):
+        pipe = self.client.pipeline(transaction=False)
+        for field, delta in deltas.items():
+            pipe.hincrbyfloat(self.key, field, delta)
+        pipe.execute()
+
+    def totals(self):
+        return {field.decode(): float(value) for field, value in self.client.hgetall(self.key).items()}
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, registry, name, documentation, labels=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *label_values, value=1):
+        values = self.registry.shard()
+        key = (self.name, label_values)
+        values[key] = values.get(key, 0) + value
+
+
+class Histogram(Metric):
+    """Счетчики по корзинам (не накопительные) и сумма наблюдений последним элементом."""
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *label_values):
+        values = self.registry.shard()
+        key = (self.name, label_values)
+        state = values.get(key)
+        if state is None:
+            state = values[key] = [0] * (len(self.buckets) + 2)
+        state[bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+
+class ThreadSentinel:
+    """Живет в threading.local потока: его сборка означает, что поток завершился."""
+
+
+def merge_values(target, values):
+    for key, value in values.items():
+        if isinstance(value, list):
+            state = target.setdefault(key, [0] * len(value))
+            for index, part in enumerate(value):
+                state[index] += part
+        else:
+            target[key] = target.get(key, 0) + value
+
+
+class MetricsRegistry:
+    """
+    Счетчики и гистограммы без блокировок на записи: каждый поток пишет в
+    свой словарь, и только он его меняет. Сброс суммирует словари всех
+    потоков и отправляет в бэкенд приращения с прошлого сброса - так
+    итоги нескольких процессов складываются в Redis. Словарь завершившегося
+    потока вливается в общий _retired: итоги не убывают, а число словарей
+    не растет с каждым потоком на запрос.
+    """
+
+    def __init__(self, backend=None):
+        self.metrics = {}
+        self.rates = {}
+        self._backend = backend
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        # RLock: словарь потока может влиться в _retired из сборщика мусора под этой же блокировкой
+        self._shards_lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._flushed = {}
+        self._flushed_at = time.monotonic()
+        self._rate_snapshots = {}
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = RedisMetricsBackend() if metrics_setting('BACKEND') == 'redis' else MemoryMetricsBackend()
+        return self._backend
+
+    def counter(self, name, documentation, labels=()):
+        self.metrics[name] = Counter(self, name, documentation, labels)
+        return self.metrics[name]
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.metrics[name] = Histogram(self, name, documentation, labels, buckets)
+        return self.metrics[name]
+
+    def rate(self, name, documentation, counter):
+        """Gauge: прирост counter в секунду с предыдущего чтения /metrics."""
+        self.rates[name] = (documentation, counter)
+
+    def shard(self):
+        values = getattr(self._local, 'values', None)
+        if values is None:
+            values = self._local.values = {}
+            # Блокировка только при первой записи потока
+            with self._shards_lock:
+                self._shards.append(values)
+            self._local.sentinel = sentinel = ThreadSentinel()
+            weakref.finalize(sentinel, self._retire, values)
+        return values
+
+    def _retire(self, values):
+        # Поток завершился и больше не пишет в свой словарь
+        with self._shards_lock:
+            # Новые объекты вместо изменения на месте: сбор, прерванный этим
+            # вызовом, досчитает по старым и не учтет словарь дважды
+            retired = {key: list(value) if isinstance(value, list) else value for key, value in self._retired.items()}
+            merge_values(retired, values)
+            self._retired = retired
+            self._shards = [shard for shard in self._shards if shard is not values]
+
+    def collect(self):
+        """Сумма по потокам в виде {поле бэкенда: значение}."""
+        totals = {}
+        # Под блокировкой словарь потока не может одновременно попасть и в _retired
+        with self._shards_lock:
+            for values in self._shards + [self._retired]:
+                # dict.copy() атомарен под GIL, поток-владелец может писать дальше
+                for (name, label_values), value in values.copy().items():
+                    parts = list(value) if isinstance(value, list) else [value]
+                    suffixes = range(len(parts)) if isinstance(value, list) else [None]
+                    for suffix, part in zip(suffixes, parts):
+                        field = json.dumps([name, list(label_values), suffix], ensure_ascii=False)
+                        totals[field] = totals.get(field, 0) + part
+        return totals
+
+    def flush(self):
+        # Параллельный сброс из другого потока отправил бы те же приращения дважды
+        if not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            current = self.collect()
+            deltas = {
+                field: value - self._flushed.get(field, 0)
+                for field, value in current.items()
+                if value != self._flushed.get(field, 0)
+            }
+            if deltas:
+                self.backend.push(deltas)
+            self._flushed = current
+            self._flushed_at = time.monotonic()
+        finally:
+            self._flush_lock.release()
+
+    def flush_due(self):
+        return time.monotonic() - self._flushed_at >= metrics_setting('FLUSH_INTERVAL')
+
+    def maybe_flush(self):
+        if not self.flush_due():
+            return
+        try:
+            self.flush()
+        except Exception:
+            # Недоступное хранилище метрик не должно ломать запросы
+            logger.exception('Metrics flush failed')
+
+    def reset(self):
+        with self._shards_lock:
+            for values in self._shards:
+                values.clear()
+            self._retired = {}
+        self._flushed = {}
+        self._rate_snapshots = {}
+        self._backend = None
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus."""
+        self.flush()
+        samples = {}
+        for field, value in self.backend.totals().items():
+            name, label_values, suffix = json.loads(field)
+            samples.setdefault(name, {}).setdefault(tuple(label_values), {})[suffix] = value
+
+        prefix = metrics_setting('PREFIX')
+        lines = []
+        for name, metric in self.metrics.items():
+            full_name = f'{prefix}_{name}'
+            lines.append(f'# HELP {full_name} {metric.documentation}')
+            lines.append(f'# TYPE {full_name} {metric.kind}')
+            for label_values, parts in sorted(samples.get(name, {}).items()):
+                if metric.kind == 'counter':
+                    lines.append(f'{full_name}{format_labels(metric.labels, label_values)} {format_value(parts[None])}')
+                    continue
+                cumulative = 0
+                bounds = [str(bound) for bound in metric.buckets] + ['+Inf']
+                for index, bound in enumerate(bounds):
+                    cumulative += parts.get(index, 0)
+                    labels = format_labels(metric.labels, label_values, [('le', bound)])
+                    lines.append(f'{full_name}_bucket{labels} {format_value(cumulative)}')
+                labels = format_labels(metric.labels, label_values)
+                total = parts.get(len(bounds), 0)
+                lines.append(f'{full_name}_sum{labels} {format_value(total)}')
+                lines.append(f'{full_name}_count{labels} {format_value(cumulative)}')
+
+        now = time.monotonic()
+        for name, (documentation, counter) in self.rates.items():
+            total = sum(parts[None] for parts in samples.get(counter.name, {}).values())
+            previous_total, previous_at = self._rate_snapshots.get(name, (total, now))
+            self._rate_snapshots[name] = (total, now)
+            rate = (total - previous_total) / (now - previous_at) if now > previous_at else 0.0
+            lines.append(f'# HELP {prefix}_{name} {documentation}')
+            lines.append(f'# TYPE {prefix}_{name} gauge')
+            lines.append(f'{prefix}_{name} {format_value(round(rate, 3))}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+
+http_requests = metrics.counter(
+    'http_requests_total', 'HTTP requests by URL name, method and status class', ('view', 'method', 'status')
+)
+http_request_duration = metrics.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by URL name', ('view',)
+)
+swipes = metrics.counter('swipes_total', 'Recorded swipes by action', ('action',))
+matches_created = metrics.counter('matches_created_total', 'Matches created by mutual likes')
+deck_misses = metrics.counter(
+    'discovery_deck_misses_total', 'Deck pops that found no prepared deck and refilled synchronously'
+)
+deck_exhausted = metrics.counter('discovery_deck_exhausted_total', 'Deck pops that returned no candidate')
+metrics.rate('swipes_per_second', 'Swipes per second since the previous scrape', swipes)
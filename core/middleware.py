@@ -0,0 +1,247 @@
+import json
+import logging
+import random
+import re
+import time
+import traceback
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+from .metrics import http_request_duration, http_requests, metrics, metrics_setting
+
+
+REQUEST_TIMING_DEFAULTS = {
+    'ENABLED': False,
+    'HEADERS': True,
+    'SLOW_REQUEST_MS': 500,
+    'SLOW_QUERY_MS': 100,
+    'DUPLICATE_THRESHOLD': 3,
+    'STACK_SAMPLE_RATE': 0.1,
+    'STACK_DEPTH': 8,
+}
+
+logger = logging.getLogger('core.request_timing')
+
+_current = ContextVar('request_timing', default=None)
+_original_serializer_data = None
+
+# Подпись запроса: без пробельного шума, списков IN и литералов
+WHITESPACE_RE = re.compile(r'\s+')
+IN_LIST_RE = re.compile(r'\bIN \((?:%s, )*%s\)', re.IGNORECASE)
+NUMBER_RE = re.compile(r'\b\d+\b')
+
+
+def request_timing_setting(name):
+    return getattr(settings, 'REQUEST_TIMING', {}).get(name, REQUEST_TIMING_DEFAULTS[name])
+
+
+@lru_cache(maxsize=2048)
+def query_signature(sql):
+    # Текст SQL от ORM повторяется, регулярные выражения - самая дорогая часть замера
+    sql = WHITESPACE_RE.sub(' ', sql).strip()
+    return NUMBER_RE.sub('?', IN_LIST_RE.sub('IN (...)', sql))
+
+
+def project_stack():
+    """Последние кадры стека из кода проекта, без Django, DRF и этого модуля."""
+    base_dir = str(settings.BASE_DIR)
+    frames = [
+        f'{frame.filename[len(base_dir) + 1:]}:{frame.lineno} in {frame.name}'
+        for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(base_dir) and 'site-packages' not in frame.filename
+        and not frame.filename.endswith('core/middleware.py')
+    ]
+    return frames[-request_timing_setting('STACK_DEPTH'):]
+
+
+class RequestTimings:
+    """
+    Замеры одного запроса. Подключается к соединениям как execute_wrapper:
+    число и время SQL, повторы одного и того же запроса (признак N+1) и
+    стеки медленных и повторяющихся запросов, если запрос попал в выборку.
+    """
+
+    def __init__(self, sample_stacks=False):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.view_ms = 0.0
+        self.db_ms = 0.0
+        self.serializer_ms = 0.0
+        self.serializer_depth = 0
+        self.queries = 0
+        self.signatures = Counter()
+        self.stacks = {}
+        self.slow_queries = []
+        self.sample_stacks = sample_stacks
+        self.duplicate_threshold = request_timing_setting('DUPLICATE_THRESHOLD')
+        self.slow_query_ms = request_timing_setting('SLOW_QUERY_MS')
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.db_ms += elapsed
+            self.queries += 1
+            signature = query_signature(sql)
+            self.signatures[signature] += 1
+            if elapsed >= self.slow_query_ms:
+                self.slow_queries.append({
+                    'sql': signature,
+                    'ms': round(elapsed, 1),
+                    'stack': project_stack() if self.sample_stacks else None,
+                })
+            # Стек берется один раз, когда запрос впервые набрал порог повторов
+            if self.sample_stacks and self.signatures[signature] == self.duplicate_threshold:
+                self.stacks[signature] = project_stack()
+
+    @property
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def duplicates(self):
+        return [
+            {'sql': signature, 'count': count, 'stack': self.stacks.get(signature)}
+            for signature, count in self.signatures.most_common()
+            if count >= self.duplicate_threshold
+        ]
+
+    def server_timing(self, total_ms):
+        metrics = [
+            f'total;dur={total_ms:.1f}',
+            f'view;dur={self.view_ms:.1f}',
+            f'db;dur={self.db_ms:.1f};desc="{self.queries} queries"',
+            f'serializer;dur={self.serializer_ms:.1f}',
+        ]
+        duplicated = sum(count for signature, count in self.signatures.items() if count >= self.duplicate_threshold)
+        if duplicated:
+            metrics.append(f'dup;desc="{duplicated} repeated queries"')
+        return ', '.join(metrics)
+
+
+def timed_serializer_data(serializer):
+    # Вложенные .data (ListSerializer -> Serializer) считаются один раз
+    timings = _current.get()
+    if timings is None or timings.serializer_depth:
+        return _original_serializer_data(serializer)
+    timings.serializer_depth += 1
+    started = time.perf_counter()
+    try:
+        return _original_serializer_data(serializer)
+    finally:
+        timings.serializer_ms += (time.perf_counter() - started) * 1000
+        timings.serializer_depth -= 1
+
+
+def install_serializer_timing():
+    """Подменяет BaseSerializer.data замером времени; только при включенном замере."""
+    global _original_serializer_data
+    if _original_serializer_data is None:
+        _original_serializer_data = BaseSerializer.data.fget
+        BaseSerializer.data = property(timed_serializer_data)
+
+
+class RequestTimingMiddleware:
+    """
+    Server-Timing (total, view, db, serializer, dup) и журнал медленных
+    запросов в логгер core.request_timing одной JSON-строкой. Выключенный
+    (REQUEST_TIMING['ENABLED']) middleware исключается из цепочки Django
+    целиком и ничего не стоит.
+    """
+
+    def __init__(self, get_response):
+        if not request_timing_setting('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        install_serializer_timing()
+
+    def __call__(self, request):
+        timings = RequestTimings(sample_stacks=random.random() < request_timing_setting('STACK_SAMPLE_RATE'))
+        token = _current.set(timings)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        if timings.view_started is not None:
+            timings.view_ms = (time.perf_counter() - timings.view_started) * 1000
+        total_ms = timings.total_ms
+        if request_timing_setting('HEADERS'):
+            response['Server-Timing'] = timings.server_timing(total_ms)
+        if total_ms >= request_timing_setting('SLOW_REQUEST_MS'):
+            self.log_slow_request(request, response, timings, total_ms)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Время представления - от вызова view до готового (отрисованного) ответа
+        timings = _current.get()
+        if timings is not None:
+            timings.view_started = time.perf_counter()
+
+    def log_slow_request(self, request, response, timings, total_ms):
+        logger.warning(json.dumps({
+            'event': 'slow_request',
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 1),
+            'view_ms': round(timings.view_ms, 1),
+            'db_ms': round(timings.db_ms, 1),
+            'serializer_ms': round(timings.serializer_ms, 1),
+            'queries': timings.queries,
+            'duplicates': timings.duplicates(),
+            'slow_queries': timings.slow_queries,
+        }, ensure_ascii=False))
+
+
+class MetricsMiddleware:
+    """
+    Число запросов и гистограмма задержек по имени URL; при METRICS['ENABLED'] = False
+    отключается. Работает и в асинхронной цепочке ASGI, не переводя async view в поток.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not metrics_setting('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.record(request, response, started)
+        metrics.maybe_flush()
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, started)
+        # Сброс в Redis - сетевой вызов, в цикле событий он идет через поток
+        if metrics.flush_due():
+            await sync_to_async(metrics.maybe_flush, thread_sensitive=False)()
+        return response
+
+    @staticmethod
+    def record(request, response, started):
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        http_requests.inc(view, request.method, f'{response.status_code // 100}xx')
+        http_request_duration.observe(time.perf_counter() - started, view)
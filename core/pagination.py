@@ -0,0 +1,218 @@
+import base64
+import json
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from operator import attrgetter, itemgetter
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def estimate_count(queryset):
+    """
+    Оценка числа строк по статистике планировщика Postgres (EXPLAIN без
+    выполнения запроса). На других базах статистики нет - считаем точно.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная пагинация по индексированным колонкам: страница выбирается
+    условием WHERE (created_at, id) < (курсор), без COUNT(*) и OFFSET.
+
+    Порядок задается атрибутом keyset_ordering у view, по умолчанию
+    ('-created_at', '-id'). Последнее поле должно быть уникальным.
+    Примерное общее число строк отдается только по запросу ?count=approx.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Неверный курсор'
+
+    def get_ordering(self, view):
+        return tuple(getattr(view, 'keyset_ordering', self.ordering))
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def encode_cursor(self, values):
+        payload = json.dumps([self._encode_value(value) for value in values])
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request, ordering):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def coerce_cursor(self, queryset, ordering, values):
+        """Значения курсора, приведенные к типам полей порядка: подделанный курсор - 404, а не 500."""
+        coerced = []
+        for field, value in zip(ordering, values):
+            try:
+                if value is None:
+                    raise ValueError(field)
+                coerced.append(self.ordering_field(queryset, field.lstrip('-')).to_python(value))
+            except (DjangoValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+        return coerced
+
+    @staticmethod
+    def ordering_field(queryset, name):
+        # Поле порядка - аннотация (matched_at, rank) или поле модели, возможно через связи
+        annotation = queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        model = queryset.model
+        *path, last = name.split('__')
+        for part in path:
+            model = model._meta.get_field(part).related_model
+        return model._meta.get_field(last)
+
+    @staticmethod
+    def _encode_value(value):
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+
+    @staticmethod
+    def keyset_filter(ordering, values):
+        # (a, b) после (x, y) <=> a > x OR (a = x AND b > y); для убывания - наоборот
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+
+        # Избыточная граница по первому полю дает планировщику диапазон индекса
+        first = ordering[0]
+        bound = 'lte' if first.startswith('-') else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{bound}': values[0]}) & condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'approx':
+            self.count = estimate_count(queryset)
+        return self.page_results(list(self.page_queryset(queryset, request, view)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """То же для асинхронных view: страница выбирается через async ORM."""
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'approx':
+            self.count = await sync_to_async(estimate_count)(queryset)
+        return self.page_results([row async for row in self.page_queryset(queryset, request, view)])
+
+    def page_queryset(self, queryset, request, view=None):
+        """Срез страницы (на одну строку больше page_size), без запроса к базе."""
+        self.request = request
+        self.ordering = self.get_ordering(view)
+        self.limit = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        values = self.decode_cursor(request, self.ordering)
+        if values is not None:
+            values = self.coerce_cursor(queryset, self.ordering, values)
+            queryset = queryset.filter(self.keyset_filter(self.ordering, values))
+        return queryset[:self.limit + 1]
+
+    def page_results(self, results):
+        self.has_next = len(results) > self.limit
+        results = results[:self.limit]
+
+        self.next_cursor = None
+        if self.has_next:
+            # Строки .values() - словари, модели - атрибуты
+            if isinstance(results[-1], dict):
+                getters = [itemgetter(field.lstrip('-')) for field in self.ordering]
+            else:
+                getters = [attrgetter(field.lstrip('-').replace('__', '.')) for field in self.ordering]
+            self.next_cursor = self.encode_cursor([getter(results[-1]) for getter in getters])
+        return results
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict([('next', self.get_next_link())])
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {
+                    'type': 'integer',
+                    'description': 'Примерное число строк, только при ?count=approx',
+                },
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Курсор следующей страницы',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Размер страницы',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.count_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'approx - вернуть примерное число строк',
+                'schema': {'type': 'string', 'enum': ['approx']},
+            },
+        ]
@@ -0,0 +1,319 @@
+import json
+import re
+from collections import namedtuple
+
+from django.db import connection
+from django.db.models.expressions import Col
+from django.db.models.lookups import Lookup
+from django.db.models.sql import Query
+from django.db.models.sql.where import OR, WhereNode
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from interactions.views import (
+    DateInvitationView, DislikedUsersListView, LikedUsersListView, MatchListView,
+    ReceivedLikesListView, ViewHistoryListView
+)
+from users.views import UserListView, UserPhotoView, UserSearchView
+
+
+# Горячий запрос: имя, view списка и функция user -> параметры запроса (или None)
+HotQuery = namedtuple('HotQuery', ['name', 'view', 'params'])
+PlanReport = namedtuple('PlanReport', ['query', 'shape', 'warnings', 'suggestions', 'execution_ms', 'buffers'])
+
+EQUALITY_LOOKUPS = {'exact', 'in', 'isnull'}
+RANGE_LOOKUPS = {'lt', 'lte', 'gt', 'gte', 'range', 'startswith'}
+# Полный просмотр маленькой таблицы дешевле индекса - не предупреждаем
+MIN_SCANNED_ROWS = 1000
+# Индекс, после которого фильтр отбрасывает больше строк, чем оставляет, - не тот
+MIN_FILTERED_ROWS = 100
+
+# Узлы, которые не меняют доступ к данным, в снимок не попадают
+PLAN_PLUMBING = {'Limit', 'Result', 'Hash', 'Materialize', 'Memoize'}
+
+SQLITE_FULL_SCAN_RE = re.compile(r'^SCAN (\w+)(?!\w| USING (?:COVERING )?INDEX)')
+
+
+def search_params(user):
+    words = [word.strip() for word in (user.hobbies or '').split(',') if word.strip()]
+    return {'q': words[0] if words else 'кино'}
+
+
+HOT_QUERIES = [
+    HotQuery('view-history', ViewHistoryListView, None),
+    HotQuery('liked-users', LikedUsersListView, None),
+    HotQuery('disliked-users', DislikedUsersListView, None),
+    HotQuery('received-likes', ReceivedLikesListView, None),
+    HotQuery('matches', MatchListView, None),
+    HotQuery('date-invitations', DateInvitationView, None),
+    HotQuery('user-photos', UserPhotoView, None),
+    HotQuery('user-list', UserListView, lambda user: {'gender': 'F', 'min_age': 25, 'max_age': 35}),
+    HotQuery('user-search', UserSearchView, search_params),
+]
+
+
+def view_queryset(hot_query, user):
+    """Первая страница view так, как ее выбирает KeysetPagination."""
+    request = APIRequestFactory().get('/', hot_query.params(user) if hot_query.params else {})
+    force_authenticate(request, user=user)
+    view = hot_query.view()
+    view.setup(request)
+    view.request = view.initialize_request(request)
+    view.format_kwarg = None
+    return view.paginator.page_queryset(view.get_queryset(), view.request, view)
+
+
+def postgres_plan(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def postgres_nodes(node, depth=0, in_subplan=False):
+    in_subplan = in_subplan or node.get('Parent Relationship') in ('SubPlan', 'InitPlan')
+    yield depth, node, in_subplan
+    for child in node.get('Plans', []):
+        yield from postgres_nodes(child, depth + 1, in_subplan)
+
+
+def postgres_shape(node, depth=0, subplans=None):
+    """
+    Форма плана для снимка: тип узла, таблица и индексы, без оценок и
+    времени. На маленьком датасете планировщик колеблется между
+    равноценными вариантами доступа по одному индексу (Index Only Scan -
+    от карты видимости, Bitmap - от физического порядка строк), поэтому
+    они записываются одним узлом, а служебные узлы опускаются. Подпланы
+    идут после основного дерева: узел, к которому их прицепил планировщик,
+    тоже случаен.
+    """
+    top = subplans is None
+    if top:
+        subplans = []
+    lines = []
+    children = []
+    for child in node.get('Plans', []):
+        if child.get('Parent Relationship') in ('SubPlan', 'InitPlan'):
+            subplans.append(child)
+        else:
+            children.append(child)
+
+    node_type = node['Node Type']
+    if node_type in PLAN_PLUMBING:
+        child_depth = depth
+    else:
+        child_depth = depth + 1
+        label = 'Index Scan' if node_type in ('Index Only Scan', 'Bitmap Heap Scan') else node_type
+        if node.get('Relation Name'):
+            label += f' on {node["Relation Name"]}'
+        if node_type == 'Bitmap Heap Scan':
+            # Индексы из Bitmap Index Scan (и BitmapOr/BitmapAnd) - в одном узле
+            indexes = [item['Index Name'] for _, item, _ in postgres_nodes(node) if item.get('Index Name')]
+            label += f' using {", ".join(dict.fromkeys(indexes))}'
+            children = []
+        elif node.get('Index Name'):
+            label += f' using {node["Index Name"]}'
+        lines.append('  ' * depth + label)
+    for child in children:
+        lines += postgres_shape(child, child_depth, subplans)
+
+    if top:
+        while subplans:
+            lines.append('SubPlan')
+            lines += postgres_shape(subplans.pop(0), 1, subplans)
+    return lines
+
+
+def explain_postgres(queryset):
+    plan = postgres_plan(queryset)
+    warnings, tables = [], set()
+    shape = postgres_shape(plan['Plan'])
+    for _, node, in_subplan in postgres_nodes(plan['Plan']):
+        if node['Node Type'] == 'Seq Scan':
+            scanned = (node['Actual Rows'] + node.get('Rows Removed by Filter', 0)) * node['Actual Loops']
+            if scanned >= MIN_SCANNED_ROWS:
+                warnings.append(f'Seq Scan on {node["Relation Name"]} ({scanned} rows)')
+                tables.add(node['Relation Name'])
+        elif node.get('Relation Name') and node.get('Rows Removed by Filter', 0) >= max(MIN_FILTERED_ROWS, node['Actual Rows']):
+            removed = node['Rows Removed by Filter'] * node['Actual Loops']
+            warnings.append(f'{node["Node Type"]} on {node["Relation Name"]} discards {removed} rows by filter')
+            tables.add(node['Relation Name'])
+        elif node['Node Type'] == 'Sort' and not in_subplan:
+            # Только сортировка страницы: подзапросы главного фото сортируют фото одного пользователя
+            warnings.append(f'Sort by {", ".join(node["Sort Key"])}')
+            tables.add(None)
+    top = plan['Plan']
+    buffers = top.get('Shared Hit Blocks', 0) + top.get('Shared Read Blocks', 0)
+    return shape, warnings, tables, plan.get('Execution Time'), buffers
+
+
+def explain_sqlite(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        rows = cursor.fetchall()
+    depths = {0: -1}
+    shape, warnings, tables = [], [], set()
+    for node_id, parent, _, detail in rows:
+        depths[node_id] = depths.get(parent, -1) + 1
+        shape.append('  ' * depths[node_id] + detail)
+        full_scan = SQLITE_FULL_SCAN_RE.match(detail)
+        if full_scan:
+            warnings.append(f'Full scan of {full_scan.group(1)}')
+            tables.add(full_scan.group(1))
+        elif detail.startswith('USE TEMP B-TREE FOR ORDER BY') and depths[node_id] == 0:
+            warnings.append('Sort in a temporary B-tree')
+            tables.add(None)
+    return shape, warnings, tables, None, None
+
+
+def where_branches(node, query, subqueries):
+    """
+    Условия WHERE как список веток (OR дает несколько веток, AND - одну):
+    {таблица: {'eq': [...], 'range': [...], 'const': {...}}}. Подзапросы
+    из id__in=... складываются в subqueries и разбираются отдельно.
+    """
+    if isinstance(node, WhereNode):
+        if node.negated:
+            return [{}]
+        child_branches = [where_branches(child, query, subqueries) for child in node.children]
+        if node.connector == OR:
+            return [branch for branches in child_branches for branch in branches]
+        merged = [{}]
+        for branches in child_branches:
+            merged = [merge_branches(left, right) for left in merged for right in branches]
+        return merged
+    if isinstance(node, Lookup) and isinstance(node.lhs, Col):
+        if isinstance(node.rhs, Query):
+            subqueries.append(node.rhs)
+        table = query.alias_map[node.lhs.alias].table_name
+        column = node.lhs.target.column
+        if node.lookup_name in EQUALITY_LOOKUPS:
+            const = {}
+            # Значение из choices или флаг - кандидат в условие частичного индекса
+            if node.lookup_name == 'exact' and (node.lhs.target.choices or isinstance(node.rhs, bool)):
+                const[column] = node.rhs
+            return [{table: {'eq': [column], 'range': [], 'const': const}}]
+        if node.lookup_name in RANGE_LOOKUPS:
+            return [{table: {'eq': [], 'range': [column], 'const': {}}}]
+    return [{}]
+
+
+def merge_branches(left, right):
+    merged = {table: {key: list(value) if isinstance(value, list) else dict(value) for key, value in parts.items()}
+              for table, parts in left.items()}
+    for table, parts in right.items():
+        target = merged.setdefault(table, {'eq': [], 'range': [], 'const': {}})
+        target['eq'] += [column for column in parts['eq'] if column not in target['eq']]
+        target['range'] += [column for column in parts['range'] if column not in target['range']]
+        target['const'].update(parts['const'])
+    return merged
+
+
+def order_columns(query):
+    """
+    [(таблица, колонка, по убыванию)] для ORDER BY по полям модели; None,
+    если порядок задает вычисляемое выражение (ранг поиска) - его индекс не даст.
+    """
+    columns = []
+    opts = query.get_meta()
+    for field_name in query.order_by:
+        descending = field_name.startswith('-')
+        name = field_name.lstrip('-')
+        if name in query.annotations:
+            annotation = query.annotations[name]
+            if not isinstance(annotation, Col):
+                return None
+            columns.append((query.alias_map[annotation.alias].table_name, annotation.target.column, descending))
+            continue
+        if name == 'pk':
+            name = opts.pk.name
+        if '__' not in name:
+            columns.append((opts.db_table, opts.get_field(name).column, descending))
+    return columns
+
+
+def existing_indexes(table):
+    """Колонки индексов таблицы с направлением: [['user_id', '-created_at'], ...]."""
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return [
+        [('-' if order == 'DESC' else '') + column for column, order in zip(info['columns'], info.get('orders') or [])]
+        or list(info['columns'])
+        for info in constraints.values()
+        if info['index'] or info['unique'] or info['primary_key']
+    ]
+
+
+def is_covered(columns, indexes):
+    # Индекс подходит, если начинается с тех же колонок в том же или обратном порядке
+    flipped = [column[1:] if column.startswith('-') else f'-{column}' for column in columns]
+    return any(index[:len(columns)] in (columns, flipped) for index in indexes)
+
+
+def suggest_indexes(query, tables, subquery=False):
+    """
+    Составные индексы для таблиц с полным просмотром или сортировкой:
+    сначала колонки равенства, затем колонки ORDER BY, затем одна колонка
+    диапазона. Равенство с константой (choices, флаг) дает частичный вариант.
+    Поиск по первичному ключу индекса не требует, уже существующий индекс
+    не предлагается.
+    """
+    suggestions = []
+    subqueries = []
+    ordering = order_columns(query)
+    if ordering is None:
+        return []
+    for branch in where_branches(query.where, query, subqueries):
+        for table, parts in branch.items():
+            sorted_here = [(column, descending) for sort_table, column, descending in ordering if sort_table == table]
+            if table not in tables and not (None in tables and sorted_here):
+                continue
+            if query.get_meta().db_table == table and query.get_meta().pk.column in parts['eq']:
+                continue
+            # Колонки с константой (action = 'like') менее селективны - после внешних ключей
+            columns = sorted(parts['eq'], key=lambda column: column in parts['const'])
+            columns += [('-' if descending else '') + column for column, descending in sorted_here if column not in columns]
+            columns += [column for column in parts['range'][:1] if column not in columns]
+            if subquery:
+                # Колонки выборки подзапроса делают индекс покрывающим (Index Only Scan)
+                columns += [
+                    col.target.column for col in query.select
+                    if isinstance(col, Col) and query.alias_map[col.alias].table_name == table
+                    and col.target.column not in columns
+                ]
+            partials = [
+                ([other for other in columns if other != column], f'WHERE {column} = {value!r}')
+                for column, value in parts['const'].items()
+            ]
+            # Условие частичного индекса интроспекция не отдает - совпадение колонок считаем покрытием
+            indexes = existing_indexes(table)
+            if is_covered(columns, indexes) or any(is_covered(partial, indexes) for partial, _ in partials):
+                continue
+            if len(columns) > 1 or sorted_here:
+                suggestions.append(f'{table} ({", ".join(columns)})')
+            for partial, condition in partials:
+                suggestions.append(f'{table} ({", ".join(partial)}) {condition}')
+    for inner in subqueries:
+        suggestions += suggest_indexes(inner, tables, subquery=True)
+    return list(dict.fromkeys(suggestions))
+
+
+def explain(hot_query, user):
+    queryset = view_queryset(hot_query, user)
+    if connection.vendor == 'postgresql':
+        shape, warnings, tables, execution_ms, buffers = explain_postgres(queryset)
+    else:
+        shape, warnings, tables, execution_ms, buffers = explain_sqlite(queryset)
+    suggestions = suggest_indexes(queryset.query, tables) if warnings else []
+    return PlanReport(hot_query, shape, warnings, suggestions, execution_ms, buffers)
+
+
+def plan_differences(expected, actual):
+    """Имена запросов, форма плана которых не совпадает со снимком."""
+    return sorted(
+        name for name in set(expected) | set(actual)
+        if expected.get(name) != actual.get(name)
+    )
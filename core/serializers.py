@@ -0,0 +1,29 @@
+from rest_framework.permissions import SAFE_METHODS
+
+
+def query_param_list(request, name):
+    if request is None:
+        return set()
+    value = request.query_params.get(name, '')
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+class SparseFieldsetMixin:
+    """
+    ?fields=id,action оставляет в ответе только перечисленные поля.
+    Действует на сериализатор верхнего уровня и только при чтении, чтобы
+    не отбрасывать поля, которые нужны для записи.
+    """
+    fields_query_param = 'fields'
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.parent is not None and self.parent is not self.root:
+            return fields
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return fields
+        requested = query_param_list(request, self.fields_query_param)
+        if not requested:
+            return fields
+        return {name: field for name, field in fields.items() if name in requested}
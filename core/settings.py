@@ -12,6 +12,7 @@ DEBUG = config('DEBUG', default=True, cast=bool)
 ALLOWED_HOSTS = ['*']
 
 INSTALLED_APPS = [
+    'daphne',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -24,6 +25,7 @@ INSTALLED_APPS = [
     'corsheaders',
     'drf_yasg',
     'django_cleanup',
+    'channels',
     
     # Local apps
     'users',
@@ -32,6 +34,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.RequestTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -61,6 +65,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'core.wsgi.application'
+ASGI_APPLICATION = 'core.asgi.application'
 
 DATABASES = {
     'default': {
@@ -73,6 +78,50 @@ DATABASES = {
     }
 }
 
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [REDIS_URL]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        }
+    }
+
+# Celery: без брокера задачи выполняются сразу в процессе (eager)
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default=REDIS_URL or 'memory://')
+CELERY_TASK_ALWAYS_EAGER = config('CELERY_TASK_ALWAYS_EAGER', default=not REDIS_URL, cast=bool)
+CELERY_TASK_EAGER_PROPAGATES = True
+CELERY_TASK_ACKS_LATE = True
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_BEAT_SCHEDULE = {
+    'flush-likes-counters': {
+        'task': 'users.tasks.flush_likes_counters_task',
+        'schedule': 10.0,
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -110,7 +159,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
@@ -126,6 +175,106 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
 }
 
+# Колода кандидатов для random-user/
+DISCOVERY_DECK = {
+    'BATCH_SIZE': config('DISCOVERY_DECK_BATCH_SIZE', default=50, cast=int),
+    'LOW_WATERMARK': config('DISCOVERY_DECK_LOW_WATERMARK', default=10, cast=int),
+    'TTL': 60 * 30,
+    'EMPTY_TTL': 60,
+    'ASYNC_REFILL': config('DISCOVERY_DECK_ASYNC_REFILL', default=True, cast=bool),
+    'MAX_SAMPLE_ROUNDS': 5,
+    'SCORING_OVERSAMPLE': 4,
+    # Доля показов из тех, кто уже лайкнул зрителя
+    'LIKED_YOU_RATIO': config('DISCOVERY_DECK_LIKED_YOU_RATIO', default=0.2, cast=float),
+    'LIKED_YOU_BATCH': 20,
+}
+
+# Сегментированные пулы кандидатов (пол × возраст × город × статус)
+CANDIDATE_POOLS = {
+    'BACKEND': 'redis' if REDIS_URL else 'memory',
+    'AGE_BUCKET': 5,
+    'REBUILD_INTERVAL': 60 * 5,
+    'BUILD_CHUNK_SIZE': 10000,
+    'SEGMENTS_TTL': 30,
+}
+
+# Счетчики лайков: популярные профили пишут прибавки в шарды,
+# которые сворачивает команда flush_likes_counters
+LIKES_COUNTER = {
+    'SHARDS': config('LIKES_COUNTER_SHARDS', default=8, cast=int),
+    'HOT_THRESHOLD': config('LIKES_COUNTER_HOT_THRESHOLD', default=1000, cast=int),
+}
+
+# Кэш отрисованных профилей и карточек пользователей
+PROFILE_CACHE = {
+    'BACKEND': 'redis' if REDIS_URL else 'memory',
+    'MAX_ENTRIES': config('PROFILE_CACHE_MAX_ENTRIES', default=10000, cast=int),
+    'TTL': 60,
+}
+
+# Полнотекстовый поиск пользователей (конфигурация tsvector в Postgres)
+USER_SEARCH = {
+    'CONFIG': config('USER_SEARCH_CONFIG', default='russian'),
+    'MAX_TERMS': 8,
+}
+
+# Совместимость по тегам хобби для порядка кандидатов в колоде
+COMPATIBILITY = {
+    'METRIC': config('COMPATIBILITY_METRIC', default='jaccard'),
+    'REBUILD_INTERVAL': 60 * 5,
+    'BUILD_CHUNK_SIZE': 10000,
+}
+
+# Заранее посчитанные рекомендации (команда rank_recommendations)
+RECOMMENDATIONS = {
+    'TOP_N': 100,
+    'CHUNK_SIZE': 500,
+    'MAX_AGE': 60 * 60 * 24,
+    'AGE_WINDOW': 10,
+    'AGE_SCALE': 5,
+    'CANDIDATE_LIMIT': 5000,
+    'WEIGHTS': {
+        'age': 1.0,
+        'city': 1.0,
+        'tags': 2.0,
+        'popularity': 0.5,
+        'reciprocal': 2.0,
+    },
+}
+
+# Замер SQL, сериализаторов и представлений: Server-Timing и журнал медленных запросов
+REQUEST_TIMING = {
+    'ENABLED': config('REQUEST_TIMING_ENABLED', default=False, cast=bool),
+    'HEADERS': config('REQUEST_TIMING_HEADERS', default=True, cast=bool),
+    'SLOW_REQUEST_MS': config('REQUEST_TIMING_SLOW_REQUEST_MS', default=500, cast=int),
+    'SLOW_QUERY_MS': 100,
+    'DUPLICATE_THRESHOLD': 3,
+    'STACK_SAMPLE_RATE': config('REQUEST_TIMING_STACK_SAMPLE_RATE', default=0.1, cast=float),
+    'STACK_DEPTH': 8,
+}
+
+# Метрики для Prometheus (/metrics/); с Redis суммируются по всем процессам.
+# Без METRICS_TOKEN эндпоинт отвечает 403
+METRICS = {
+    'ENABLED': config('METRICS_ENABLED', default=True, cast=bool),
+    'BACKEND': 'redis' if REDIS_URL else 'memory',
+    'FLUSH_INTERVAL': 5,
+    'PREFIX': 'dating',
+    'TOKEN': config('METRICS_TOKEN', default=''),
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.request_timing': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+        'core.metrics': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
 
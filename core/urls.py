@@ -3,11 +3,13 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
+from .views import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('users.urls')),
     path('api/interactions/', include('interactions.urls')),
+    path('metrics/', metrics_view, name='metrics'),
     
     # Новая документация API
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
@@ -0,0 +1,12 @@
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .metrics import metrics, metrics_setting
+
+
+def metrics_view(request):
+    # Метрики отдаются Prometheus только по Bearer-токену METRICS_TOKEN;
+    # пока токен не задан, эндпоинт закрыт
+    token = metrics_setting('TOKEN')
+    if not token or request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,29 @@
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .notifications import user_group
+
+
+class NotificationConsumer(AsyncJsonWebsocketConsumer):
+    """Пушит пользователю события о лайках, мэтчах и приглашениях вместо опроса API."""
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        self.group_name = user_group(user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        # Канал только для сервера -> клиент, кроме проверки соединения
+        if content.get('type') == 'ping':
+            await self.send_json({'type': 'pong'})
+
+    async def user_notification(self, event):
+        await self.send_json(event['payload'])
@@ -0,0 +1,94 @@
+from django.core.cache import cache
+
+from core.locks import cache_lock
+from .models import Interaction
+
+
+LIKED_YOU_TIMEOUT = 60 * 60 * 24
+LIKED_YOU_MAX_SIZE = 500
+
+
+class LikedYouIndex:
+    """
+    Входящие лайки без ответа: кто лайкнул пользователя, а он этого
+    человека еще не свайпнул. Список id в кэше от старых лайков к новым,
+    не длиннее LIKED_YOU_MAX_SIZE.
+
+    Список собирается из Interaction при первом обращении и дальше
+    поддерживается конвейером свайпов (задача update_liked_you). Как и
+    мэтч, учитывается только action='like'.
+
+    Список меняется чтением, изменением и записью, поэтому сборка и
+    изменения одного пользователя идут под блокировкой в кэше (как у
+    SeenSet); если ее не дождались, список сбрасывается и соберется из базы.
+    """
+
+    @staticmethod
+    def cache_key(user_id):
+        return f'liked-you:{user_id}'
+
+    @classmethod
+    def get(cls, user_id):
+        liker_ids = cache.get(cls.cache_key(user_id))
+        if liker_ids is None:
+            liker_ids = cls.build(user_id)
+        return liker_ids
+
+    @classmethod
+    def lock(cls, user_id):
+        return cache_lock(f'{cls.cache_key(user_id)}:lock')
+
+    @classmethod
+    def build(cls, user_id):
+        with cls.lock(user_id) as locked:
+            liker_ids = cls.load(user_id)
+            if locked:
+                cache.set(cls.cache_key(user_id), liker_ids, LIKED_YOU_TIMEOUT)
+            return liker_ids
+
+    @staticmethod
+    def load(user_id):
+        answered = Interaction.objects.filter(from_user_id=user_id).values('to_user_id')
+        liker_ids = list(
+            Interaction.objects.filter(to_user_id=user_id, action='like')
+            .exclude(from_user_id__in=answered)
+            .order_by('-created_at', '-id')
+            .values_list('from_user_id', flat=True)[:LIKED_YOU_MAX_SIZE]
+        )
+        liker_ids.reverse()
+        return liker_ids
+
+    @classmethod
+    def add(cls, user_id, liker_id):
+        with cls.lock(user_id) as locked:
+            if not locked:
+                cls.invalidate(user_id)
+                return
+            # Если список еще не собран, он загрузит новый лайк из базы сам
+            liker_ids = cache.get(cls.cache_key(user_id))
+            if liker_ids is None or liker_id in liker_ids:
+                return
+            liker_ids.append(liker_id)
+            cache.set(cls.cache_key(user_id), liker_ids[-LIKED_YOU_MAX_SIZE:], LIKED_YOU_TIMEOUT)
+
+    @classmethod
+    def remove(cls, user_id, answered_ids):
+        answered_ids = set(answered_ids)
+        if not answered_ids:
+            return
+        with cls.lock(user_id) as locked:
+            if not locked:
+                cls.invalidate(user_id)
+                return
+            liker_ids = cache.get(cls.cache_key(user_id))
+            if liker_ids is None or not answered_ids & set(liker_ids):
+                return
+            cache.set(
+                cls.cache_key(user_id),
+                [liker_id for liker_id in liker_ids if liker_id not in answered_ids],
+                LIKED_YOU_TIMEOUT
+            )
+
+    @classmethod
+    def invalidate(cls, user_id):
+        cache.delete(cls.cache_key(user_id))
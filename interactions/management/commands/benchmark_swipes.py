@@ -0,0 +1,96 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from interactions.models import Interaction, Match
+from interactions.services import record_swipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Compare per-swipe latency of the legacy ORM flow and the single-statement swipe pipeline'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200, help='Number of temporary users')
+        parser.add_argument('--swipes', type=int, default=2000, help='Swipes per implementation')
+        parser.add_argument('--seed', type=int, default=42)
+    
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        
+        # Все данные бенчмарка живут в одной транзакции и откатываются в конце
+        with transaction.atomic():
+            users = self.create_users(options['users'])
+            pairs = [(a, b) for a in users for b in users if a.id != b.id]
+            rng.shuffle(pairs)
+            swipes = options['swipes']
+            if 2 * swipes > len(pairs):
+                swipes = len(pairs) // 2
+                self.stdout.write(f'Not enough user pairs, running {swipes} swipes each')
+            
+            legacy = self.measure(self.legacy_swipe, pairs[:swipes], rng)
+            pipeline = self.measure(self.pipeline_swipe, pairs[swipes:2 * swipes], rng)
+            transaction.set_rollback(True)
+        
+        self.stdout.write(f'Database: {connection.vendor}, swipes per run: {swipes}')
+        self.report('legacy ORM flow', legacy)
+        self.report('swipe pipeline', pipeline)
+        self.stdout.write(self.style.SUCCESS(
+            f'Speedup (mean): {statistics.mean(legacy) / statistics.mean(pipeline):.2f}x'
+        ))
+    
+    def create_users(self, count):
+        suffix = int(time.time() * 1000)
+        User.objects.bulk_create([
+            User(
+                username=f'bench-{suffix}-{i}',
+                email=f'bench-{suffix}-{i}@bench.local',
+                first_name='Bench',
+                last_name=str(i),
+                gender='M' if i % 2 else 'F',
+                age=30,
+                city='Bench',
+            )
+            for i in range(count)
+        ])
+        return list(User.objects.filter(username__startswith=f'bench-{suffix}-'))
+    
+    def measure(self, swipe, pairs, rng):
+        timings = []
+        for from_user, to_user in pairs:
+            action = 'like' if rng.random() < 0.7 else 'dislike'
+            started = time.perf_counter()
+            swipe(from_user, to_user, action)
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+    
+    def legacy_swipe(self, from_user, to_user, action):
+        # Прежняя реализация InteractionView.perform_create
+        with transaction.atomic():
+            interaction = Interaction.objects.create(from_user=from_user, to_user=to_user, action=action)
+            if interaction.action == 'like':
+                interaction.to_user.likes_count += 1
+                interaction.to_user.save()
+            mutual_like = Interaction.objects.filter(
+                from_user=interaction.to_user,
+                to_user=interaction.from_user,
+                action='like'
+            ).exists()
+            if mutual_like and interaction.action == 'like':
+                Match.objects.get_or_create(
+                    user1=min(interaction.from_user, interaction.to_user, key=lambda u: u.id),
+                    user2=max(interaction.from_user, interaction.to_user, key=lambda u: u.id)
+                )
+    
+    def pipeline_swipe(self, from_user, to_user, action):
+        record_swipe(from_user, to_user, action)
+    
+    def report(self, label, timings):
+        ordered = sorted(timings)
+        p95 = ordered[int(len(ordered) * 0.95) - 1]
+        self.stdout.write(
+            f'{label:>16}: mean {statistics.mean(timings):.3f} ms, '
+            f'p50 {statistics.median(timings):.3f} ms, p95 {p95:.3f} ms'
+        )
@@ -0,0 +1,118 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import override_settings
+from core.celery import app
+from interactions.liked_you import LikedYouIndex
+from interactions.seen import SeenSet
+from interactions.services import record_swipe
+from users.cities import resolve_city
+from users.discovery import DiscoveryDeck
+from users.models import User
+from users.pools import candidate_pools
+
+
+class Command(BaseCommand):
+    help = 'Simulate swiping on generated users and compare match rate per swipe for liked-you deck ratios'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=300, help='Number of temporary users')
+        parser.add_argument('--swipes', type=int, default=3000, help='Swipes per simulated run')
+        parser.add_argument('--ratios', default='0,0.2,0.4', help='Comma-separated LIKED_YOU_RATIO values')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        ratios = [float(ratio) for ratio in options['ratios'].split(',')]
+        # Побочные эффекты свайпа (индекс лайкнувших, SeenSet) нужны сразу,
+        # а при откате транзакции on_commit не сработал бы
+        eager = app.conf.task_always_eager
+        app.conf.task_always_eager = True
+        users = []
+        try:
+            # Все данные живут в одной транзакции и откатываются в конце
+            with transaction.atomic():
+                users, city = self.create_users(options['users'])
+                attractiveness, selectivity = self.make_preferences(users, options['seed'])
+                self.stdout.write(
+                    f'Database: {connection.vendor}, users: {len(users)}, swipes per run: {options["swipes"]}'
+                )
+                for ratio in ratios:
+                    # Каждый прогон начинается с одного и того же состояния
+                    with transaction.atomic():
+                        swipes, matches, elapsed = self.simulate(
+                            users, city, ratio, options['swipes'], options['seed'],
+                            attractiveness, selectivity
+                        )
+                        transaction.set_rollback(True)
+                    self.clear_state(users)
+                    self.stdout.write(
+                        f'ratio {ratio:.2f}: {swipes} swipes, {matches} matches, '
+                        f'match rate {matches / max(swipes, 1):.3f} per swipe, {elapsed:.1f} s'
+                    )
+                transaction.set_rollback(True)
+        finally:
+            app.conf.task_always_eager = eager
+            for user in users:
+                candidate_pools.remove(user.id)
+
+    def create_users(self, count):
+        suffix = int(time.time() * 1000)
+        city = resolve_city(f'Evaluation {suffix}')
+        User.objects.bulk_create([
+            User(
+                username=f'eval-{suffix}-{i}',
+                email=f'eval-{suffix}-{i}@bench.local',
+                first_name='Eval',
+                last_name=str(i),
+                gender='M' if i % 2 else 'F',
+                age=25 + i % 10,
+                city=city.name,
+                city_ref=city,
+            )
+            for i in range(count)
+        ])
+        users = list(User.objects.filter(username__startswith=f'eval-{suffix}-').select_related('city_ref'))
+        candidate_pools.ensure_built()
+        for user in users:
+            candidate_pools.update(user)
+        return users, city
+
+    def make_preferences(self, users, seed):
+        # Привлекательность профиля и разборчивость того, кто свайпает
+        rng = random.Random(seed)
+        attractiveness = {user.id: rng.betavariate(2, 5) for user in users}
+        selectivity = {user.id: rng.uniform(0.5, 1.5) for user in users}
+        return attractiveness, selectivity
+
+    def likes(self, viewer_id, candidate_id, seed, attractiveness, selectivity):
+        # Решение по паре не зависит от прогона - прогоны различаются только колодой
+        roll = random.Random(f'{seed}:{viewer_id}:{candidate_id}').random()
+        return roll < min(1.0, attractiveness[candidate_id] * selectivity[viewer_id] * 1.5)
+
+    def simulate(self, users, city, ratio, swipe_count, seed, attractiveness, selectivity):
+        rng = random.Random(seed)
+        swipes = matches = 0
+        started = time.perf_counter()
+        with override_settings(DISCOVERY_DECK={
+            'BATCH_SIZE': 20, 'LOW_WATERMARK': 5, 'ASYNC_REFILL': False, 'LIKED_YOU_RATIO': ratio,
+        }):
+            for _ in range(swipe_count):
+                viewer = rng.choice(users)
+                # Колода с фильтром по городу - только сгенерированные пользователи
+                candidate = DiscoveryDeck(viewer.id, {'city': city.name}).pop()
+                if candidate is None:
+                    continue
+                liked = self.likes(viewer.id, candidate.id, seed, attractiveness, selectivity)
+                result = record_swipe(viewer, candidate, 'like' if liked else 'dislike')
+                swipes += 1
+                matches += result.match_created
+        return swipes, matches, time.perf_counter() - started
+
+    def clear_state(self, users):
+        # Колоды, SeenSet и индекс лайкнувших ссылаются на откаченные свайпы
+        for user in users:
+            SeenSet.invalidate(user.id)
+            LikedYouIndex.invalidate(user.id)
+            DiscoveryDeck(user.id, {'city': user.city}).clear()
@@ -0,0 +1,110 @@
+from django.db import connection
+from django.utils import timezone
+
+from .models import Match, MatchMembership
+
+
+# Обе строки участников для мэтчей из диапазона id
+MEMBERSHIPS_SQL = '''
+    INSERT INTO {memberships} (user_id, partner_id, match_id, is_active, created_at)
+    SELECT user1_id, user2_id, id, is_active, created_at FROM {matches} WHERE id BETWEEN %s AND %s
+    UNION ALL
+    SELECT user2_id, user1_id, id, is_active, created_at FROM {matches} WHERE id BETWEEN %s AND %s
+    ON CONFLICT (user_id, partner_id) DO NOTHING
+'''
+
+# Мэтчи пользователя с партнерами и строки их участников одним выражением
+CREATE_MATCHES_SQL = '''
+    WITH matched AS (
+        INSERT INTO {matches} (user1_id, user2_id, created_at, is_active)
+        SELECT LEAST(%(user)s, partner_id), GREATEST(%(user)s, partner_id), %(now)s, TRUE
+        FROM unnest(%(partners)s::bigint[]) AS partner_id
+        ON CONFLICT (user1_id, user2_id) DO NOTHING
+        RETURNING id, user1_id, user2_id
+    ), members AS (
+        INSERT INTO {memberships} (user_id, partner_id, match_id, is_active, created_at)
+        SELECT pair.user_id, pair.partner_id, matched.id, TRUE, %(now)s
+        FROM matched
+        CROSS JOIN LATERAL (VALUES (user1_id, user2_id), (user2_id, user1_id)) AS pair (user_id, partner_id)
+        ON CONFLICT (user_id, partner_id) DO NOTHING
+    )
+    SELECT id, user1_id, user2_id FROM matched
+'''
+
+
+def membership_rows(match):
+    return [
+        MatchMembership(
+            user_id=user_id, partner_id=partner_id, match_id=match.id,
+            is_active=match.is_active, created_at=match.created_at
+        )
+        for user_id, partner_id in ((match.user1_id, match.user2_id), (match.user2_id, match.user1_id))
+    ]
+
+
+def sync_match_memberships(matches):
+    """Создает недостающие строки участников и копирует в них is_active и created_at мэтчей."""
+    rows = [row for match in matches for row in membership_rows(match)]
+    if rows:
+        MatchMembership.objects.bulk_create(
+            rows, update_conflicts=True,
+            unique_fields=['user', 'partner'], update_fields=['match', 'is_active', 'created_at']
+        )
+
+
+def backfill_match_memberships(first_id, last_id, chunk_size=50000):
+    """Строки участников для мэтчей с id из [first_id, last_id], по выражению на пачку."""
+    sql = MEMBERSHIPS_SQL.format(memberships=MatchMembership._meta.db_table, matches=Match._meta.db_table)
+    created = 0
+    for start in range(first_id, last_id + 1, chunk_size):
+        end = min(start + chunk_size - 1, last_id)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [start, end, start, end])
+            created += cursor.rowcount
+    return created
+
+
+def matches_with(user, partner_ids):
+    """{partner_id: match_id} для мэтчей пользователя с partner_ids, активных и нет."""
+    return dict(
+        MatchMembership.objects.filter(user=user, partner_id__in=list(partner_ids))
+        .values_list('partner_id', 'match_id')
+    )
+
+
+def create_matches(user, partner_ids):
+    """
+    Создает мэтчи пользователя с partner_ids (пары без мэтча) вместе со
+    строками участников. Возвращает {partner_id: match_id}; на Postgres пары,
+    мэтч которых успел создать параллельный запрос, в ответ не попадают.
+    """
+    if not partner_ids:
+        return {}
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(CREATE_MATCHES_SQL.format(
+                matches=Match._meta.db_table,
+                memberships=MatchMembership._meta.db_table,
+            ), {'user': user.id, 'partners': list(partner_ids), 'now': timezone.now()})
+            matches = cursor.fetchall()
+    else:
+        Match.objects.bulk_create([
+            Match(user1_id=min(user.id, partner_id), user2_id=max(user.id, partner_id))
+            for partner_id in partner_ids
+        ], ignore_conflicts=True)
+        # С ignore_conflicts bulk_create не возвращает id. Пары упорядочены
+        # (user1 < user2): хватает одного диапазона уникального индекса по
+        # спискам user1 и user2, лишние пары отсекаются ниже
+        low = [partner_id for partner_id in partner_ids if partner_id < user.id]
+        high = [partner_id for partner_id in partner_ids if partner_id > user.id]
+        new_matches = [
+            match
+            for match in Match.objects.filter(user1_id__in=[user.id, *low], user2_id__in=[user.id, *high])
+            if user.id in (match.user1_id, match.user2_id)
+        ]
+        sync_match_memberships(new_matches)
+        matches = [(match.id, match.user1_id, match.user2_id) for match in new_matches]
+    return {
+        user2_id if user1_id == user.id else user1_id: match_id
+        for match_id, user1_id, user2_id in matches
+    }
@@ -0,0 +1,30 @@
+from django.db import migrations
+from django.db.models import Max
+
+from interactions.memberships import MEMBERSHIPS_SQL
+
+
+CHUNK_SIZE = 50000
+
+
+def backfill_match_memberships(apps, schema_editor):
+    Match = apps.get_model('interactions', 'Match')
+    MatchMembership = apps.get_model('interactions', 'MatchMembership')
+    sql = MEMBERSHIPS_SQL.format(memberships=MatchMembership._meta.db_table, matches=Match._meta.db_table)
+    last_id = Match.objects.aggregate(last=Max('id'))['last'] or 0
+    # Каждая пачка id мэтчей коммитится сама
+    for start in range(1, last_id + 1, CHUNK_SIZE):
+        end = start + CHUNK_SIZE - 1
+        schema_editor.execute(sql, [start, end, start, end])
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('interactions', '0003_matchmembership'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_match_memberships, migrations.RunPython.noop),
+    ]
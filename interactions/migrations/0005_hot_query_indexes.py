@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('interactions', '0004_backfill_match_memberships'),
+    ]
+
+    operations = [
+        # Новые индексы создаются раньше, чем удаляются старые
+        migrations.AddIndex(
+            model_name='dateinvitation',
+            index=models.Index(fields=['from_user', '-created_at', '-id'], name='invitation_from_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dateinvitation',
+            index=models.Index(fields=['to_user', '-created_at', '-id'], name='invitation_to_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='interaction',
+            index=models.Index(fields=['from_user', 'action', 'to_user'], name='interaction_from_action_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='interaction',
+            index=models.Index(fields=['to_user', 'action', '-created_at', '-id'], name='interaction_to_action_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='interaction',
+            name='interaction_from_us_626f8f_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='interaction',
+            name='interaction_to_user_bff56d_idx',
+        ),
+        migrations.AlterField(
+            model_name='interaction',
+            name='from_user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='sent_interactions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='interaction',
+            name='to_user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='received_interactions', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
 from users.models import User
 
@@ -10,24 +10,29 @@ class Interaction(models.Model):
         ('super_like', 'Суперлайк'),
     ]
     
+    # Отдельные индексы внешних ключей не нужны: оба - префиксы составных индексов
     from_user = models.ForeignKey(
         User, 
         on_delete=models.CASCADE, 
-        related_name='sent_interactions'
+        related_name='sent_interactions',
+        db_index=False
     )
     to_user = models.ForeignKey(
         User, 
         on_delete=models.CASCADE, 
-        related_name='received_interactions'
+        related_name='received_interactions',
+        db_index=False
     )
     action = models.CharField(max_length=10, choices=ACTION_CHOICES)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         unique_together = ['from_user', 'to_user']
+        # Под запросы списков, см. explain_hot_queries: лайкнутые/дизлайкнутые
+        # (Index Only Scan) и полученные лайки страницами по created_at
         indexes = [
-            models.Index(fields=['from_user', 'created_at']),
-            models.Index(fields=['to_user', 'created_at']),
+            models.Index(fields=['from_user', 'action', 'to_user'], name='interaction_from_action_idx'),
+            models.Index(fields=['to_user', 'action', '-created_at', '-id'], name='interaction_to_action_idx'),
         ]
     
     def __str__(self):
@@ -73,11 +78,49 @@ class Match(models.Model):
     
     class Meta:
         unique_together = ['user1', 'user2']
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+        ]
+    
+    def save(self, *args, **kwargs):
+        # Строки участников меняются в той же транзакции, что и мэтч
+        from .memberships import sync_match_memberships
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            sync_match_memberships([self])
     
     def __str__(self):
         return f"Match: {self.user1} & {self.user2}"
 
 
+class MatchMembership(models.Model):
+    """
+    Мэтч со стороны одного участника: по строке на (user, partner).
+    Мэтчи пользователя и мэтч пары ищутся одним диапазоном индекса вместо
+    OR по user1/user2. is_active и created_at копируются из Match при его
+    сохранении; Match.objects.update() их не синхронизирует.
+    """
+    # Отдельный индекс по user не нужен: он префикс unique_together
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='match_memberships', db_index=False)
+    partner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='memberships')
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ['user', 'partner']
+        indexes = [
+            models.Index(
+                fields=['user', '-created_at', '-match'],
+                condition=models.Q(is_active=True),
+                name='match_membership_active_idx',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.user} in match {self.match_id} with {self.partner}"
+
+
 class DateInvitation(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Ожидание'),
@@ -102,6 +145,13 @@ class DateInvitation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        # Список приглашений - OR по двум индексам, каждый уже в порядке страницы
+        indexes = [
+            models.Index(fields=['from_user', '-created_at', '-id'], name='invitation_from_created_idx'),
+            models.Index(fields=['to_user', '-created_at', '-id'], name='invitation_to_created_idx'),
+        ]
+    
     def __str__(self):
         return f"Date invitation from {self.from_user} to {self.to_user}"
 
@@ -0,0 +1,31 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+
+def user_group(user_id):
+    return f'user-{user_id}'
+
+
+def send_notification(user_id, payload):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    async_to_sync(channel_layer.group_send)(
+        user_group(user_id),
+        {'type': 'user.notification', 'payload': payload}
+    )
+
+
+def notify_user(user_id, event, **data):
+    """Отправляет событие в группу пользователя после коммита транзакции."""
+    payload = {'event': event, **data}
+    transaction.on_commit(lambda: send_notification(user_id, payload))
+
+
+def notify_swipe(from_user_id, to_user_id, action, interaction_id, match_id=None):
+    if action in ('like', 'super_like'):
+        notify_user(to_user_id, action, from_user=from_user_id, interaction_id=interaction_id)
+    if match_id is not None:
+        notify_user(from_user_id, 'match', match_id=match_id, partner=to_user_id)
+        notify_user(to_user_id, 'match', match_id=match_id, partner=from_user_id)
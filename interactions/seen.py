@@ -0,0 +1,161 @@
+import hashlib
+import math
+from contextlib import contextmanager
+
+from django.core.cache import cache
+
+from core.locks import cache_lock
+from .models import Interaction, ViewHistory
+
+
+SEEN_SET_TIMEOUT = 60 * 60 * 24
+MIN_CAPACITY = 1024
+FALSE_POSITIVE_RATE = 0.01
+
+
+class SeenSet:
+    """
+    Компактное множество пользователей, которых зритель уже видел или лайкал.
+
+    Bloom-фильтр хранится в кэше и обновляется по сигналам ViewHistory и
+    Interaction. Отрицательный ответ фильтра точный, положительные ответы
+    перепроверяются одним запросом к ViewHistory/Interaction.
+
+    Фильтр меняется чтением, изменением и записью всего битового массива,
+    поэтому изменения одного зрителя идут под блокировкой в кэше (cache.add).
+    Если блокировку не удалось дождаться, фильтр сбрасывается и
+    пересобирается из базы: потерянный бит дал бы ложный отрицательный ответ.
+    """
+
+    def __init__(self, viewer_id, capacity=MIN_CAPACITY, bits=None, count=0):
+        self.viewer_id = viewer_id
+        self.capacity = capacity
+        self.size = self.optimal_size(capacity)
+        self.hash_count = self.optimal_hash_count(self.size, capacity)
+        self.bits = bytearray(bits) if bits is not None else bytearray((self.size + 7) // 8)
+        self.count = count
+
+    @staticmethod
+    def cache_key(viewer_id):
+        return f'seen-set:{viewer_id}'
+
+    @staticmethod
+    def optimal_size(capacity):
+        return int(math.ceil(-capacity * math.log(FALSE_POSITIVE_RATE) / math.log(2) ** 2))
+
+    @staticmethod
+    def optimal_hash_count(size, capacity):
+        return max(1, int(round(size / capacity * math.log(2))))
+
+    @classmethod
+    def for_viewer(cls, viewer_id):
+        state = cache.get(cls.cache_key(viewer_id))
+        if state is None:
+            return cls.build(viewer_id)
+        return cls(viewer_id, **state)
+
+    @classmethod
+    def build(cls, viewer_id, capacity=None):
+        with cls.lock(viewer_id) as locked:
+            # Пока ждали блокировку, фильтр мог собрать другой запрос
+            state = cache.get(cls.cache_key(viewer_id)) if locked and capacity is None else None
+            if state is not None:
+                return cls(viewer_id, **state)
+            return cls._build(viewer_id, capacity, save=locked)
+
+    @classmethod
+    def _build(cls, viewer_id, capacity=None, save=True):
+        seen_ids = cls.load_seen_ids(viewer_id)
+        capacity = max(capacity or 0, MIN_CAPACITY, len(seen_ids) * 2)
+        seen_set = cls(viewer_id, capacity=capacity)
+        for user_id in seen_ids:
+            seen_set._set_bits(user_id)
+        seen_set.count = len(seen_ids)
+        if save:
+            seen_set.save()
+        return seen_set
+
+    @classmethod
+    @contextmanager
+    def lock(cls, viewer_id):
+        """Блокировка изменения фильтра зрителя; дает False, если ее не дождались."""
+        with cache_lock(f'{cls.cache_key(viewer_id)}:lock') as locked:
+            if not locked:
+                # Держатель блокировки завис: фильтр соберется из базы заново
+                cls.invalidate(viewer_id)
+            yield locked
+
+    @staticmethod
+    def load_seen_ids(viewer_id, user_ids=None):
+        viewed = ViewHistory.objects.filter(viewer_id=viewer_id)
+        swiped = Interaction.objects.filter(from_user_id=viewer_id)
+        if user_ids is not None:
+            viewed = viewed.filter(viewed_user_id__in=user_ids)
+            swiped = swiped.filter(to_user_id__in=user_ids)
+        return set(viewed.values_list('viewed_user_id', flat=True)) | set(
+            swiped.values_list('to_user_id', flat=True)
+        )
+
+    @classmethod
+    def record(cls, viewer_id, user_id):
+        cls.record_many(viewer_id, [user_id])
+
+    @classmethod
+    def record_many(cls, viewer_id, user_ids):
+        if not user_ids:
+            return
+        with cls.lock(viewer_id) as locked:
+            # Если фильтр еще не собран, он загрузит новые записи из базы сам
+            state = cache.get(cls.cache_key(viewer_id))
+            if not locked or state is None:
+                return
+            seen_set = cls(viewer_id, **state)
+            new_ids = [user_id for user_id in set(user_ids) if not seen_set.might_contain(user_id)]
+            if not new_ids:
+                return
+            if seen_set.count + len(new_ids) > seen_set.capacity:
+                # Фильтр переполнен - пересобираем его из базы с запасом
+                cls._build(viewer_id, capacity=seen_set.capacity * 2)
+                return
+            for user_id in new_ids:
+                seen_set._set_bits(user_id)
+            seen_set.count += len(new_ids)
+            seen_set.save()
+
+    @classmethod
+    def invalidate(cls, viewer_id):
+        cache.delete(cls.cache_key(viewer_id))
+
+    def save(self):
+        cache.set(self.cache_key(self.viewer_id), {
+            'capacity': self.capacity,
+            'bits': bytes(self.bits),
+            'count': self.count,
+        }, SEEN_SET_TIMEOUT)
+
+    def _positions(self, user_id):
+        digest = hashlib.blake2b(str(user_id).encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def _set_bits(self, user_id):
+        for position in self._positions(user_id):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def might_contain(self, user_id):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(user_id)
+        )
+
+    def contains(self, user_id):
+        if not self.might_contain(user_id):
+            return False
+        return bool(self.load_seen_ids(self.viewer_id, [user_id]))
+
+    def filter_unseen(self, user_ids):
+        """Оставляет из user_ids только непросмотренных, сохраняя порядок."""
+        positives = [user_id for user_id in user_ids if self.might_contain(user_id)]
+        confirmed = self.load_seen_ids(self.viewer_id, positives) if positives else set()
+        return [user_id for user_id in user_ids if user_id not in confirmed]
@@ -1,55 +1,76 @@
 from rest_framework import serializers
 from .models import Interaction, ViewHistory, Match, DateInvitation, ContactExchange
-from users.serializers import UserSerializer
+from core.serializers import SparseFieldsetMixin
+from users.serializers import UserCardField, UserCardListSerializer
 
 
-class InteractionSerializer(serializers.ModelSerializer):
-    from_user_info = UserSerializer(source='from_user', read_only=True)
-    to_user_info = UserSerializer(source='to_user', read_only=True)
+class InteractionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    from_user_info = UserCardField(source='from_user_id')
+    to_user_info = UserCardField(source='to_user_id')
     
     class Meta:
         model = Interaction
+        list_serializer_class = UserCardListSerializer
         fields = ['id', 'from_user', 'to_user', 'from_user_info', 
                  'to_user_info', 'action', 'created_at']
         read_only_fields = ['from_user', 'created_at']
+    
+    def validate_to_user(self, value):
+        request = self.context.get('request')
+        if request and value == request.user:
+            raise serializers.ValidationError("Нельзя оценить самого себя")
+        return value
+
+
+class BatchSwipeItemSerializer(serializers.Serializer):
+    to_user = serializers.IntegerField()
+    action = serializers.ChoiceField(choices=Interaction.ACTION_CHOICES)
+
+
+class BatchInteractionSerializer(serializers.Serializer):
+    items = BatchSwipeItemSerializer(many=True, allow_empty=False, max_length=500)
 
 
-class ViewHistorySerializer(serializers.ModelSerializer):
-    viewed_user_info = UserSerializer(source='viewed_user', read_only=True)
+class ViewHistorySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    viewed_user_info = UserCardField(source='viewed_user_id')
     
     class Meta:
         model = ViewHistory
+        list_serializer_class = UserCardListSerializer
         fields = ['id', 'viewed_user', 'viewed_user_info', 'viewed_at']
         read_only_fields = ['viewer', 'viewed_at']
 
 
-class MatchSerializer(serializers.ModelSerializer):
-    user1_info = UserSerializer(source='user1', read_only=True)
-    user2_info = UserSerializer(source='user2', read_only=True)
+class MatchSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    user1_info = UserCardField(source='user1_id')
+    user2_info = UserCardField(source='user2_id')
     
     class Meta:
         model = Match
+        list_serializer_class = UserCardListSerializer
         fields = ['id', 'user1', 'user2', 'user1_info', 'user2_info', 
                  'created_at', 'is_active']
 
 
-class DateInvitationSerializer(serializers.ModelSerializer):
-    from_user_info = UserSerializer(source='from_user', read_only=True)
-    to_user_info = UserSerializer(source='to_user', read_only=True)
+class DateInvitationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    from_user_info = UserCardField(source='from_user_id')
+    to_user_info = UserCardField(source='to_user_id')
     
     class Meta:
         model = DateInvitation
+        list_serializer_class = UserCardListSerializer
         fields = ['id', 'from_user', 'to_user', 'from_user_info', 
                  'to_user_info', 'message', 'proposed_date', 'status', 
                  'created_at', 'updated_at']
         read_only_fields = ['from_user', 'created_at', 'updated_at']
 
 
-class ContactExchangeSerializer(serializers.ModelSerializer):
-    initiated_by_info = UserSerializer(source='initiated_by', read_only=True)
+class ContactExchangeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    initiated_by_info = UserCardField(source='initiated_by_id')
     
     class Meta:
         model = ContactExchange
+        list_serializer_class = UserCardListSerializer
         fields = ['id', 'match', 'initiated_by', 'initiated_by_info', 
                  'contact_info', 'exchanged_at']
         read_only_fields = ['initiated_by', 'exchanged_at']
\ No newline at end of file
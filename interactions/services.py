@@ -0,0 +1,245 @@
+import uuid
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.celery import enqueue
+from core.metrics import matches_created, swipes
+from users.models import User
+from users.recommendations import LIKE_ACTIONS
+from .memberships import create_matches, matches_with
+from .models import Interaction, Match, MatchMembership
+from .tasks import (
+    increment_likes_count, increment_likes_counts, mark_recommendations_stale, publish_swipe_events,
+    record_seen_users, update_liked_you
+)
+
+
+SwipeResult = namedtuple('SwipeResult', ['interaction', 'match', 'match_created'])
+
+
+SWIPE_SQL = '''
+    WITH inserted AS (
+        INSERT INTO {interactions} (from_user_id, to_user_id, action, created_at)
+        VALUES (%(from_user)s, %(to_user)s, %(action)s, %(now)s)
+        ON CONFLICT (from_user_id, to_user_id) DO NOTHING
+        RETURNING id
+    ), matched AS (
+        INSERT INTO {matches} (user1_id, user2_id, created_at, is_active)
+        SELECT %(user1)s, %(user2)s, %(now)s, TRUE
+        WHERE %(is_like)s
+          AND EXISTS (SELECT 1 FROM inserted)
+          AND EXISTS (
+              SELECT 1 FROM {interactions}
+              WHERE from_user_id = %(to_user)s
+                AND to_user_id = %(from_user)s
+                AND action = 'like'
+          )
+        ON CONFLICT (user1_id, user2_id) DO NOTHING
+        RETURNING id
+    ), members AS (
+        INSERT INTO {memberships} (user_id, partner_id, match_id, is_active, created_at)
+        SELECT pair.user_id, pair.partner_id, matched.id, TRUE, %(now)s
+        FROM matched
+        CROSS JOIN (VALUES (%(user1)s, %(user2)s), (%(user2)s, %(user1)s)) AS pair (user_id, partner_id)
+        ON CONFLICT (user_id, partner_id) DO NOTHING
+    )
+    SELECT (SELECT id FROM inserted), (SELECT id FROM matched)
+'''
+
+
+def ordered_pair(first_id, second_id):
+    return min(first_id, second_id), max(first_id, second_id)
+
+
+def pair_lock_key(user1_id, user2_id):
+    # Пара id в одном bigint для pg_advisory_xact_lock
+    key = ((user1_id & 0xFFFFFFFF) << 32) | (user2_id & 0xFFFFFFFF)
+    return key - (1 << 64) if key >= (1 << 63) else key
+
+
+def lock_pairs(pairs):
+    """Берет advisory-блокировки пар пользователей в порядке ключей (без взаимных блокировок)."""
+    if connection.vendor != 'postgresql' or not pairs:
+        return
+    keys = sorted({pair_lock_key(*ordered_pair(*pair)) for pair in pairs})
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_advisory_xact_lock(k) FROM (SELECT unnest(%s::bigint[]) AS k ORDER BY 1) AS keys',
+            [keys]
+        )
+
+
+def record_swipe(from_user, to_user, action):
+    """
+    Записывает свайп, проверяет взаимный лайк и создает мэтч.
+
+    На Postgres это два выражения: advisory-блокировка пары пользователей и
+    CTE с INSERT ... ON CONFLICT для Interaction и Match. Блокировка
+    сериализует встречные лайки одной пары: второй из них видит первый
+    закоммиченным, поэтому мэтч не теряется. Возвращает SwipeResult;
+    interaction равен None, если свайп этой пары уже был.
+    """
+    user1_id, user2_id = ordered_pair(from_user.id, to_user.id)
+    now = timezone.now()
+
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            lock_pairs([(user1_id, user2_id)])
+            with connection.cursor() as cursor:
+                cursor.execute(SWIPE_SQL.format(
+                    interactions=Interaction._meta.db_table,
+                    matches=Match._meta.db_table,
+                    memberships=MatchMembership._meta.db_table,
+                ), {
+                    'from_user': from_user.id,
+                    'to_user': to_user.id,
+                    'action': action,
+                    'now': now,
+                    'user1': user1_id,
+                    'user2': user2_id,
+                    'is_like': action == 'like',
+                })
+                interaction_id, match_id = cursor.fetchone()
+        else:
+            interaction_id, match_id = _record_swipe_orm(from_user, to_user, action, now)
+
+        if interaction_id is None:
+            return SwipeResult(None, None, False)
+
+        # Мэтч нужен в ответе, остальные побочные эффекты уходят в Celery
+        if action == 'like':
+            enqueue(increment_likes_count, interaction_id, to_user.id)
+        enqueue(publish_swipe_events, from_user.id, to_user.id, action, interaction_id, match_id)
+        enqueue(record_seen_users, from_user.id, [to_user.id])
+        enqueue(update_liked_you, from_user.id, [to_user.id], [to_user.id] if action == 'like' else [])
+        if action in LIKE_ACTIONS:
+            enqueue(mark_recommendations_stale, [to_user.id])
+
+    swipes.inc(action)
+    interaction = Interaction(
+        id=interaction_id, from_user=from_user, to_user=to_user,
+        action=action, created_at=now
+    )
+    match = None
+    if match_id is not None:
+        matches_created.inc()
+        match = Match(id=match_id, user1_id=user1_id, user2_id=user2_id, created_at=now, is_active=True)
+    return SwipeResult(interaction, match, match is not None)
+
+
+def _record_swipe_orm(from_user, to_user, action, now):
+    # Запасной путь для баз без ON CONFLICT ... RETURNING в CTE
+    user1_id, user2_id = ordered_pair(from_user.id, to_user.id)
+    if Interaction.objects.filter(from_user=from_user, to_user=to_user).exists():
+        return None, None
+
+    interaction = Interaction.objects.create(from_user=from_user, to_user=to_user, action=action)
+    if action != 'like':
+        return interaction.id, None
+
+    mutual_like = Interaction.objects.filter(
+        from_user=to_user, to_user=from_user, action='like'
+    ).exists()
+    if not mutual_like:
+        return interaction.id, None
+
+    match, created = Match.objects.get_or_create(user1_id=user1_id, user2_id=user2_id)
+    return interaction.id, match.id if created else None
+
+
+def record_swipes_bulk(from_user, items):
+    """
+    Записывает пачку свайпов одного пользователя: один bulk_create, один
+    запрос на поиск взаимных лайков и одно обновление счетчиков.
+    items - список словарей {to_user: id, action}. Возвращает список
+    результатов в том же порядке, что и items.
+    """
+    results = [
+        {
+            'to_user': item['to_user'], 'action': item['action'], 'status': 'invalid',
+            'interaction_id': None, 'match_created': False, 'match_id': None, 'error': None,
+        }
+        for item in items
+    ]
+
+    # Первый свайп на пользователя в пачке выигрывает, повторные - дубликаты
+    pending = {}
+    for result in results:
+        if result['to_user'] == from_user.id:
+            result['error'] = 'Нельзя оценить самого себя'
+        elif result['to_user'] in pending:
+            result['status'] = 'duplicate'
+        else:
+            pending[result['to_user']] = result
+
+    existing_users = set(User.objects.filter(id__in=list(pending)).values_list('id', flat=True))
+    for to_user_id in list(pending):
+        if to_user_id not in existing_users:
+            pending.pop(to_user_id)['error'] = 'Пользователь не найден'
+
+    with transaction.atomic():
+        lock_pairs([(from_user.id, to_user_id) for to_user_id in pending])
+
+        already_swiped = Interaction.objects.filter(
+            from_user=from_user, to_user_id__in=list(pending)
+        ).values_list('to_user_id', flat=True)
+        for to_user_id in already_swiped:
+            pending.pop(to_user_id)['status'] = 'duplicate'
+
+        Interaction.objects.bulk_create([
+            Interaction(from_user=from_user, to_user_id=to_user_id, action=result['action'])
+            for to_user_id, result in pending.items()
+        ], ignore_conflicts=True)
+
+        inserted = Interaction.objects.filter(
+            from_user=from_user, to_user_id__in=list(pending)
+        ).values_list('to_user_id', 'id', 'action')
+        for to_user_id, interaction_id, action in inserted:
+            result = pending[to_user_id]
+            if action == result['action']:
+                result['status'] = 'created'
+                result['interaction_id'] = interaction_id
+        created = {
+            to_user_id: result for to_user_id, result in pending.items()
+            if result['status'] == 'created'
+        }
+        for to_user_id, result in pending.items():
+            if result['status'] != 'created':
+                result['status'] = 'duplicate'
+
+        liked = [to_user_id for to_user_id, result in created.items() if result['action'] == 'like']
+        mutual = set(Interaction.objects.filter(
+            from_user_id__in=liked, to_user=from_user, action='like'
+        ).values_list('from_user_id', flat=True))
+
+        if mutual:
+            partner_matches = matches_with(from_user, mutual)
+            new_matches = create_matches(from_user, [
+                partner_id for partner_id in mutual if partner_id not in partner_matches
+            ])
+            for partner_id, match_id in {**partner_matches, **new_matches}.items():
+                created[partner_id]['match_id'] = match_id
+                created[partner_id]['match_created'] = partner_id in new_matches
+
+        if liked:
+            enqueue(increment_likes_counts, uuid.uuid4().hex, {to_user_id: 1 for to_user_id in liked})
+        for to_user_id, result in created.items():
+            enqueue(
+                publish_swipe_events, from_user.id, to_user_id, result['action'],
+                result['interaction_id'], result['match_id'] if result['match_created'] else None
+            )
+        enqueue(record_seen_users, from_user.id, list(created))
+        enqueue(update_liked_you, from_user.id, list(created), liked)
+        stale = [to_user_id for to_user_id, result in created.items() if result['action'] in LIKE_ACTIONS]
+        if stale:
+            enqueue(mark_recommendations_stale, stale)
+
+    for result in results:
+        if result['status'] == 'created':
+            swipes.inc(result['action'])
+            if result['match_created']:
+                matches_created.inc()
+    return results
+
@@ -0,0 +1,36 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .liked_you import LikedYouIndex
+from .models import Interaction, ViewHistory
+from .seen import SeenSet
+
+
+@receiver(post_save, sender=ViewHistory)
+def add_viewed_user_to_seen_set(sender, instance, created, **kwargs):
+    if created:
+        SeenSet.record(instance.viewer_id, instance.viewed_user_id)
+
+
+@receiver(post_save, sender=Interaction)
+def add_swiped_user_to_seen_set(sender, instance, created, **kwargs):
+    if created:
+        SeenSet.record(instance.from_user_id, instance.to_user_id)
+
+
+@receiver(post_delete, sender=ViewHistory)
+def invalidate_seen_set_on_view_delete(sender, instance, **kwargs):
+    # Из Bloom-фильтра нельзя удалить элемент - пересоберем его при следующем запросе
+    SeenSet.invalidate(instance.viewer_id)
+
+
+@receiver(post_delete, sender=Interaction)
+def invalidate_seen_set_on_interaction_delete(sender, instance, **kwargs):
+    SeenSet.invalidate(instance.from_user_id)
+
+
+@receiver(post_delete, sender=Interaction)
+def invalidate_liked_you_on_interaction_delete(sender, instance, **kwargs):
+    # Удаленный свайп мог быть входящим лайком или ответом на него
+    LikedYouIndex.invalidate(instance.from_user_id)
+    LikedYouIndex.invalidate(instance.to_user_id)
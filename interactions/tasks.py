@@ -0,0 +1,54 @@
+from core.celery import RETRY_POLICY, app, run_once
+from users.counters import increment_likes, increment_likes_many
+from users.models import User
+from users.recommendations import mark_stale
+from .liked_you import LikedYouIndex
+from .models import Interaction
+from .notifications import notify_swipe
+from .seen import SeenSet
+
+
+@app.task(**RETRY_POLICY)
+@run_once('{interaction_id}')
+def increment_likes_count(interaction_id, to_user_id):
+    to_user = User.objects.filter(pk=to_user_id).only('id', 'likes_count').first()
+    if to_user is not None:
+        increment_likes(to_user)
+
+
+@app.task(**RETRY_POLICY)
+@run_once('{batch_key}')
+def increment_likes_counts(batch_key, deltas):
+    # Ключи словаря после JSON-сериализации приходят строками
+    increment_likes_many({int(user_id): delta for user_id, delta in deltas.items()})
+
+
+@app.task(**RETRY_POLICY)
+@run_once('{interaction_id}')
+def publish_swipe_events(from_user_id, to_user_id, action, interaction_id, match_id=None):
+    notify_swipe(from_user_id, to_user_id, action, interaction_id, match_id)
+
+
+@app.task(**RETRY_POLICY)
+def record_seen_users(viewer_id, user_ids):
+    # Добавление в множество идемпотентно само по себе
+    SeenSet.record_many(viewer_id, user_ids)
+
+
+@app.task(**RETRY_POLICY)
+def update_liked_you(from_user_id, swiped_ids, liked_ids):
+    # Свайп - ответ на входящие лайки; лайк попадает к получателю, если тот еще не ответил
+    LikedYouIndex.remove(from_user_id, swiped_ids)
+    answered = set(Interaction.objects.filter(
+        from_user_id__in=liked_ids, to_user_id=from_user_id
+    ).values_list('from_user_id', flat=True))
+    for user_id in liked_ids:
+        if user_id not in answered:
+            LikedYouIndex.add(user_id, from_user_id)
+
+
+@app.task(**RETRY_POLICY)
+def mark_recommendations_stale(user_ids):
+    # Лайк поднимает лайкнувшего в рекомендациях получателя. Сырой SQL и
+    # bulk_create свайпов post_save не отправляют - отмечаем здесь
+    mark_stale(user_ids)
@@ -3,11 +3,15 @@ from . import views
 
 urlpatterns = [
     path('interact/', views.InteractionView.as_view(), name='interact'),
+    path('interact/batch/', views.BatchInteractionView.as_view(), name='interact-batch'),
     path('view-history/', views.ViewHistoryListView.as_view(), name='view-history'),
+    path('view-history/async/', views.AsyncViewHistoryListView.as_view(), name='view-history-async'),
     path('liked-users/', views.LikedUsersListView.as_view(), name='liked-users'),
     path('disliked-users/', views.DislikedUsersListView.as_view(), name='disliked-users'),
     path('received-likes/', views.ReceivedLikesListView.as_view(), name='received-likes'),
+    path('received-likes/async/', views.AsyncReceivedLikesListView.as_view(), name='received-likes-async'),
     path('matches/', views.MatchListView.as_view(), name='matches'),
+    path('matches/async/', views.AsyncMatchListView.as_view(), name='matches-async'),
     path('date-invitations/', views.DateInvitationView.as_view(), name='date-invitations'),
     path('contact-exchange/', views.ContactExchangeView.as_view(), name='contact-exchange'),
 ]
\ No newline at end of file
@@ -1,11 +1,13 @@
-from rest_framework import generics, status, permissions
+from rest_framework import generics, status, permissions, serializers
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
-from django.db import transaction
-from django.db.models import Q
-from .models import Interaction, ViewHistory, Match, DateInvitation, ContactExchange
+from django.db.models import F, Q
+from core.async_views import AsyncListAPIView
+from .models import Interaction, ViewHistory, Match, MatchMembership, DateInvitation, ContactExchange
+from .notifications import notify_user
+from .services import record_swipe, record_swipes_bulk
 from .serializers import (
-    InteractionSerializer, ViewHistorySerializer, 
+    InteractionSerializer, BatchInteractionSerializer, ViewHistorySerializer, 
     MatchSerializer, DateInvitationSerializer, ContactExchangeSerializer
 )
 from users.serializers import UserSerializer
@@ -16,38 +18,48 @@ class InteractionView(generics.CreateAPIView):
     serializer_class = InteractionSerializer
     permission_classes = [permissions.IsAuthenticated]
     
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.data['match_created'] = self.swipe.match_created
+        response.data['match_id'] = self.swipe.match.id if self.swipe.match else None
+        return response
+    
     def perform_create(self, serializer):
-        with transaction.atomic():
-            interaction = serializer.save(from_user=self.request.user)
-            
-            # Обновляем счетчик лайков
-            if interaction.action == 'like':
-                interaction.to_user.likes_count += 1
-                interaction.to_user.save()
-            
-            # Проверяем взаимный лайк
-            mutual_like = Interaction.objects.filter(
-                from_user=interaction.to_user,
-                to_user=interaction.from_user,
-                action='like'
-            ).exists()
-            
-            if mutual_like and interaction.action == 'like':
-                # Создаем мэтч
-                Match.objects.get_or_create(
-                    user1=min(interaction.from_user, interaction.to_user, key=lambda u: u.id),
-                    user2=max(interaction.from_user, interaction.to_user, key=lambda u: u.id)
-                )
+        # Свайп, счетчик лайков и мэтч записываются одним конвейером
+        self.swipe = record_swipe(
+            self.request.user,
+            serializer.validated_data['to_user'],
+            serializer.validated_data['action']
+        )
+        if self.swipe.interaction is None:
+            raise serializers.ValidationError("Вы уже оценили этого пользователя")
+        serializer.instance = self.swipe.interaction
+
+
+class BatchInteractionView(generics.GenericAPIView):
+    serializer_class = BatchInteractionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request, *args, **kwargs):
+        # Отложенные на клиенте свайпы записываются одной пачкой
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = record_swipes_bulk(request.user, serializer.validated_data['items'])
+        return Response({
+            'created': sum(1 for result in results if result['status'] == 'created'),
+            'matches_created': sum(1 for result in results if result['match_created']),
+            'results': results,
+        })
 
 
 class ViewHistoryListView(generics.ListAPIView):
     serializer_class = ViewHistorySerializer
     permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = ('-viewed_at', '-id')
     
     def get_queryset(self):
-        return ViewHistory.objects.filter(
-            viewer=self.request.user
-        ).select_related('viewed_user', 'viewed_user__profile').prefetch_related('viewed_user__photos')
+        # Пользователи подгружаются карточками одним запросом в сериализаторе
+        return ViewHistory.objects.filter(viewer=self.request.user)
 
 
 class LikedUsersListView(generics.ListAPIView):
@@ -84,18 +96,32 @@ class ReceivedLikesListView(generics.ListAPIView):
         return Interaction.objects.filter(
             to_user=self.request.user,
             action='like'
-        ).select_related('from_user', 'from_user__profile').prefetch_related('from_user__photos')
+        )
 
 
 class MatchListView(generics.ListAPIView):
     serializer_class = MatchSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # Порядок частичного индекса участников: страница - один его диапазон
+    keyset_ordering = ('-matched_at', '-id')
     
     def get_queryset(self):
         return Match.objects.filter(
-            Q(user1=self.request.user) | Q(user2=self.request.user),
-            is_active=True
-        ).select_related('user1', 'user2', 'user1__profile', 'user2__profile')
+            memberships__user=self.request.user,
+            memberships__is_active=True
+        ).annotate(matched_at=F('memberships__created_at'))
+
+
+class AsyncViewHistoryListView(AsyncListAPIView):
+    view_class = ViewHistoryListView
+
+
+class AsyncReceivedLikesListView(AsyncListAPIView):
+    view_class = ReceivedLikesListView
+
+
+class AsyncMatchListView(AsyncListAPIView):
+    view_class = MatchListView
 
 
 class DateInvitationView(generics.ListCreateAPIView):
@@ -105,21 +131,27 @@ class DateInvitationView(generics.ListCreateAPIView):
     def get_queryset(self):
         return DateInvitation.objects.filter(
             Q(from_user=self.request.user) | Q(to_user=self.request.user)
-        ).select_related('from_user', 'to_user')
+        )
     
     def perform_create(self, serializer):
         # Проверяем, есть ли мэтч между пользователями
         to_user = serializer.validated_data['to_user']
-        match_exists = Match.objects.filter(
-            Q(user1=self.request.user, user2=to_user) |
-            Q(user1=to_user, user2=self.request.user),
+        match_exists = MatchMembership.objects.filter(
+            user=self.request.user,
+            partner=to_user,
             is_active=True
         ).exists()
         
         if not match_exists:
             raise serializers.ValidationError("Приглашение можно отправить только взаимолайкнувшим пользователям")
         
-        serializer.save(from_user=self.request.user)
+        invitation = serializer.save(from_user=self.request.user)
+        notify_user(
+            to_user.id, 'date_invitation',
+            invitation_id=invitation.id,
+            from_user=self.request.user.id,
+            proposed_date=invitation.proposed_date.isoformat()
+        )
 
 
 class ContactExchangeView(generics.CreateAPIView):
@@ -130,7 +162,7 @@ class ContactExchangeView(generics.CreateAPIView):
         match = serializer.validated_data['match']
         
         # Проверяем, что пользователь является участником мэтча
-        if self.request.user not in [match.user1, match.user2]:
+        if self.request.user.id not in (match.user1_id, match.user2_id):
             raise serializers.ValidationError("Вы не являетесь участником этого мэтча")
         
         serializer.save(initiated_by=self.request.user)
\ No newline at end of file
@@ -0,0 +1,125 @@
+from io import StringIO
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import Http404
+from django.test import TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from interactions.models import MatchMembership, ViewHistory
+from interactions.views import MatchListView
+from users.models import User
+from users.pools import candidate_pools
+
+
+class AsyncViewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        candidate_pools.reset()
+        call_command('generate_mock_data', users=30, interactions=400, workers=1, stdout=StringIO())
+        self.user = User.objects.get(id=MatchMembership.objects.values('user_id').first()['user_id'])
+        for viewed in User.objects.exclude(id=self.user.id)[:5]:
+            ViewHistory.objects.create(viewer=self.user, viewed_user=viewed)
+        self.client.force_authenticate(user=self.user)
+
+    def pages(self, name, params):
+        pages = []
+        response = self.client.get(reverse(name), params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.json())
+            if not pages[-1]['next']:
+                return pages
+            response = self.client.get(pages[-1]['next'])
+
+    def test_same_pages_as_sync_views(self):
+        for name, params in [
+            ('user-list', {'page_size': 7, 'gender': 'F'}),
+            ('view-history', {'page_size': 2}),
+            ('received-likes', {'page_size': 3}),
+            ('matches', {'page_size': 1}),
+        ]:
+            with self.subTest(name):
+                sync_pages = self.pages(name, params)
+                async_pages = self.pages(f'{name}-async', params)
+                self.assertGreater(len(sync_pages), 1)
+                self.assertEqual(
+                    [page['results'] for page in async_pages], [page['results'] for page in sync_pages]
+                )
+                # Ссылки на следующую страницу отличаются путем, курсоры - нет
+                cursors = [
+                    [parse_qs(urlparse(page['next']).query)['cursor'] for page in pages[:-1]]
+                    for pages in (sync_pages, async_pages)
+                ]
+                self.assertEqual(cursors[0], cursors[1])
+
+    def test_random_user(self):
+        response = self.client.get(reverse('random-user-async'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json().keys(), self.client.get(reverse('random-user')).json().keys())
+
+    def test_jwt_authentication(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.get(reverse('matches-async'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.json(), self.client.get(reverse('matches')).json())
+        self.assertIn('Bearer', response['WWW-Authenticate'])
+
+        response = self.client.get(reverse('matches-async'), HTTP_AUTHORIZATION='Bearer garbage')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.json()['code'], 'token_not_valid')
+
+        token = RefreshToken.for_user(self.user).access_token
+        response = self.client.get(reverse('matches-async'), HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), self.client.get(reverse('matches'), HTTP_AUTHORIZATION=f'Bearer {token}').json())
+
+    def test_random_user_is_recorded_in_view_history(self):
+        viewer = User.objects.create_user(
+            username='viewer', email='viewer@test.com', password='password123',
+            first_name='John', last_name='Doe', gender='M', age=25, city='Moscow'
+        )
+        self.client.force_authenticate(user=viewer)
+        shown = [self.client.get(reverse('random-user-async')).json()['id'] for _ in range(3)]
+        self.assertEqual(len(set(shown)), 3)
+        self.assertCountEqual(ViewHistory.objects.filter(viewer=viewer).values_list('viewed_user_id', flat=True), shown)
+
+    def test_errors_match_sync_views(self):
+        cases = [
+            ('user-list', {'min_age': 'abc'}, status.HTTP_400_BAD_REQUEST),
+            ('matches', {'cursor': 'garbage'}, status.HTTP_404_NOT_FOUND),
+        ]
+        for name, params, expected_status in cases:
+            with self.subTest(name):
+                response = self.client.get(reverse(f'{name}-async'), params)
+                self.assertEqual(response.status_code, expected_status)
+                self.assertEqual(response.json(), self.client.get(reverse(name), params).json())
+
+        # Исключения Django переводятся в ответы DRF, как в синхронных представлениях
+        with patch.object(MatchListView, 'get_queryset', side_effect=Http404):
+            response = self.client.get(reverse('matches-async'))
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+            self.assertEqual(response.json(), self.client.get(reverse('matches')).json())
+
+    def test_view_class_permissions(self):
+        with patch.object(MatchListView, 'permission_classes', [IsAdminUser]):
+            response = self.client.get(reverse('matches-async'))
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+            self.assertEqual(response.json(), self.client.get(reverse('matches')).json())
+
+
+class AsyncBenchmarkCommandTests(TransactionTestCase):
+    def test_reports_sync_and_async_variants(self):
+        out = StringIO()
+        call_command(
+            'benchmark_async_views', users=30, interactions=300, clients=2, concurrency=2, requests=4,
+            views='matches,view-history', workers=1, stdout=out
+        )
+        output = out.getvalue()
+        self.assertRegex(output, r'matches +async +4 req')
+        self.assertRegex(output, r'view-history +async/sync throughput')
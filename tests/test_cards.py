@@ -0,0 +1,91 @@
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+from users.models import User, UserPhoto
+from users.profile_cache import profile_cache
+from interactions.models import Interaction
+
+
+class UserCardTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        profile_cache.reset()
+        self.user = User.objects.create_user(
+            username='user',
+            email='user@test.com',
+            password='password123',
+            first_name='John',
+            last_name='Doe',
+            gender='M',
+            age=25,
+            city='Moscow'
+        )
+        self.fans = [
+            User.objects.create_user(
+                username=f'fan{i}',
+                email=f'fan{i}@test.com',
+                password='password123',
+                first_name=f'Jane{i}',
+                last_name='Doe',
+                gender='F',
+                age=20 + i,
+                city='Moscow'
+            )
+            for i in range(5)
+        ]
+        for fan in self.fans:
+            Interaction.objects.create(from_user=fan, to_user=self.user, action='like')
+        UserPhoto.objects.create(user=self.fans[0], photo='user_photos/fan.jpg', is_main=True)
+        self.client.force_authenticate(user=self.user)
+
+    def test_nested_users_are_cards(self):
+        response = self.client.get(reverse('received-likes'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        cards = {item['from_user']: item['from_user_info'] for item in response.data['results']}
+        self.assertEqual(set(cards[self.fans[0].id]), {'id', 'first_name', 'age', 'city', 'photo'})
+        self.assertTrue(cards[self.fans[0].id]['photo'].endswith('user_photos/fan.jpg'))
+        self.assertIsNone(cards[self.fans[1].id]['photo'])
+
+    def test_card_queries_do_not_grow_with_page(self):
+        # Запрос страницы + один запрос карточек для всех строк и полей
+        with self.assertNumQueries(2):
+            self.client.get(reverse('received-likes'))
+
+    def test_sparse_fields_and_expand(self):
+        response = self.client.get(reverse('received-likes'), {'fields': 'id,from_user_info'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'from_user_info'})
+
+        response = self.client.get(reverse('received-likes'), {'expand': 'from_user_info'})
+        self.assertIn('email', response.data['results'][0]['from_user_info'])
+
+    def test_cached_cards_follow_profile_changes(self):
+        url = reverse('received-likes')
+        self.client.get(url)
+        # Повторно карточки берутся из кэша, в базу идет только запрос страницы
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+        self.fans[1].first_name = 'Anna'
+        self.fans[1].save()
+        UserPhoto.objects.create(user=self.fans[2], photo='user_photos/new.jpg', is_main=True)
+
+        cards = {item['from_user']: item['from_user_info'] for item in self.client.get(url).data['results']}
+        self.assertEqual(cards[self.fans[1].id]['first_name'], 'Anna')
+        self.assertTrue(cards[self.fans[2].id]['photo'].endswith('user_photos/new.jpg'))
+
+    def test_login_keeps_cached_cards(self):
+        url = reverse('received-likes')
+        self.client.get(url)
+        # Вход обновляет только last_login - карточка остается в кэше
+        for fan in self.fans:
+            fan.last_login = fan.date_joined
+            fan.save(update_fields=['last_login'])
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+    def test_missing_versions_are_seeded_at_once(self):
+        user_ids = [fan.id for fan in self.fans]
+        versions = profile_cache.backend.versions(user_ids)
+        self.assertEqual(set(versions), set(user_ids))
+        self.assertEqual(profile_cache.backend.versions(user_ids), versions)
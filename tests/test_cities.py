@@ -0,0 +1,69 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+from users.cities import resolve_city
+from users.models import City, User
+from users.pools import candidate_pools
+
+
+class CityDirectoryTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        candidate_pools.reset()
+        self.users = [
+            User.objects.create_user(
+                username=f'user{i}',
+                email=f'user{i}@test.com',
+                password='password123',
+                first_name='Jane',
+                last_name='Doe',
+                gender='F',
+                age=25,
+                city=city
+            )
+            for i, city in enumerate(['Санкт-Петербург', ' санкт-петербург', 'СПб', 'Казань'])
+        ]
+        self.client.force_authenticate(user=self.users[3])
+
+    def test_spelling_variants_share_city(self):
+        spb = City.objects.get(normalized_name='санкт-петербург')
+        self.assertEqual(spb.name, 'Санкт-Петербург')
+        for user in self.users[:3]:
+            user.refresh_from_db()
+            self.assertEqual(user.city_ref_id, spb.id)
+
+        # Смена города перепривязывает пользователя
+        self.users[0].city = 'Казань'
+        self.users[0].save(update_fields=['city'])
+        self.users[0].refresh_from_db()
+        self.assertEqual(self.users[0].city_ref.name, 'Казань')
+
+    def test_directory_is_checked_only_when_city_changes(self):
+        loaded = User.objects.get(pk=self.users[0].pk)
+        with patch('users.cities.resolve_city', wraps=resolve_city) as resolve:
+            loaded.first_name = 'Anna'
+            loaded.save()
+            self.users[1].save()
+            self.users[2].refresh_from_db()
+            self.users[2].save(update_fields=['city'])
+            self.assertEqual(resolve.call_count, 0)
+
+            loaded.city = 'Казань'
+            loaded.save()
+            self.assertEqual(resolve.call_count, 1)
+        loaded.refresh_from_db()
+        self.assertEqual(loaded.city_ref.name, 'Казань')
+
+    def test_city_filter_uses_directory(self):
+        response = self.client.get(reverse('user-list'), {'city': 'петербург'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertCountEqual([u['id'] for u in response.data['results']], [u.id for u in self.users[:3]])
+
+    def test_autocomplete(self):
+        response = self.client.get(reverse('city-autocomplete'), {'q': 'Санкт'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([city['name'] for city in response.data], ['Санкт-Петербург'])
+        self.assertEqual(self.client.get(reverse('city-autocomplete'), {'q': 'спб'}).data, response.data)
@@ -0,0 +1,81 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from users.compatibility import compatibility_index, compatibility_setting, rank_candidates
+from users.models import Tag, User
+from users.pools import candidate_pools
+
+
+@override_settings(DISCOVERY_DECK={'BATCH_SIZE': 2, 'LOW_WATERMARK': 0, 'ASYNC_REFILL': False})
+class CompatibilityTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        candidate_pools.reset()
+        compatibility_index.reset()
+        self.viewer = self.create_user('viewer', 'M', 'Танцы, книги, Походы  в горы')
+        self.close = self.create_user('close', 'F', 'танцы, книги, походы в горы, кино')
+        self.partial = self.create_user('partial', 'F', 'книги, шахматы')
+        self.stranger = self.create_user('stranger', 'F', 'рыбалка')
+        self.client.force_authenticate(user=self.viewer)
+
+    def create_user(self, name, gender, hobbies):
+        return User.objects.create_user(
+            username=name,
+            email=f'{name}@test.com',
+            password='password123',
+            first_name=name,
+            last_name='Doe',
+            gender=gender,
+            age=25,
+            city='Moscow',
+            hobbies=hobbies
+        )
+
+    def test_hobbies_are_normalized_into_tags(self):
+        self.assertCountEqual(
+            self.viewer.tags.values_list('normalized_name', flat=True),
+            ['танцы', 'книги', 'походы в горы']
+        )
+        self.assertEqual(Tag.objects.filter(normalized_name='книги').count(), 1)
+
+        self.viewer.hobbies = 'книги, кино'
+        self.viewer.save(update_fields=['hobbies'])
+        self.assertCountEqual(self.viewer.tags.values_list('normalized_name', flat=True), ['книги', 'кино'])
+
+    def test_scores_for_batch_of_candidates(self):
+        tag_ids = self.viewer.tags.values_list('id', flat=True)
+        candidates = [self.stranger.id, self.partial.id, self.close.id, 10 ** 9]
+        jaccard = compatibility_index.score(tag_ids, candidates, 'jaccard')
+        self.assertEqual(list(jaccard.round(4)), [0.0, 0.25, 0.75, 0.0])
+        cosine = compatibility_index.score(tag_ids, candidates, 'cosine')
+        self.assertAlmostEqual(cosine[1], 1 / (3 * 2) ** 0.5)
+        self.assertAlmostEqual(cosine[2], 3 / (3 * 4) ** 0.5)
+
+        self.assertEqual(
+            rank_candidates(self.viewer.id, candidates),
+            [self.close.id, self.partial.id, self.stranger.id, 10 ** 9]
+        )
+
+    def test_deck_keeps_most_compatible_candidates(self):
+        url = reverse('random-user')
+        returned = [self.client.get(url).data['id'] for _ in range(2)]
+        self.assertEqual(returned, [self.close.id, self.partial.id])
+
+    def test_expired_matrix_is_served_while_rebuilding(self):
+        tag_ids = self.viewer.tags.values_list('id', flat=True)
+        candidates = [self.partial.id, self.close.id]
+        expected = list(compatibility_index.score(tag_ids, candidates))
+        compatibility_index.built_at -= compatibility_setting('REBUILD_INTERVAL')
+
+        with patch.object(compatibility_index, 'rebuild', wraps=compatibility_index.rebuild) as rebuild:
+            # Матрицу пересобирает другой поток - остальные не ждут и не собирают ее заново
+            with compatibility_index._build_lock:
+                self.assertEqual(list(compatibility_index.score(tag_ids, candidates)), expected)
+            self.assertEqual(rebuild.call_count, 0)
+
+            compatibility_index.score(tag_ids, candidates)
+            compatibility_index.score(tag_ids, candidates)
+            self.assertEqual(rebuild.call_count, 1)
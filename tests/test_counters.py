@@ -0,0 +1,86 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+from users.models import User, LikesCounterShard
+from users.counters import flush_likes_counters, increment_likes, increment_likes_many
+from interactions.models import Interaction
+
+
+class LikesCounterTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [
+            User.objects.create_user(
+                username=f'user{i}',
+                email=f'user{i}@test.com',
+                password='password123',
+                first_name='John',
+                last_name='Doe',
+                gender='M',
+                age=25,
+                city='Moscow'
+            )
+            for i in range(3)
+        ]
+
+    def test_like_increments_counter_without_touching_updated_at(self):
+        target = self.users[1]
+        updated_at = target.updated_at
+        self.client.force_authenticate(user=self.users[0])
+
+        response = self.client.post(reverse('interact'), {'to_user': target.id, 'action': 'like'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        target.refresh_from_db()
+        self.assertEqual(target.likes_count, 1)
+        self.assertEqual(target.updated_at, updated_at)
+
+    @override_settings(LIKES_COUNTER={'SHARDS': 4, 'HOT_THRESHOLD': 10})
+    def test_hot_profile_uses_shards_until_flush(self):
+        target = self.users[1]
+        User.objects.filter(pk=target.pk).update(likes_count=10)
+        target.refresh_from_db()
+
+        for _ in range(5):
+            increment_likes(target)
+
+        self.assertEqual(sum(LikesCounterShard.objects.values_list('delta', flat=True)), 5)
+        target.refresh_from_db()
+        self.assertEqual(target.likes_count, 10)
+
+        self.assertEqual(flush_likes_counters(), 1)
+        target.refresh_from_db()
+        self.assertEqual(target.likes_count, 15)
+        self.assertFalse(LikesCounterShard.objects.exists())
+
+    @override_settings(LIKES_COUNTER={'SHARDS': 4, 'HOT_THRESHOLD': 10})
+    def test_batch_increments_route_hot_profiles_to_shards(self):
+        hot, cold = self.users[1], self.users[2]
+        User.objects.filter(pk=hot.pk).update(likes_count=10)
+
+        increment_likes_many({hot.id: 2, cold.id: 1})
+
+        counts = dict(User.objects.values_list('id', 'likes_count'))
+        self.assertEqual((counts[hot.id], counts[cold.id]), (10, 1))
+        self.assertEqual(sum(LikesCounterShard.objects.filter(user=hot).values_list('delta', flat=True)), 2)
+        flush_likes_counters()
+        hot.refresh_from_db()
+        self.assertEqual(hot.likes_count, 12)
+
+    def test_reconcile_recomputes_from_interactions(self):
+        Interaction.objects.create(from_user=self.users[0], to_user=self.users[1], action='like')
+        Interaction.objects.create(from_user=self.users[2], to_user=self.users[1], action='like')
+        Interaction.objects.create(from_user=self.users[0], to_user=self.users[2], action='dislike')
+        User.objects.filter(pk=self.users[0].pk).update(likes_count=7)
+        LikesCounterShard.objects.create(user=self.users[1], shard=0, delta=3)
+
+        call_command('reconcile_likes_counters', chunk_size=2, stdout=StringIO())
+
+        counts = dict(User.objects.values_list('id', 'likes_count'))
+        self.assertEqual(counts, {self.users[0].id: 0, self.users[1].id: 2, self.users[2].id: 0})
+        self.assertFalse(LikesCounterShard.objects.exists())
@@ -0,0 +1,318 @@
+import sys
+import threading
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+from users.discovery import DiscoveryDeck
+from users.models import User
+from interactions.models import Interaction, ViewHistory
+from interactions.liked_you import LikedYouIndex
+from interactions.seen import SeenSet
+from users.pools import candidate_pools, pool_setting
+
+
+@override_settings(DISCOVERY_DECK={'BATCH_SIZE': 3, 'LOW_WATERMARK': 1, 'ASYNC_REFILL': False})
+class RandomUserDeckTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        candidate_pools.reset()
+        self.viewer = User.objects.create_user(
+            username='viewer',
+            email='viewer@test.com',
+            password='password123',
+            first_name='John',
+            last_name='Doe',
+            gender='M',
+            age=25,
+            city='Moscow'
+        )
+        self.candidates = [
+            User.objects.create_user(
+                username=f'candidate{i}',
+                email=f'candidate{i}@test.com',
+                password='password123',
+                first_name='Jane',
+                last_name='Doe',
+                gender='F',
+                age=20 + i,
+                city='Moscow' if i % 2 else 'Kazan'
+            )
+            for i in range(5)
+        ]
+        self.client.force_authenticate(user=self.viewer)
+
+    def test_random_user_returns_each_candidate_once(self):
+        url = reverse('random-user')
+        seen = []
+        for _ in range(len(self.candidates)):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.append(response.data['id'])
+
+        self.assertCountEqual(seen, [u.id for u in self.candidates])
+        self.assertEqual(
+            ViewHistory.objects.filter(viewer=self.viewer).count(),
+            len(self.candidates)
+        )
+
+        # Все кандидаты просмотрены - колода пуста
+        response = self.client.get(url)
+        self.assertNotIn('id', response.data)
+
+    def test_random_user_applies_filters(self):
+        url = reverse('random-user')
+        response = self.client.get(url, {'city': 'kazan'})
+        self.assertEqual(response.data['city'], 'Kazan')
+
+    def test_deck_skips_users_seen_through_another_deck(self):
+        ViewHistory.objects.create(viewer=self.viewer, viewed_user=self.candidates[0])
+        url = reverse('random-user')
+        returned = [self.client.get(url).data.get('id') for _ in range(5)]
+        self.assertNotIn(self.candidates[0].id, returned)
+
+    def test_refill_appends_to_queue_shared_by_concurrent_pops(self):
+        first, second = DiscoveryDeck(self.viewer.id, {}), DiscoveryDeck(self.viewer.id, {})
+        first.refill()
+        popped = [first.pop().id, second.pop().id]
+        # Пополнение между выдачами не теряет и не дублирует кандидатов в очереди
+        first.refill()
+        queued = second.queued_ids()
+        self.assertEqual(len(queued), len(self.candidates) - 2)
+        self.assertCountEqual(queued + popped, [u.id for u in self.candidates])
+
+    def test_refill_skips_positions_handed_out_on_empty_queue(self):
+        deck = DiscoveryDeck(self.viewer.id, {})
+        deck.refill()
+        # Три pop разобрали очередь, еще двое получили номера при пустом хвосте
+        for _ in range(5):
+            deck.next_position()
+        deck.refill()
+        queued = deck.queued_ids()
+        self.assertEqual(len(queued), 3)
+        self.assertCountEqual([deck.pop().id for _ in queued], queued)
+
+    def test_deck_rechecks_candidates_that_left_or_changed(self):
+        deck = DiscoveryDeck(self.viewer.id, {'max_age': 22})
+        deck.refill()
+        # Изменения мимо сигналов: пулы и очередь о них не знают
+        User.objects.filter(id=self.candidates[0].id).update(is_active=False)
+        User.objects.filter(id=self.candidates[1].id).update(age=30)
+        self.assertEqual(deck.pop().id, self.candidates[2].id)
+        self.assertIsNone(deck.pop())
+
+    def test_deck_skips_already_swiped_users(self):
+        for candidate in self.candidates[:4]:
+            Interaction.objects.create(from_user=self.viewer, to_user=candidate, action='dislike')
+        response = self.client.get(reverse('random-user'))
+        self.assertEqual(response.data['id'], self.candidates[4].id)
+
+
+class SeenSetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        candidate_pools.reset()
+        self.users = [
+            User.objects.create_user(
+                username=f'user{i}',
+                email=f'user{i}@test.com',
+                password='password123',
+                first_name='John',
+                last_name='Doe',
+                gender='M',
+                age=25,
+                city='Moscow'
+            )
+            for i in range(4)
+        ]
+        self.viewer = self.users[0]
+
+    def test_seen_set_is_updated_incrementally(self):
+        seen = SeenSet.for_viewer(self.viewer.id)
+        self.assertEqual(seen.filter_unseen([u.id for u in self.users[1:]]), [u.id for u in self.users[1:]])
+
+        ViewHistory.objects.create(viewer=self.viewer, viewed_user=self.users[1])
+        Interaction.objects.create(from_user=self.viewer, to_user=self.users[2], action='like')
+
+        seen = SeenSet.for_viewer(self.viewer.id)
+        self.assertTrue(seen.might_contain(self.users[1].id))
+        self.assertTrue(seen.contains(self.users[2].id))
+        self.assertEqual(seen.filter_unseen([u.id for u in self.users[1:]]), [self.users[3].id])
+
+    def test_concurrent_updates_keep_every_bit(self):
+        SeenSet.for_viewer(self.viewer.id)
+        user_ids = list(range(10000, 10400))
+
+        def record(ids):
+            for user_id in ids:
+                SeenSet.record(self.viewer.id, user_id)
+
+        threads = [threading.Thread(target=record, args=(user_ids[index::8],)) for index in range(8)]
+        # Частое переключение потоков, чтобы чтение и запись фильтра перемежались
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+
+        # Потерянный бит дал бы ложный отрицательный ответ
+        seen = SeenSet.for_viewer(self.viewer.id)
+        self.assertEqual([user_id for user_id in user_ids if not seen.might_contain(user_id)], [])
+        self.assertEqual(seen.count, len(user_ids))
+
+    def test_false_positive_is_resolved_exactly(self):
+        seen = SeenSet.for_viewer(self.viewer.id)
+        # Выставляем все биты - фильтр отвечает "возможно" на любой id
+        seen.bits = bytearray(b'\xff' * len(seen.bits))
+        self.assertFalse(seen.contains(self.users[3].id))
+        self.assertEqual(seen.filter_unseen([self.users[3].id]), [self.users[3].id])
+
+
+class CandidatePoolTests(APITestCase):
+    def setUp(self):
+        candidate_pools.reset()
+        self.users = [
+            User.objects.create_user(
+                username=f'user{i}',
+                email=f'user{i}@test.com',
+                password='password123',
+                first_name='Jane',
+                last_name='Doe',
+                gender='F' if i % 2 else 'M',
+                age=18 + i * 3,
+                city='Санкт-Петербург' if i < 4 else 'Москва'
+            )
+            for i in range(8)
+        ]
+
+    def test_sample_applies_segment_filters(self):
+        sample = candidate_pools.sample({'gender': 'F', 'min_age': 20, 'max_age': 28}, 10)
+        expected = [u.id for u in self.users if u.gender == 'F' and 20 <= u.age <= 28]
+        self.assertCountEqual(sample, expected)
+
+        sample = candidate_pools.sample({'city': '  санкт-ПЕТЕРБУРГ'}, 10)
+        self.assertCountEqual(sample, [u.id for u in self.users[:4]])
+
+    def test_pools_follow_user_changes(self):
+        candidate_pools.ensure_built()
+        moved = self.users[0]
+        moved.city = 'Казань'
+        moved.save()
+        self.assertEqual(candidate_pools.sample({'city': 'казань'}, 10), [moved.id])
+
+        moved.delete()
+        self.assertEqual(candidate_pools.sample({'city': 'казань'}, 10), [])
+
+    def test_updates_before_build_are_not_lost(self):
+        candidate_pools.ensure_built()
+        # Срок сборки истек, изменение приходит до пересборки
+        candidate_pools.backend.built_at -= pool_setting('REBUILD_INTERVAL')
+        moved = self.users[1]
+        moved.city = 'Казань'
+        moved.save()
+        self.assertEqual(candidate_pools.backend.members[moved.id][0].city, 'казань')
+        self.assertEqual(candidate_pools.sample({'city': 'казань'}, 10), [moved.id])
+
+    def test_only_matching_segments_are_sized(self):
+        candidate_pools.ensure_built()
+        backend = candidate_pools.backend
+        with patch.object(backend, 'segments', wraps=backend.segments) as segments, \
+                patch.object(backend, 'sizes', wraps=backend.sizes) as sizes:
+            for _ in range(3):
+                candidate_pools.sample({'gender': 'F', 'city': 'москва'}, 10)
+        # Список сегментов берется из кэша, размеры - только у подходящих
+        self.assertEqual(segments.call_count, 1)
+        self.assertEqual(sizes.call_count, 3)
+        for call in sizes.call_args_list:
+            self.assertTrue(all(segment.gender == 'F' and segment.city == 'москва' for segment in call.args[0]))
+
+
+@override_settings(DISCOVERY_DECK={'BATCH_SIZE': 3, 'LOW_WATERMARK': 1, 'ASYNC_REFILL': False, 'LIKED_YOU_RATIO': 1})
+class LikedYouTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        candidate_pools.reset()
+        self.users = [
+            User.objects.create_user(
+                username=f'user{i}',
+                email=f'user{i}@test.com',
+                password='password123',
+                first_name='Jane',
+                last_name='Doe',
+                gender='F' if i else 'M',
+                age=25,
+                city='Moscow'
+            )
+            for i in range(6)
+        ]
+        self.viewer = self.users[0]
+
+    def swipe(self, from_user, to_user, action='like'):
+        self.client.force_authenticate(user=from_user)
+        return self.client.post(reverse('interact'), {'to_user': to_user.id, 'action': action})
+
+    def test_index_tracks_unanswered_likes(self):
+        LikedYouIndex.get(self.viewer.id)
+        self.swipe(self.users[1], self.viewer)
+        self.swipe(self.users[2], self.viewer)
+        self.swipe(self.users[3], self.viewer, 'dislike')
+        self.assertEqual(LikedYouIndex.get(self.viewer.id), [self.users[1].id, self.users[2].id])
+
+        # Ответный свайп убирает лайк из индекса, а лайк тому, кто уже ответил, в индекс не попадает
+        self.swipe(self.viewer, self.users[2], 'dislike')
+        self.swipe(self.viewer, self.users[4])
+        self.swipe(self.users[4], self.viewer)
+        self.assertEqual(LikedYouIndex.get(self.viewer.id), [self.users[1].id])
+        self.assertEqual(LikedYouIndex.build(self.viewer.id), [self.users[1].id])
+
+    def test_concurrent_adds_and_removes_are_kept(self):
+        answered, new = list(range(10000, 10100)), list(range(20000, 20100))
+        cache.set(LikedYouIndex.cache_key(self.viewer.id), answered, 60)
+
+        def add(ids):
+            for liker_id in ids:
+                LikedYouIndex.add(self.viewer.id, liker_id)
+
+        def remove(ids):
+            for liker_id in ids:
+                LikedYouIndex.remove(self.viewer.id, [liker_id])
+
+        threads = [threading.Thread(target=add, args=(new[index::4],)) for index in range(4)] + [
+            threading.Thread(target=remove, args=(answered[index::4],)) for index in range(4)
+        ]
+        # Частое переключение потоков, чтобы чтение и запись списка перемежались
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+
+        self.assertCountEqual(LikedYouIndex.get(self.viewer.id), new)
+
+    def test_deck_mixes_in_likers(self):
+        self.swipe(self.users[5], self.viewer)
+        self.client.force_authenticate(user=self.viewer)
+        response = self.client.get(reverse('random-user'))
+        self.assertEqual(response.data['id'], self.users[5].id)
+
+        # Лайкнувший показан один раз, дальше колода идет как обычно
+        response = self.client.get(reverse('random-user'))
+        self.assertNotEqual(response.data['id'], self.users[5].id)
+        self.assertEqual(LikedYouIndex.get(self.viewer.id), [])
+
+        # Фильтры колоды действуют и на лайкнувших
+        self.swipe(self.users[4], self.viewer)
+        self.client.force_authenticate(user=self.viewer)
+        response = self.client.get(reverse('random-user'), {'gender': 'M'})
+        self.assertNotEqual(response.data.get('id'), self.users[4].id)
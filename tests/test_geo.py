@@ -0,0 +1,58 @@
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+from users.geo import encode_geohash
+from users.models import User
+from users.pools import candidate_pools
+
+
+@override_settings(DISCOVERY_DECK={'BATCH_SIZE': 10, 'ASYNC_REFILL': False})
+class GeoSearchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        candidate_pools.reset()
+        # Центр Москвы, Химки (~20 км), Подольск (~38 км) и Санкт-Петербург
+        locations = [(55.7558, 37.6173), (55.8970, 37.4297), (55.4242, 37.5547), (59.9343, 30.3351)]
+        self.users = [
+            User.objects.create_user(
+                username=f'user{i}',
+                email=f'user{i}@test.com',
+                password='password123',
+                first_name='Jane',
+                last_name='Doe',
+                gender='F',
+                age=25,
+                city='Москва',
+                latitude=latitude,
+                longitude=longitude
+            )
+            for i, (latitude, longitude) in enumerate(locations)
+        ]
+        self.viewer = self.users[0]
+        self.client.force_authenticate(user=self.viewer)
+
+    def test_geohash_is_saved(self):
+        self.assertEqual(self.viewer.geohash, encode_geohash(55.7558, 37.6173))
+        self.viewer.latitude = None
+        self.viewer.save(update_fields=['latitude'])
+        self.viewer.refresh_from_db()
+        self.assertEqual(self.viewer.geohash, '')
+
+    def test_radius_filter_uses_viewer_location(self):
+        response = self.client.get(reverse('user-list'), {'radius_km': 30})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([u['id'] for u in response.data['results']], [self.users[1].id])
+
+        response = self.client.get(reverse('user-list'), {'radius_km': 50})
+        self.assertCountEqual([u['id'] for u in response.data['results']], [u.id for u in self.users[1:3]])
+
+    def test_random_user_within_radius(self):
+        url = reverse('random-user')
+        returned = {self.client.get(url, {'radius_km': 50}).data.get('id') for _ in range(3)}
+        self.assertEqual(returned, {self.users[1].id, self.users[2].id, None})
+
+    def test_radius_requires_location(self):
+        response = self.client.get(reverse('user-list'), {'radius_km': 10, 'lat': 'north'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,33 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from users.pools import candidate_pools
+
+
+class LoadTestCommandTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        candidate_pools.reset()
+
+    def run_load_test(self, **options):
+        out = StringIO()
+        call_command(
+            'load_test', users=60, interactions=300, clients=1, requests=2,
+            latency_scale=0, workers=1, stdout=out, **options
+        )
+        return out.getvalue()
+
+    def test_every_endpoint_within_query_budget(self):
+        # Бюджеты запросов ловят N+1; задержки в тестах не проверяются
+        output = self.run_load_test()
+        self.assertIn('27 endpoints', output)
+        self.assertIn('All endpoints within budget', output)
+
+    @override_settings(LOAD_TEST_BUDGETS={'GET matches': (1, None)})
+    def test_exceeded_budget_fails(self):
+        with self.assertRaisesMessage(CommandError, 'GET matches: 2 queries > budget 1'):
+            self.run_load_test(endpoints='GET matches')
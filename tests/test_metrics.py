@@ -0,0 +1,94 @@
+import gc
+import threading
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from core.metrics import MemoryMetricsBackend, MetricsRegistry, metrics
+from users.models import User
+
+
+@override_settings(METRICS={'ENABLED': True, 'BACKEND': 'memory', 'TOKEN': 'secret'})
+class MetricsEndpointTests(APITestCase):
+    def setUp(self):
+        metrics.reset()
+        self.user1 = User.objects.create_user(
+            username='user1', email='user1@test.com', password='password123',
+            first_name='John', last_name='Doe', gender='M', age=25, city='Moscow'
+        )
+        self.user2 = User.objects.create_user(
+            username='user2', email='user2@test.com', password='password123',
+            first_name='Jane', last_name='Smith', gender='F', age=23, city='Moscow'
+        )
+        self.client.force_authenticate(user=self.user1)
+
+    def test_requests_and_swipes_are_exported(self):
+        self.client.get(reverse('matches'))
+        self.client.post(reverse('interact'), {'to_user': self.user2.id, 'action': 'like'})
+
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        lines = response.content.decode().splitlines()
+        self.assertIn('dating_http_requests_total{view="matches",method="GET",status="2xx"} 1', lines)
+        self.assertIn('dating_swipes_total{action="like"} 1', lines)
+        # Последняя корзина гистограммы совпадает с числом наблюдений
+        self.assertIn('dating_http_request_duration_seconds_bucket{view="interact",le="+Inf"} 1', lines)
+        self.assertIn('dating_http_request_duration_seconds_count{view="interact"} 1', lines)
+
+    def test_token_required(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS={'ENABLED': True, 'BACKEND': 'memory', 'TOKEN': ''})
+    def test_closed_without_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+
+
+class MetricsRegistryTests(SimpleTestCase):
+    def test_processes_sum_in_shared_backend(self):
+        # Два реестра с общим бэкендом - как два процесса с общим Redis
+        backend = MemoryMetricsBackend()
+        registries = [MetricsRegistry(backend), MetricsRegistry(backend)]
+        counters = [registry.counter('swipes_total', 'Swipes', ('action',)) for registry in registries]
+
+        def swipe(counter):
+            for _ in range(1000):
+                counter.inc('like')
+
+        threads = [threading.Thread(target=swipe, args=(counter,)) for counter in counters for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        registries[0].flush()
+        # Повторный сброс без новых событий ничего не добавляет
+        registries[0].flush()
+
+        self.assertIn('dating_swipes_total{action="like"} 8000', registries[1].render().splitlines())
+
+    def test_finished_threads_are_folded_into_totals(self):
+        registry = MetricsRegistry(MemoryMetricsBackend())
+        counter = registry.counter('swipes_total', 'Swipes', ('action',))
+        histogram = registry.histogram('latency_seconds', 'Latency')
+
+        def request():
+            counter.inc('like')
+            histogram.observe(0.02)
+
+        # Поток на запрос, как у runserver и многопоточного WSGI
+        for batch in range(3):
+            threads = [threading.Thread(target=request) for _ in range(50)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            gc.collect()
+            registry.flush()
+
+        self.assertLessEqual(len(registry._shards), 1)
+        lines = registry.render().splitlines()
+        self.assertIn('dating_swipes_total{action="like"} 150', lines)
+        self.assertIn('dating_latency_seconds_count 150', lines)
@@ -0,0 +1,44 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Count, F, Q
+from rest_framework.test import APITestCase
+from interactions.models import Interaction, Match, MatchMembership
+from users.mock_data import generate_interactions, make_context
+from users.models import User, UserTag
+from users.tags import parse_hobbies
+
+
+class GenerateMockDataTests(APITestCase):
+    def test_generates_consistent_dataset(self):
+        call_command(
+            'generate_mock_data', users=30, interactions=400, workers=1, chunk_size=7, cities=3, stdout=StringIO()
+        )
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Interaction.objects.count(), 400)
+        self.assertFalse(Interaction.objects.filter(from_user=F('to_user')).exists())
+
+        # Мэтч - ровно на каждую пару взаимных лайков
+        mutual = {
+            (min(a, b), max(a, b))
+            for a, b in Interaction.objects.filter(action='like').values_list('from_user_id', 'to_user_id')
+            if Interaction.objects.filter(from_user_id=b, to_user_id=a, action='like').exists()
+        }
+        self.assertEqual(set(Match.objects.values_list('user1_id', 'user2_id')), mutual)
+        self.assertEqual(MatchMembership.objects.count(), 2 * len(mutual))
+
+        user = User.objects.annotate(
+            likes=Count('received_interactions', filter=Q(received_interactions__action='like'))
+        ).order_by('-likes').first()
+        self.assertEqual(user.likes_count, user.likes)
+        self.assertEqual(
+            set(UserTag.objects.filter(user=user).values_list('tag__normalized_name', flat=True)),
+            set(parse_hobbies(user.hobbies))
+        )
+        self.assertIsNotNone(user.city_ref)
+        self.assertEqual(User.objects.create(username='next', email='next@test.com', age=30).id, 31)
+
+    def test_same_seed_same_swipes(self):
+        context = make_context(7, User().date_joined, '', [('Москва', None, 55.75, 37.62)], {})
+        task = (0, 1, 10, 50, 1, 10, context, 'rows')
+        self.assertEqual(generate_interactions(task), generate_interactions(task))
@@ -0,0 +1,71 @@
+from asgiref.sync import sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.test import TransactionTestCase, override_settings
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from core.asgi import application
+from users.models import User
+
+
+# database_sync_to_async закрывает соединения, поэтому тесты без обертки в транзакцию
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class NotificationConsumerTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create_user(
+            username='user1',
+            email='user1@test.com',
+            password='password123',
+            first_name='John',
+            last_name='Doe',
+            gender='M',
+            age=25,
+            city='Moscow'
+        )
+        self.user2 = User.objects.create_user(
+            username='user2',
+            email='user2@test.com',
+            password='password123',
+            first_name='Jane',
+            last_name='Doe',
+            gender='F',
+            age=23,
+            city='Moscow'
+        )
+
+    async def connect(self, user):
+        token = await sync_to_async(AccessToken.for_user)(user)
+        communicator = WebsocketCommunicator(application, f'/ws/notifications/?token={token}')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    def swipe(self, from_user, to_user, action='like'):
+        client = APIClient()
+        client.force_authenticate(user=from_user)
+        return client.post(reverse('interact'), {'to_user': to_user.id, 'action': action})
+
+    async def test_like_and_match_are_pushed(self):
+        communicator1 = await self.connect(self.user1)
+        communicator2 = await self.connect(self.user2)
+
+        await sync_to_async(self.swipe)(self.user1, self.user2)
+        event = await communicator2.receive_json_from()
+        self.assertEqual(event['event'], 'like')
+        self.assertEqual(event['from_user'], self.user1.id)
+
+        await sync_to_async(self.swipe)(self.user2, self.user1)
+        self.assertEqual((await communicator1.receive_json_from())['event'], 'like')
+        self.assertEqual((await communicator1.receive_json_from())['event'], 'match')
+        self.assertEqual((await communicator2.receive_json_from())['partner'], self.user1.id)
+
+        await communicator1.disconnect()
+        await communicator2.disconnect()
+
+    async def test_connection_without_token_is_rejected(self):
+        communicator = WebsocketCommunicator(application, '/ws/notifications/?token=invalid')
+        connected, code = await communicator.connect()
+        self.assertFalse(connected)
+        self.assertEqual(code, 4401)
@@ -0,0 +1,72 @@
+import base64
+import json
+
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+from users.models import User
+from interactions.models import ViewHistory
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                username=f'user{i}',
+                email=f'user{i}@test.com',
+                password='password123',
+                first_name='John',
+                last_name='Doe',
+                gender='M',
+                age=25,
+                city='Moscow'
+            )
+            for i in range(6)
+        ]
+        self.viewer = self.users[0]
+        self.client.force_authenticate(user=self.viewer)
+
+    def collect_pages(self, url, params):
+        ids = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids += [item['id'] for item in response.data['results']]
+            if not response.data['next']:
+                return ids
+            response = self.client.get(response.data['next'])
+
+    def test_user_list_walks_all_pages_in_order(self):
+        ids = self.collect_pages(reverse('user-list'), {'page_size': 2})
+        expected = sorted(
+            self.users[1:], key=lambda u: (u.created_at, u.id), reverse=True
+        )
+        self.assertEqual(ids, [u.id for u in expected])
+
+    def test_view_history_orders_by_viewed_at(self):
+        views = [
+            ViewHistory.objects.create(viewer=self.viewer, viewed_user=user)
+            for user in self.users[1:]
+        ]
+        ids = self.collect_pages(reverse('view-history'), {'page_size': 3})
+        self.assertEqual(ids, [v.id for v in reversed(views)])
+
+    def test_approximate_count_is_opt_in(self):
+        response = self.client.get(reverse('user-list'), {'count': 'approx'})
+        self.assertIn('count', response.data)
+        if connection.vendor == 'postgresql':
+            self.skipTest('На Postgres count - оценка планировщика, а не точное число')
+        self.assertEqual(response.data['count'], len(self.users) - 1)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('user-list'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tampered_cursor(self):
+        for values in (['not a date', 1], ['2024-01-01T00:00:00+00:00', 'x'], [None, None], [[1], {}]):
+            with self.subTest(values=values):
+                cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+                response = self.client.get(reverse('user-list'), {'cursor': cursor})
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,69 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APITestCase
+from rest_framework import status
+from users.models import User, UserPhoto
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class PhotoVariantTests(APITestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='user1',
+            email='user1@test.com',
+            password='password123',
+            first_name='John',
+            last_name='Doe',
+            gender='M',
+            age=25,
+            city='Moscow'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def upload(self):
+        # Снимок 2000x1000, который по EXIF нужно повернуть на 90 градусов
+        image = Image.new('RGB', (2000, 1000), 'red')
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        buffer = BytesIO()
+        image.save(buffer, 'JPEG', exif=exif)
+        upload = SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+        response = self.client.post(reverse('user-photos'), {'photo': upload, 'is_main': True})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return UserPhoto.objects.get(pk=response.data['id'])
+
+    def test_upload_generates_variants_without_exif(self):
+        photo = self.upload()
+        self.assertEqual(set(photo.variants), {'thumb', 'card', 'full'})
+
+        card = photo.variants['card']
+        self.assertEqual((card['width'], card['height']), (240, 480))
+        for fmt in ('webp', 'jpeg'):
+            with default_storage.open(card[fmt]) as variant_file:
+                variant = Image.open(variant_file)
+                self.assertEqual(variant.size, (240, 480))
+                self.assertFalse(variant.getexif())
+
+    def test_photo_size_selects_variant(self):
+        photo = self.upload()
+        response = self.client.get(
+            reverse('user-photos'), {'photo_size': 'thumb'}, HTTP_ACCEPT='image/webp,*/*'
+        )
+        item = response.data['results'][0]
+        self.assertEqual(list(item['variants']), ['thumb'])
+        self.assertTrue(item['photo'].endswith(photo.variants['thumb']['webp']))
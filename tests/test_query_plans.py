@@ -0,0 +1,23 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from rest_framework.test import APITestCase
+from users.pools import candidate_pools
+
+
+class QueryPlanSnapshotTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        candidate_pools.reset()
+
+    def test_hot_query_plans_match_snapshot(self):
+        # Датасет по умолчанию - тот, на котором записаны core/plan_snapshots
+        out = StringIO()
+        try:
+            call_command('explain_hot_queries', check=True, stdout=out)
+        except CommandError as error:
+            # В выводе - разница планов со снимком
+            self.fail(f'{error}\n{out.getvalue()}')
+        self.assertIn('9 plans match the snapshot', out.getvalue())
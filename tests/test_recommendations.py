@@ -0,0 +1,79 @@
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from interactions.models import Interaction
+from interactions.services import record_swipe, record_swipes_bulk
+from users.compatibility import compatibility_index
+from users.models import Recommendation, User
+from users.pools import candidate_pools
+from users.recommendations import refresh_recommendations, stale_user_ids
+
+
+class RecommendationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        candidate_pools.reset()
+        compatibility_index.reset()
+        self.viewer = self.create_user('viewer', 'M', 30, 'Москва', 'книги, кино')
+        self.twin = self.create_user('twin', 'F', 30, 'Москва', 'книги, кино')
+        self.older = self.create_user('older', 'F', 38, 'Москва', 'рыбалка')
+        self.far_age = self.create_user('far', 'F', 60, 'Москва', 'книги, кино')
+        self.other_city = self.create_user('kazan', 'F', 30, 'Казань', 'книги, кино')
+        self.client.force_authenticate(user=self.viewer)
+
+    def create_user(self, name, gender, age, city, hobbies):
+        return User.objects.create_user(
+            username=name,
+            email=f'{name}@test.com',
+            password='password123',
+            first_name=name,
+            last_name='Doe',
+            gender=gender,
+            age=age,
+            city=city,
+            hobbies=hobbies
+        )
+
+    def test_ranking_and_endpoint(self):
+        self.assertEqual(refresh_recommendations(), 5)
+        recommendation = Recommendation.objects.get(user=self.viewer)
+        # Другой город и большая разница в возрасте отсекаются, похожие хобби - выше
+        self.assertEqual(recommendation.candidate_ids, [self.twin.id, self.older.id])
+
+        # Лайк из другого города добавляет лайкнувшего в список получателя
+        record_swipe(self.other_city, self.viewer, 'super_like')
+        self.assertEqual(list(stale_user_ids()), [self.viewer.id])
+        self.assertEqual(refresh_recommendations(), 1)
+        recommendation.refresh_from_db()
+        self.assertCountEqual(recommendation.candidate_ids[:2], [self.other_city.id, self.twin.id])
+        self.assertEqual(recommendation.candidate_ids[2], self.older.id)
+
+        # Свайпнутые кандидаты не отдаются, даже если список еще не пересчитан
+        Interaction.objects.create(from_user=self.viewer, to_user=self.other_city, action='dislike')
+        response = self.client.get(reverse('recommended-users'))
+        self.assertEqual([row['id'] for row in response.data], [self.twin.id, self.older.id])
+        self.assertEqual(set(response.data[0]), {'id', 'first_name', 'age', 'city', 'photo'})
+
+    def test_bulk_likes_mark_recipients_stale(self):
+        refresh_recommendations()
+        record_swipes_bulk(self.twin, [
+            {'to_user': self.viewer.id, 'action': 'like'},
+            {'to_user': self.older.id, 'action': 'dislike'},
+            {'to_user': self.far_age.id, 'action': 'super_like'},
+        ])
+        self.assertCountEqual(stale_user_ids(), [self.viewer.id, self.far_age.id])
+
+    def test_incremental_refresh_only_ranks_changed_users(self):
+        refresh_recommendations()
+        self.assertEqual(refresh_recommendations(), 0)
+
+        self.older.hobbies = 'книги, кино'
+        self.older.save()
+        self.assertEqual(refresh_recommendations(), 1)
+        self.assertEqual(refresh_recommendations(full=True), 5)
+
+    def test_endpoint_without_precomputed_list(self):
+        response = self.client.get(reverse('recommended-users'), {'limit': 2})
+        self.assertEqual(len(response.data), 2)
+        # Без расчета - выборка из пулов по совместимости тегов
+        self.assertIn(response.data[0]['id'], [self.twin.id, self.far_age.id, self.other_city.id])
@@ -0,0 +1,33 @@
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from users.models import User
+
+
+class RegistrationTests(APITestCase):
+    def register(self, email):
+        return self.client.post(reverse('register'), {
+            'email': email,
+            'first_name': 'Jane',
+            'last_name': 'Doe',
+            'gender': 'F',
+            'age': 25,
+            'city': 'Moscow',
+            'password': 'Sup3r-secret-pass',
+            'password_confirm': 'Sup3r-secret-pass',
+        })
+
+    def test_username_defaults_to_email(self):
+        for email in ['first@test.com', 'second@test.com']:
+            self.assertEqual(self.register(email).status_code, status.HTTP_201_CREATED)
+            self.assertEqual(User.objects.get(email=email).username, email)
+
+    def test_long_emails_get_unique_usernames(self):
+        local_part = 'a' * 150
+        emails = [f'{local_part}@first.com', f'{local_part}@second.com']
+        for email in emails:
+            self.assertEqual(self.register(email).status_code, status.HTTP_201_CREATED)
+        usernames = [User.objects.get(email=email).username for email in emails]
+        self.assertEqual(len(set(usernames)), 2)
+        self.assertTrue(all(len(username) <= 150 for username in usernames))
+        self.assertTrue(all(username.startswith(local_part[:100]) for username in usernames))
@@ -0,0 +1,49 @@
+import json
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from core.middleware import RequestTimings, query_signature
+from users.models import User
+
+
+@override_settings(REQUEST_TIMING={'ENABLED': True, 'SLOW_REQUEST_MS': 0, 'STACK_SAMPLE_RATE': 1})
+class RequestTimingTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='user1',
+            email='user1@test.com',
+            password='password123',
+            first_name='John',
+            last_name='Doe',
+            gender='M',
+            age=25,
+            city='Moscow'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_server_timing_and_slow_request_log(self):
+        with self.assertLogs('core.request_timing', 'WARNING') as logs:
+            response = self.client.get(reverse('matches'))
+        metrics = {item.split(';')[0] for item in response['Server-Timing'].split(', ')}
+        self.assertEqual(metrics, {'total', 'view', 'db', 'serializer'})
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], reverse('matches'))
+        self.assertGreaterEqual(record['queries'], 1)
+        self.assertEqual(record['duplicates'], [])
+
+
+class QuerySignatureTests(SimpleTestCase):
+    def test_repeated_queries_are_reported_as_duplicates(self):
+        timings = RequestTimings(sample_stacks=True)
+        for user_id in range(3):
+            timings(lambda *args: None, f'SELECT * FROM users_user WHERE id = {user_id}', None, False, {})
+        timings(lambda *args: None, 'SELECT * FROM users_user WHERE id IN (%s, %s)', None, False, {})
+
+        duplicates = timings.duplicates()
+        self.assertEqual(len(duplicates), 1)
+        self.assertEqual(duplicates[0]['count'], 3)
+        self.assertTrue(any('test_request_timing.py' in frame for frame in duplicates[0]['stack']))
+        self.assertIn('dup;desc="3 repeated queries"', timings.server_timing(1.0))
+        self.assertEqual(query_signature('id IN (%s, %s, %s)'), query_signature('id IN (%s)'))
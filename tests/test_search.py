@@ -0,0 +1,61 @@
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+from users.models import User, UserProfile
+from users.search import memory_index
+
+
+class UserSearchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        memory_index.reset()
+        self.viewer = self.create_user('viewer', hobbies='')
+        self.dancer = self.create_user('dancer', hobbies='танцы, походы в горы')
+        self.writer = self.create_user('writer', hobbies='книги')
+        UserProfile.objects.update_or_create(
+            user=self.writer, defaults={'bio': 'Люблю танцы и джаз', 'profession': 'Редактор'}
+        )
+        self.client.force_authenticate(user=self.viewer)
+
+    def create_user(self, name, hobbies):
+        return User.objects.create_user(
+            username=name,
+            email=f'{name}@test.com',
+            password='password123',
+            first_name=name,
+            last_name='Doe',
+            gender='F',
+            age=25,
+            city='Moscow',
+            hobbies=hobbies
+        )
+
+    def test_search_is_ranked_by_field_weight(self):
+        response = self.client.get(reverse('user-search'), {'q': 'танцы'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Совпадение в хобби весит больше, чем в описании
+        self.assertEqual([u['id'] for u in response.data['results']], [self.dancer.id, self.writer.id])
+        self.assertGreater(response.data['results'][0]['rank'], response.data['results'][1]['rank'])
+
+        response = self.client.get(reverse('user-search'), {'q': 'танцы джаз'})
+        self.assertEqual([u['id'] for u in response.data['results']], [self.writer.id])
+
+    def test_search_pages_follow_rank(self):
+        url = reverse('user-search')
+        first = self.client.get(url, {'q': 'танцы', 'page_size': 1})
+        second = self.client.get(first.data['next'])
+        self.assertEqual(
+            [u['id'] for u in first.data['results'] + second.data['results']],
+            [self.dancer.id, self.writer.id]
+        )
+        self.assertIsNone(second.data['next'])
+
+    def test_profile_changes_are_indexed(self):
+        profile = UserProfile.objects.get(user=self.writer)
+        profile.bio = 'Люблю рыбалку'
+        profile.save()
+        response = self.client.get(reverse('user-search'), {'q': 'рыбалку'})
+        self.assertEqual([u['id'] for u in response.data['results']], [self.writer.id])
+        response = self.client.get(reverse('user-search'), {'q': 'джаз'})
+        self.assertEqual(response.data['results'], [])
@@ -0,0 +1,135 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+from users.models import User
+from interactions.models import Interaction, Match, MatchMembership
+
+
+class SwipePipelineTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create_user(
+            username='user1',
+            email='user1@test.com',
+            password='password123',
+            first_name='John',
+            last_name='Doe',
+            gender='M',
+            age=25,
+            city='Moscow'
+        )
+        self.user2 = User.objects.create_user(
+            username='user2',
+            email='user2@test.com',
+            password='password123',
+            first_name='Jane',
+            last_name='Doe',
+            gender='F',
+            age=23,
+            city='Moscow'
+        )
+
+    def swipe(self, from_user, to_user, action='like'):
+        self.client.force_authenticate(user=from_user)
+        return self.client.post(reverse('interact'), {'to_user': to_user.id, 'action': action})
+
+    def test_mutual_like_reports_match(self):
+        response = self.swipe(self.user1, self.user2)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(response.data['match_created'])
+
+        response = self.swipe(self.user2, self.user1)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(response.data['match_created'])
+
+        match = Match.objects.get(user1=self.user1, user2=self.user2)
+        self.assertEqual(response.data['match_id'], match.id)
+        self.assertEqual(Interaction.objects.count(), 2)
+        self.assertEqual(
+            set(MatchMembership.objects.filter(match=match).values_list('user_id', 'partner_id')),
+            {(self.user1.id, self.user2.id), (self.user2.id, self.user1.id)}
+        )
+
+        # Мэтч виден обоим участникам, пока активен
+        self.client.force_authenticate(user=self.user1)
+        self.assertEqual([item['id'] for item in self.client.get(reverse('matches')).data['results']], [match.id])
+        match.is_active = False
+        match.save()
+        self.assertEqual(self.client.get(reverse('matches')).data['results'], [])
+
+    def test_dislike_does_not_match(self):
+        self.swipe(self.user1, self.user2)
+        response = self.swipe(self.user2, self.user1, 'dislike')
+        self.assertFalse(response.data['match_created'])
+        self.assertFalse(Match.objects.exists())
+
+    def test_repeated_swipe_is_rejected(self):
+        self.swipe(self.user1, self.user2)
+        response = self.swipe(self.user1, self.user2, 'dislike')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.user2.refresh_from_db()
+        self.assertEqual(self.user2.likes_count, 1)
+
+    def test_benchmark_command_leaves_no_data(self):
+        out = StringIO()
+        call_command('benchmark_swipes', users=6, swipes=10, stdout=out)
+        self.assertIn('swipe pipeline', out.getvalue())
+        self.assertEqual(User.objects.count(), 2)
+
+
+class BatchSwipeTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [
+            User.objects.create_user(
+                username=f'user{i}',
+                email=f'user{i}@test.com',
+                password='password123',
+                first_name='John',
+                last_name='Doe',
+                gender='M',
+                age=25,
+                city='Moscow'
+            )
+            for i in range(5)
+        ]
+        self.me = self.users[0]
+        self.client.force_authenticate(user=self.me)
+
+    def test_batch_reports_per_item_results(self):
+        Interaction.objects.create(from_user=self.users[1], to_user=self.me, action='like')
+        Interaction.objects.create(from_user=self.me, to_user=self.users[4], action='dislike')
+
+        items = [
+            {'to_user': self.users[1].id, 'action': 'like'},
+            {'to_user': self.users[2].id, 'action': 'like'},
+            {'to_user': self.users[3].id, 'action': 'dislike'},
+            {'to_user': self.users[2].id, 'action': 'dislike'},
+            {'to_user': self.users[4].id, 'action': 'like'},
+            {'to_user': self.me.id, 'action': 'like'},
+            {'to_user': 999999, 'action': 'like'},
+        ]
+        response = self.client.post(reverse('interact-batch'), {'items': items}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        statuses = [result['status'] for result in response.data['results']]
+        self.assertEqual(
+            statuses,
+            ['created', 'created', 'created', 'duplicate', 'duplicate', 'invalid', 'invalid']
+        )
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(response.data['matches_created'], 1)
+
+        first = response.data['results'][0]
+        self.assertTrue(first['match_created'])
+        self.assertEqual(first['match_id'], Match.objects.get().id)
+        self.assertEqual(MatchMembership.objects.filter(match_id=first['match_id']).count(), 2)
+
+        likes = dict(User.objects.values_list('id', 'likes_count'))
+        self.assertEqual(likes[self.users[1].id], 1)
+        self.assertEqual(likes[self.users[2].id], 1)
+        self.assertEqual(likes[self.users[3].id], 0)
@@ -0,0 +1,80 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+from users.models import User, UserPhoto, UserProfile
+from users.tasks import create_user_profile
+from interactions.models import Interaction
+from interactions.tasks import increment_likes_count
+
+
+class SideEffectTaskTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create_user(
+            username='user1',
+            email='user1@test.com',
+            password='password123',
+            first_name='John',
+            last_name='Doe',
+            gender='M',
+            age=25,
+            city='Moscow'
+        )
+        self.user2 = User.objects.create_user(
+            username='user2',
+            email='user2@test.com',
+            password='password123',
+            first_name='Jane',
+            last_name='Doe',
+            gender='F',
+            age=23,
+            city='Moscow'
+        )
+
+    def test_likes_task_is_idempotent(self):
+        interaction = Interaction.objects.create(from_user=self.user1, to_user=self.user2, action='like')
+        # Повторная доставка той же задачи не должна увеличить счетчик дважды
+        increment_likes_count.apply(args=(interaction.id, self.user2.id))
+        increment_likes_count.apply(args=(interaction.id, self.user2.id))
+        self.user2.refresh_from_db()
+        self.assertEqual(self.user2.likes_count, 1)
+
+    def test_task_interrupted_midway_runs_again(self):
+        interaction = Interaction.objects.create(from_user=self.user1, to_user=self.user2, action='like')
+        # Воркер прерван посреди задачи - отметки о выполнении нет
+        with patch('interactions.tasks.increment_likes', side_effect=SystemExit):
+            with self.assertRaises(SystemExit):
+                increment_likes_count.apply(args=(interaction.id, self.user2.id))
+        increment_likes_count.apply(args=(interaction.id, self.user2.id))
+        increment_likes_count.apply(args=(interaction.id, self.user2.id))
+        self.user2.refresh_from_db()
+        self.assertEqual(self.user2.likes_count, 1)
+
+    def test_profile_task_is_idempotent(self):
+        create_user_profile.apply(args=(self.user1.id,))
+        create_user_profile.apply(args=(self.user1.id,))
+        self.assertEqual(UserProfile.objects.filter(user=self.user1).count(), 1)
+
+    def test_new_main_photo_unsets_previous(self):
+        first = UserPhoto.objects.create(user=self.user1, photo='user_photos/1.jpg', is_main=True)
+        second = UserPhoto.objects.create(user=self.user1, photo='user_photos/2.jpg', is_main=True)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertFalse(first.is_main)
+        self.assertTrue(second.is_main)
+
+    def test_main_photo_switch_does_not_wait_for_tasks(self):
+        # С брокером задачи выполняются позже и в любом порядке - смена главного
+        # фото не должна от них зависеть, даже если ни одна еще не выполнилась
+        with patch('users.signals.enqueue') as enqueue:
+            first = UserPhoto.objects.create(user=self.user1, photo='user_photos/1.jpg', is_main=True)
+            second = UserPhoto.objects.create(user=self.user1, photo='user_photos/2.jpg', is_main=True)
+            first.is_main = True
+            first.save()
+        self.assertEqual(len(enqueue.call_args_list), 2)
+        self.assertEqual(
+            list(UserPhoto.objects.filter(user=self.user1, is_main=True).values_list('id', flat=True)), [first.id]
+        )
+        second.refresh_from_db()
+        self.assertFalse(second.is_main)
@@ -0,0 +1,96 @@
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from .models import City, CityAlias
+
+
+# Частые сокращения и транслитерации: нормализованный алиас -> каноническое название
+KNOWN_ALIASES = {
+    'спб': 'Санкт-Петербург',
+    'питер': 'Санкт-Петербург',
+    'saint petersburg': 'Санкт-Петербург',
+    'st. petersburg': 'Санкт-Петербург',
+    'мск': 'Москва',
+    'moscow': 'Москва',
+    'екб': 'Екатеринбург',
+    'нск': 'Новосибирск',
+}
+
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_TTL = 60 * 5
+MATCH_TTL = 60
+
+
+def normalize_city(city):
+    return ' '.join((city or '').replace('ё', 'е').replace('Ё', 'Е').casefold().split())
+
+
+def resolve_city(name):
+    """
+    Возвращает City для написанного пользователем названия: по алиасу, а
+    если его нет - создает город (или алиас известного сокращения).
+    """
+    normalized = normalize_city(name)
+    if not normalized:
+        return None
+    alias = CityAlias.objects.select_related('city').filter(normalized_name=normalized).first()
+    if alias is not None:
+        return alias.city
+
+    canonical_name = KNOWN_ALIASES.get(normalized, ' '.join(name.split()))
+    try:
+        with transaction.atomic():
+            city, _ = City.objects.get_or_create(
+                normalized_name=normalize_city(canonical_name),
+                defaults={'name': canonical_name}
+            )
+            CityAlias.objects.get_or_create(normalized_name=city.normalized_name, defaults={'city': city})
+            if normalized != city.normalized_name:
+                CityAlias.objects.create(city=city, normalized_name=normalized)
+    except IntegrityError:
+        # Тот же город параллельно создал другой запрос
+        return CityAlias.objects.select_related('city').get(normalized_name=normalized).city
+    return city
+
+
+def matching_aliases(query):
+    normalized = normalize_city(query)
+    return CityAlias.objects.filter(normalized_name__contains=normalized)
+
+
+def matching_city_names(query):
+    """Нормализованные канонические названия городов, алиасы которых содержат query."""
+    normalized = normalize_city(query)
+    key = f'city-match:{normalized}'
+    names = cache.get(key)
+    if names is None:
+        names = set(matching_aliases(normalized).values_list('city__normalized_name', flat=True))
+        cache.set(key, names, MATCH_TTL)
+    return names
+
+
+def autocomplete_cities(query, limit=AUTOCOMPLETE_LIMIT):
+    """Сначала города, начинающиеся с query, затем содержащие его."""
+    normalized = normalize_city(query)
+    if not normalized:
+        return []
+    key = f'city-autocomplete:{normalized}:{limit}'
+    cities = cache.get(key)
+    if cities is not None:
+        return cities
+
+    cities = {}
+    lookups = [
+        CityAlias.objects.filter(normalized_name__startswith=normalized),
+        CityAlias.objects.filter(normalized_name__contains=normalized),
+    ]
+    for aliases in lookups:
+        rows = aliases.order_by('city__name').values_list('city_id', 'city__name')[:limit * 2]
+        for city_id, name in rows:
+            cities.setdefault(city_id, {'id': city_id, 'name': name})
+        if len(cities) >= limit:
+            break
+
+    cities = list(cities.values())[:limit]
+    cache.set(key, cities, AUTOCOMPLETE_TTL)
+    return cities
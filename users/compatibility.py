@@ -0,0 +1,148 @@
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from scipy import sparse
+
+from .models import UserTag
+
+
+COMPATIBILITY_DEFAULTS = {
+    'METRIC': 'jaccard',
+    'REBUILD_INTERVAL': 60 * 5,
+    'BUILD_CHUNK_SIZE': 10000,
+}
+
+METRICS = ('jaccard', 'cosine')
+
+
+def compatibility_setting(name):
+    return getattr(settings, 'COMPATIBILITY', {}).get(name, COMPATIBILITY_DEFAULTS[name])
+
+
+class CompatibilityIndex:
+    """
+    Разреженная матрица пользователь × тег (CSR) в памяти процесса.
+
+    Совместимость зрителя с пачкой кандидатов считается одним умножением
+    строк матрицы на вектор тегов зрителя: пересечение множеств тегов -
+    скалярное произведение бинарных векторов, их размеры - число
+    ненулевых элементов строки. Матрица пересобирается из UserTag раз в
+    REBUILD_INTERVAL, теги самого зрителя всегда читаются из базы.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self.user_ids = None
+        self.matrix = None
+        self.sizes = None
+        self.built_at = None
+
+    def reset(self):
+        with self.lock:
+            self.user_ids = self.matrix = self.sizes = self.built_at = None
+
+    def is_built(self):
+        return self.built_at is not None and (
+            time.monotonic() - self.built_at < compatibility_setting('REBUILD_INTERVAL')
+        )
+
+    def ensure_built(self):
+        if self.is_built():
+            return
+        # Пока матрицу пересобирает другой поток, читается старая; без
+        # матрицы ждут первой сборки
+        if not self._build_lock.acquire(blocking=self.built_at is None):
+            return
+        try:
+            if not self.is_built():
+                self.rebuild()
+        finally:
+            self._build_lock.release()
+
+    def rebuild(self):
+        chunk_size = compatibility_setting('BUILD_CHUNK_SIZE')
+        rows = UserTag.objects.order_by().values_list('user_id', 'tag_id').iterator(chunk_size=chunk_size)
+        pairs = np.fromiter(
+            (value for row in rows for value in row), dtype=np.int64
+        ).reshape(-1, 2)
+        user_ids, positions = np.unique(pairs[:, 0], return_inverse=True)
+        width = int(pairs[:, 1].max()) + 1 if len(pairs) else 1
+        matrix = sparse.csr_matrix(
+            (np.ones(len(pairs), dtype=np.float32), (positions, pairs[:, 1])),
+            shape=(len(user_ids), width)
+        )
+        with self.lock:
+            self.user_ids = user_ids
+            self.matrix = matrix
+            self.sizes = np.diff(matrix.indptr).astype(np.float32)
+            self.built_at = time.monotonic()
+
+    def user_tags(self, user_id):
+        """id тегов пользователя по снимку матрицы."""
+        self.ensure_built()
+        with self.lock:
+            user_ids, matrix = self.user_ids, self.matrix
+        position = np.searchsorted(user_ids, user_id)
+        if position == len(user_ids) or user_ids[position] != user_id:
+            return np.array([], dtype=np.int64)
+        return matrix.indices[matrix.indptr[position]:matrix.indptr[position + 1]].astype(np.int64)
+
+    def score(self, tag_ids, candidate_ids, metric=None):
+        """
+        Массив совместимостей зрителя с тегами tag_ids и кандидатов
+        candidate_ids (в их порядке): коэффициент Жаккара или косинусная
+        мера. У кандидатов без тегов совместимость 0.
+        """
+        metric = metric or compatibility_setting('METRIC')
+        if metric not in METRICS:
+            raise ValueError(f'Неизвестная мера совместимости: {metric}')
+        candidate_ids = np.asarray(candidate_ids, dtype=np.int64)
+        scores = np.zeros(len(candidate_ids), dtype=np.float64)
+        tag_ids = np.unique(np.asarray(list(tag_ids), dtype=np.int64))
+        if not len(tag_ids) or not len(candidate_ids):
+            return scores
+
+        self.ensure_built()
+        with self.lock:
+            user_ids, matrix, sizes = self.user_ids, self.matrix, self.sizes
+        if not len(user_ids):
+            return scores
+
+        positions = np.minimum(np.searchsorted(user_ids, candidate_ids), len(user_ids) - 1)
+        known = user_ids[positions] == candidate_ids
+        rows = positions[known]
+
+        viewer = np.zeros(matrix.shape[1], dtype=np.float32)
+        # Новых тегов еще нет в матрице: пересечений по ним нет, но в размер множества они входят
+        viewer[tag_ids[tag_ids < matrix.shape[1]]] = 1
+        shared = matrix[rows] @ viewer
+        candidate_sizes = sizes[rows]
+        if metric == 'cosine':
+            denominator = np.sqrt(len(tag_ids) * candidate_sizes)
+        else:
+            denominator = len(tag_ids) + candidate_sizes - shared
+        scores[known] = np.divide(
+            shared, denominator, out=np.zeros(len(rows), dtype=np.float64), where=denominator > 0
+        )
+        return scores
+
+
+compatibility_index = CompatibilityIndex()
+
+
+def rank_candidates(viewer_id, candidate_ids, metric=None):
+    """
+    Кандидаты по убыванию совместимости со зрителем. Сортировка
+    устойчивая: при равной совместимости сохраняется исходный
+    (случайный) порядок.
+    """
+    candidate_ids = list(candidate_ids)
+    if len(candidate_ids) < 2:
+        return candidate_ids
+    tag_ids = UserTag.objects.filter(user_id=viewer_id).values_list('tag_id', flat=True)
+    scores = compatibility_index.score(tag_ids, candidate_ids, metric)
+    order = np.argsort(-scores, kind='stable')
+    return [candidate_ids[index] for index in order]
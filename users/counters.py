@@ -0,0 +1,146 @@
+import random
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from interactions.models import Interaction
+from .models import LikesCounterShard, User
+
+
+COUNTER_DEFAULTS = {
+    'SHARDS': 8,
+    'HOT_THRESHOLD': 1000,
+}
+
+
+def counter_setting(name):
+    return getattr(settings, 'LIKES_COUNTER', {}).get(name, COUNTER_DEFAULTS[name])
+
+
+def is_hot(user):
+    return counter_setting('SHARDS') > 1 and user.likes_count >= counter_setting('HOT_THRESHOLD')
+
+
+def increment_likes(user, delta=1):
+    """
+    Атомарно меняет счетчик лайков без чтения и сохранения всей строки.
+
+    Для популярных профилей прибавка пишется в случайный шард, чтобы
+    параллельные лайки не ждали блокировку одной строки users_user;
+    шарды сворачиваются в likes_count командой flush_likes_counters.
+    """
+    if not is_hot(user):
+        User.objects.filter(pk=user.pk).update(likes_count=F('likes_count') + delta)
+        return
+    increment_shard(user.pk, delta)
+
+
+def increment_shard(user_id, delta):
+    shard = random.randrange(counter_setting('SHARDS'))
+    shard_rows = LikesCounterShard.objects.filter(user_id=user_id, shard=shard)
+    if shard_rows.update(delta=F('delta') + delta):
+        return
+    try:
+        with transaction.atomic():
+            LikesCounterShard.objects.create(user_id=user_id, shard=shard, delta=delta)
+    except IntegrityError:
+        # Шард успел создать параллельный запрос
+        shard_rows.update(delta=F('delta') + delta)
+
+
+def increment_likes_many(deltas):
+    """
+    Прибавляет лайки сразу нескольким пользователям: {user_id: delta}.
+    Популярные профили, как и в increment_likes, получают прибавку через шарды.
+    """
+    if counter_setting('SHARDS') <= 1:
+        add_likes_counts(deltas)
+        return
+    threshold = counter_setting('HOT_THRESHOLD')
+    for delta, user_ids in group_by_delta(deltas).items():
+        cold_rows = User.objects.filter(pk__in=user_ids, likes_count__lt=threshold)
+        if cold_rows.update(likes_count=F('likes_count') + delta) == len(user_ids):
+            continue
+        # Не обновленные строки - популярные профили: они идут в шарды
+        hot_ids = User.objects.filter(pk__in=user_ids, likes_count__gte=threshold).values_list('id', flat=True)
+        for user_id in hot_ids:
+            increment_shard(user_id, delta)
+
+
+def add_likes_counts(deltas):
+    """Прибавляет deltas прямо к User.likes_count, одним UPDATE на каждое значение прибавки."""
+    for delta, user_ids in group_by_delta(deltas).items():
+        User.objects.filter(pk__in=user_ids).update(likes_count=F('likes_count') + delta)
+
+
+def group_by_delta(deltas):
+    by_delta = {}
+    for user_id, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(user_id)
+    return by_delta
+
+
+FLUSH_SQL = '''
+    WITH drained AS (
+        DELETE FROM {shards} RETURNING user_id, delta
+    ), totals AS (
+        SELECT user_id, SUM(delta) AS delta FROM drained GROUP BY user_id
+    )
+    UPDATE {users} SET likes_count = {users}.likes_count + totals.delta
+    FROM totals
+    WHERE {users}.id = totals.user_id
+'''
+
+
+def flush_likes_counters():
+    """Сворачивает накопленные шарды в User.likes_count, возвращает число пользователей."""
+    if connection.vendor == 'postgresql':
+        # Удаление и перенос в одном выражении: инкремент, пришедший во время
+        # сброса, либо попадет в удаляемую строку, либо создаст новый шард
+        with connection.cursor() as cursor:
+            cursor.execute(FLUSH_SQL.format(
+                shards=LikesCounterShard._meta.db_table,
+                users=User._meta.db_table,
+            ))
+            return cursor.rowcount
+
+    with transaction.atomic():
+        shards = LikesCounterShard.objects.select_for_update()
+        shard_ids = list(shards.values_list('id', flat=True))
+        totals = dict(
+            LikesCounterShard.objects.filter(id__in=shard_ids)
+            .values_list('user_id')
+            .annotate(total=Sum('delta'))
+        )
+        add_likes_counts(totals)
+        LikesCounterShard.objects.filter(id__in=shard_ids).delete()
+    return len(totals)
+
+
+def reconcile_likes_counters(chunk_size=10000):
+    """
+    Пересчитывает likes_count из Interaction одним UPDATE на каждый диапазон
+    id пользователей. Возвращает число обработанных пользователей.
+    """
+    like_counts = Interaction.objects.filter(
+        to_user=OuterRef('pk'), action='like'
+    ).order_by().values('to_user').annotate(total=Count('id')).values('total')
+
+    processed = 0
+    last_id = 0
+    while True:
+        chunk = list(
+            User.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size]
+        )
+        if not chunk:
+            return processed
+        with transaction.atomic():
+            LikesCounterShard.objects.filter(user__id__range=(chunk[0], chunk[-1])).delete()
+            User.objects.filter(id__range=(chunk[0], chunk[-1])).update(
+                likes_count=Coalesce(Subquery(like_counts), Value(0))
+            )
+        processed += len(chunk)
+        last_id = chunk[-1]
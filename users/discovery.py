@@ -0,0 +1,341 @@
+import hashlib
+import json
+import random
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import ValidationError
+
+from core.celery import enqueue
+from core.metrics import deck_exhausted, deck_misses
+from interactions.liked_you import LikedYouIndex
+from interactions.models import ViewHistory
+from interactions.seen import SeenSet
+from .cities import matching_aliases
+from .compatibility import rank_candidates
+from .geo import nearby_user_ids
+from .models import User
+from .pools import candidate_pools
+from .tasks import refill_discovery_deck
+
+
+FILTER_PARAMS = ('gender', 'min_age', 'max_age', 'city', 'status', 'radius_km', 'lat', 'lng')
+
+DECK_DEFAULTS = {
+    'BATCH_SIZE': 50,
+    'LOW_WATERMARK': 10,
+    'TTL': 60 * 30,
+    'EMPTY_TTL': 60,
+    'ASYNC_REFILL': True,
+    'MAX_SAMPLE_ROUNDS': 5,
+    'SCORING_OVERSAMPLE': 4,
+    'LIKED_YOU_RATIO': 0.2,
+    'LIKED_YOU_BATCH': 20,
+}
+
+def deck_setting(name):
+    return getattr(settings, 'DISCOVERY_DECK', {}).get(name, DECK_DEFAULTS[name])
+
+
+def get_discovery_filters(query_params, viewer=None):
+    filters = {
+        name: query_params.get(name)
+        for name in FILTER_PARAMS
+        if query_params.get(name)
+    }
+    for name in ('min_age', 'max_age'):
+        if name in filters:
+            try:
+                filters[name] = int(filters[name])
+            except ValueError:
+                raise ValidationError({name: 'Возраст должен быть целым числом'})
+    if 'radius_km' not in filters:
+        filters.pop('lat', None)
+        filters.pop('lng', None)
+        return filters
+
+    # Центр поиска - из параметров или сохраненные координаты зрителя
+    if 'lat' not in filters and 'lng' not in filters and viewer is not None:
+        filters['lat'], filters['lng'] = viewer.latitude, viewer.longitude
+    try:
+        filters['radius_km'] = float(filters['radius_km'])
+        filters['lat'] = float(filters['lat'])
+        filters['lng'] = float(filters['lng'])
+    except (KeyError, TypeError, ValueError):
+        raise ValidationError({'radius_km': 'Для поиска по радиусу нужны координаты: lat и lng или местоположение в профиле'})
+    if not (0 < filters['radius_km'] <= 20000 and -90 <= filters['lat'] <= 90 and -180 <= filters['lng'] <= 180):
+        raise ValidationError({'radius_km': 'Неверный радиус или координаты'})
+    return filters
+
+
+def apply_discovery_filters(queryset, filters):
+    if filters.get('gender'):
+        queryset = queryset.filter(gender=filters['gender'])
+    if filters.get('min_age'):
+        queryset = queryset.filter(age__gte=filters['min_age'])
+    if filters.get('max_age'):
+        queryset = queryset.filter(age__lte=filters['max_age'])
+    if filters.get('city'):
+        # Поиск по индексированным алиасам справочника, а не city__icontains по всей таблице
+        queryset = queryset.filter(city_ref__in=matching_aliases(filters['city']).values('city_id'))
+    if filters.get('status'):
+        queryset = queryset.filter(status=filters['status'])
+    if filters.get('radius_km'):
+        nearby_ids = nearby_user_ids(queryset, filters['lat'], filters['lng'], filters['radius_km'])
+        queryset = queryset.filter(id__in=nearby_ids)
+    return queryset
+
+
+class DiscoveryDeck:
+    """
+    Очередь заранее подобранных кандидатов для пары (зритель, набор фильтров).
+
+    Очередь - слоты key:N в кэше и два счетчика: head (последний выданный
+    слот; обгоняет tail, когда pop попадает в пустую очередь) и tail
+    (последний заполненный). Выдача кандидата - атомарный
+    cache.incr(head) и чтение одного слота: O(1), и параллельные pop не
+    получают один и тот же слот. Пополнение резервирует новые слоты через
+    cache.incr(tail): синхронно, если очереди нет, и в фоне, когда в ней
+    остается меньше LOW_WATERMARK кандидатов.
+    """
+
+    def __init__(self, viewer_id, filters):
+        self.viewer_id = viewer_id
+        self.filters = filters
+        digest = hashlib.sha1(
+            json.dumps(filters, sort_keys=True).encode()
+        ).hexdigest()[:16]
+        self.key = f'discovery-deck:{viewer_id}:{digest}'
+        self.head_key = f'{self.key}:head'
+        self.tail_key = f'{self.key}:tail'
+        self.lock_key = f'{self.key}:refill'
+
+    def slot_key(self, position):
+        return f'{self.key}:{position}'
+
+    def pop(self):
+        """Возвращает следующего непросмотренного кандидата и пишет его в ViewHistory."""
+        # С вероятностью LIKED_YOU_RATIO показываем того, кто уже лайкнул
+        # зрителя: лайк в ответ сразу дает мэтч
+        if random.random() < deck_setting('LIKED_YOU_RATIO'):
+            user = self.pop_liker()
+            if user is not None:
+                return user
+
+        position = self.next_position()
+        if position is None:
+            deck_misses.inc()
+            self.refill()
+            position = self.next_position()
+
+        while position is not None:
+            values = cache.get_many([self.slot_key(position), self.tail_key])
+            tail = values.get(self.tail_key, 0)
+            if position > tail:
+                # Очередь пуста; номер сгорает - пополнение начнется после него
+                break
+            if tail - position < deck_setting('LOW_WATERMARK'):
+                self.schedule_refill()
+
+            # Слот мог истечь раньше счетчиков - тогда просто идем дальше
+            candidate_id = values.get(self.slot_key(position))
+            user = self.take(candidate_id) if candidate_id is not None else None
+            if user is not None:
+                return user
+            position = self.next_position()
+
+        deck_exhausted.inc()
+        return None
+
+    async def apop(self):
+        """pop для async-представлений: очередь и выдача кандидата - через async API кэша и ORM."""
+        if random.random() < deck_setting('LIKED_YOU_RATIO'):
+            user = await sync_to_async(self.pop_liker)()
+            if user is not None:
+                return user
+
+        position = await self.anext_position()
+        if position is None:
+            deck_misses.inc()
+            # Пополнение ранжирует кандидатов в NumPy - в потоке
+            await sync_to_async(self.refill)()
+            position = await self.anext_position()
+
+        while position is not None:
+            values = await cache.aget_many([self.slot_key(position), self.tail_key])
+            tail = values.get(self.tail_key, 0)
+            if position > tail:
+                break
+            if tail - position < deck_setting('LOW_WATERMARK'):
+                await sync_to_async(self.schedule_refill)()
+
+            candidate_id = values.get(self.slot_key(position))
+            user = await self.atake(candidate_id) if candidate_id is not None else None
+            if user is not None:
+                return user
+            position = await self.anext_position()
+
+        deck_exhausted.inc()
+        return None
+
+    def next_position(self):
+        """Номер следующего слота или None, если очереди нет в кэше."""
+        try:
+            return cache.incr(self.head_key)
+        except ValueError:
+            return None
+
+    async def anext_position(self):
+        try:
+            return await cache.aincr(self.head_key)
+        except ValueError:
+            return None
+
+    def queued_ids(self):
+        """id кандидатов, которые еще ждут выдачи, в порядке очереди."""
+        counters = cache.get_many([self.head_key, self.tail_key])
+        head, tail = counters.get(self.head_key, 0), counters.get(self.tail_key, 0)
+        if tail <= head:
+            return []
+        slots = cache.get_many([self.slot_key(position) for position in range(head + 1, tail + 1)])
+        return [
+            slots[self.slot_key(position)]
+            for position in range(head + 1, tail + 1)
+            if self.slot_key(position) in slots
+        ]
+
+    def clear(self):
+        counters = cache.get_many([self.head_key, self.tail_key])
+        cache.delete_many(
+            [self.slot_key(position) for position in range(1, counters.get(self.tail_key, 0) + 1)]
+            + [self.head_key, self.tail_key, self.lock_key]
+        )
+
+    def candidate_queryset(self, candidate_id):
+        # Кандидат мог уйти или сменить сегмент, пока ждал в очереди или в устаревшем пуле
+        queryset = User.objects.filter(id=candidate_id, is_active=True)
+        return apply_discovery_filters(queryset, self.filters).select_related(
+            'profile'
+        ).prefetch_related('photos')
+
+    def take(self, candidate_id):
+        """Кандидат с профилем и фото, если его удалось записать в ViewHistory впервые."""
+        user = self.candidate_queryset(candidate_id).first()
+        if user is None:
+            # Исправляем пул, чтобы пополнение не выдало кандидата снова
+            candidate_pools.refresh(candidate_id)
+            return None
+
+        # Кандидат мог быть показан через другую колоду - пропускаем его
+        _, created = ViewHistory.objects.get_or_create(
+            viewer_id=self.viewer_id,
+            viewed_user=user
+        )
+        return user if created else None
+
+    async def atake(self, candidate_id):
+        if self.filters.get('radius_km'):
+            # Фильтр по радиусу читает координаты запросом при построении queryset
+            queryset = await sync_to_async(self.candidate_queryset)(candidate_id)
+        else:
+            queryset = self.candidate_queryset(candidate_id)
+        user = await queryset.afirst()
+        if user is None:
+            await sync_to_async(candidate_pools.refresh)(candidate_id)
+            return None
+
+        _, created = await ViewHistory.objects.aget_or_create(
+            viewer_id=self.viewer_id,
+            viewed_user=user
+        )
+        return user if created else None
+
+    def pop_liker(self):
+        """Самый недавний из лайкнувших зрителя, кто проходит фильтры колоды и еще не показан."""
+        liker_ids = LikedYouIndex.get(self.viewer_id)[::-1][:deck_setting('LIKED_YOU_BATCH')]
+        if not liker_ids:
+            return None
+        queryset = User.objects.filter(id__in=liker_ids, is_active=True)
+        matching = set(apply_discovery_filters(queryset, self.filters).values_list('id', flat=True))
+        allowed = [user_id for user_id in liker_ids if user_id in matching]
+        unseen = SeenSet.for_viewer(self.viewer_id).filter_unseen(allowed)
+        # Уже показанных повторно не предлагаем - убираем их из индекса
+        LikedYouIndex.remove(self.viewer_id, set(allowed) - set(unseen))
+        for liker_id in unseen:
+            user = self.take(liker_id)
+            if user is not None:
+                return user
+        return None
+
+    def schedule_refill(self):
+        if not cache.add(self.lock_key, True, 30):
+            return
+        if deck_setting('ASYNC_REFILL'):
+            enqueue(refill_discovery_deck, self.viewer_id, self.filters)
+        else:
+            self._locked_refill()
+
+    def _locked_refill(self):
+        try:
+            self.refill()
+        finally:
+            cache.delete(self.lock_key)
+
+    def refill(self):
+        """Дописывает в конец очереди новую пачку кандидатов."""
+        cache.add(self.head_key, 0, deck_setting('TTL'))
+        cache.add(self.tail_key, 0, deck_setting('TTL'))
+        queued_ids = self.queued_ids()
+        # Берем кандидатов с запасом и оставляем самых совместимых по тегам хобби
+        batch_size = deck_setting('BATCH_SIZE')
+        batch = self.fetch_candidates(batch_size * deck_setting('SCORING_OVERSAMPLE'), exclude=queued_ids)
+        batch = rank_candidates(self.viewer_id, batch)[:batch_size]
+        if batch:
+            # Слоты резервируются атомарно: параллельное пополнение не перезапишет их.
+            # Номера, выданные pop при пустой очереди, сгорели - пачка начинается
+            # после max(head, tail), и один слот не достается двум pop
+            counters = cache.get_many([self.head_key, self.tail_key])
+            burnt = max(counters.get(self.head_key, 0) - counters.get(self.tail_key, 0), 0)
+            tail = cache.incr(self.tail_key, burnt + len(batch))
+            cache.set_many({
+                self.slot_key(position): candidate_id
+                for position, candidate_id in enumerate(batch, start=tail - len(batch) + 1)
+            }, deck_setting('TTL'))
+        # Пустая колода живет недолго, чтобы снова попробовать собрать ее
+        timeout = deck_setting('TTL') if queued_ids or batch else deck_setting('EMPTY_TTL')
+        cache.touch(self.head_key, timeout)
+        cache.touch(self.tail_key, timeout)
+
+    def fetch_candidates(self, limit, exclude=()):
+        """
+        Случайная выборка без ORDER BY random(): берем кандидатов из
+        сегментированных пулов и отбрасываем просмотренных через SeenSet.
+        """
+        seen = SeenSet.for_viewer(self.viewer_id)
+        drawn = set(exclude) | {self.viewer_id}
+
+        if self.filters.get('radius_km'):
+            return self.fetch_nearby_candidates(seen, limit, drawn)
+        candidate_ids = []
+
+        for _ in range(deck_setting('MAX_SAMPLE_ROUNDS')):
+            sample = candidate_pools.sample(self.filters, (limit - len(candidate_ids)) * 2, exclude=drawn)
+            if not sample:
+                break
+            drawn.update(sample)
+            candidate_ids += seen.filter_unseen(sample)
+            if len(candidate_ids) >= limit:
+                break
+
+        return candidate_ids[:limit]
+
+    def fetch_nearby_candidates(self, seen, limit, exclude):
+        # Пулы не знают координат: кандидатов в радиусе дает индекс geohash
+        queryset = User.objects.filter(is_active=True).exclude(id__in=exclude)
+        nearby_ids = nearby_user_ids(
+            apply_discovery_filters(queryset, {k: v for k, v in self.filters.items() if k != 'radius_km'}),
+            self.filters['lat'], self.filters['lng'], self.filters['radius_km']
+        )
+        random.shuffle(nearby_ids)
+        return seen.filter_unseen(nearby_ids)[:limit]
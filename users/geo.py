@@ -0,0 +1,153 @@
+import math
+
+import numpy as np
+from django.db.models import Q
+
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+EARTH_RADIUS_KM = 6371.0088
+GEOHASH_PRECISION = 12
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        # Четные биты делят долготу, нечетные - широту
+        value, bounds = (longitude, lng_range) if even else (latitude, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        if value >= middle:
+            bits = bits * 2 + 1
+            bounds[0] = middle
+        else:
+            bits = bits * 2
+            bounds[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def encode_geohash_many(latitudes, longitudes, precision=GEOHASH_PRECISION):
+    """Векторизованный encode_geohash для массивов координат (бенчмарк, массовое заполнение)."""
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    total_bits = precision * 5
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    # Номер ячейки по каждой оси, затем чередование битов (долгота первой)
+    lat_cells = np.clip(((latitudes + 90) / 180 * (1 << lat_bits)).astype(np.int64), 0, (1 << lat_bits) - 1)
+    lng_cells = np.clip(((longitudes + 180) / 360 * (1 << lng_bits)).astype(np.int64), 0, (1 << lng_bits) - 1)
+    code = np.zeros(len(latitudes), dtype=np.int64)
+    for bit in range(total_bits):
+        if bit % 2 == 0:
+            source, position = lng_cells, lng_bits - 1 - bit // 2
+        else:
+            source, position = lat_cells, lat_bits - 1 - bit // 2
+        code = (code << 1) | ((source >> position) & 1)
+
+    alphabet = np.frombuffer(BASE32.encode(), dtype=np.uint8)
+    chars = np.empty((len(latitudes), precision), dtype=np.uint8)
+    for index in range(precision):
+        chars[:, index] = alphabet[(code >> (5 * (precision - 1 - index))) & 31]
+    return chars.view(f'S{precision}').ravel().astype(str)
+
+
+def cell_size_degrees(precision):
+    total_bits = precision * 5
+    return 180 / (1 << (total_bits // 2)), 360 / (1 << ((total_bits + 1) // 2))
+
+
+def radius_degrees(latitude, radius_km):
+    """Полуширина окрестности в градусах широты и долготы; None по долготе - охватывает все долготы."""
+    angle = radius_km / EARTH_RADIUS_KM
+    lat_delta = math.degrees(angle)
+    cos_lat = math.cos(math.radians(latitude))
+    if abs(latitude) + lat_delta >= 90 or math.sin(angle) >= cos_lat:
+        return lat_delta, None
+    return lat_delta, math.degrees(math.asin(math.sin(angle) / cos_lat))
+
+
+def precision_for_radius(latitude, radius_km):
+    """Самая мелкая точность, при которой ячейка не меньше радиуса: тогда круг покрывают 3×3 ячейки."""
+    lat_delta, lng_delta = radius_degrees(latitude, radius_km)
+    if lng_delta is None:
+        return 0
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_deg, lng_deg = cell_size_degrees(precision)
+        if lat_deg >= lat_delta and lng_deg >= lng_delta:
+            return precision
+    return 0
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """Префиксы geohash ячейки точки и восьми соседних; пустой список - без отсечения."""
+    precision = precision_for_radius(latitude, radius_km)
+    if precision == 0:
+        return []
+    lat_deg, lng_deg = cell_size_degrees(precision)
+    cells = set()
+    for lat_step in (-1, 0, 1):
+        for lng_step in (-1, 0, 1):
+            lat = min(max(latitude + lat_step * lat_deg, -90.0), 90.0)
+            lng = (longitude + lng_step * lng_deg + 180) % 360 - 180
+            cells.add(encode_geohash(lat, lng, precision))
+    return sorted(cells)
+
+
+def bounding_box(latitude, longitude, radius_km):
+    lat_delta, lng_delta = radius_degrees(latitude, radius_km)
+    if lng_delta is None:
+        return latitude - lat_delta, latitude + lat_delta, -180.0, 180.0
+    return latitude - lat_delta, latitude + lat_delta, longitude - lng_delta, longitude + lng_delta
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """Расстояния от точки до массива точек, в километрах."""
+    lat1 = math.radians(latitude)
+    lat2 = np.radians(np.asarray(latitudes, dtype=np.float64))
+    dlat = lat2 - lat1
+    dlng = np.radians(np.asarray(longitudes, dtype=np.float64) - longitude)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def nearby_user_ids(queryset, latitude, longitude, radius_km):
+    """
+    id пользователей queryset в радиусе radius_km. Индекс по geohash
+    отсекает всех, кроме 3×3 соседних ячеек, точное расстояние считается
+    векторно по оставшимся координатам.
+    """
+    cells = covering_cells(latitude, longitude, radius_km)
+    queryset = queryset.exclude(geohash='')
+    if cells:
+        prefixes = Q()
+        for cell in cells:
+            prefixes |= Q(geohash__startswith=cell)
+        queryset = queryset.filter(prefixes)
+
+    min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius_km)
+    queryset = queryset.filter(latitude__range=(min_lat, max_lat))
+    if max_lng - min_lng < 360:
+        if min_lng < -180 or max_lng > 180:
+            # Рамка пересекает 180-й меридиан
+            west, east = (min_lng + 360, 180.0) if min_lng < -180 else (-180.0, max_lng - 360)
+            queryset = queryset.filter(
+                Q(longitude__range=(max(min_lng, -180.0), min(max_lng, 180.0))) | Q(longitude__range=(west, east))
+            )
+        else:
+            queryset = queryset.filter(longitude__range=(min_lng, max_lng))
+
+    rows = list(queryset.values_list('id', 'latitude', 'longitude'))
+    if not rows:
+        return []
+    ids, latitudes, longitudes = zip(*rows)
+    distances = haversine_km(latitude, longitude, latitudes, longitudes)
+    return [user_id for user_id, distance in zip(ids, distances) if distance <= radius_km]
@@ -0,0 +1,71 @@
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+
+# Размер по длинной стороне для каждого варианта
+VARIANT_SIZES = {
+    'thumb': 160,
+    'card': 480,
+    'full': 1280,
+}
+
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+VARIANTS_DIR = 'user_photos/variants'
+
+
+def variant_path(photo_id, size, fmt):
+    return posixpath.join(VARIANTS_DIR, str(photo_id), f'{size}.{fmt}')
+
+
+def load_image(field_file):
+    with field_file.open('rb') as source:
+        image = Image.open(source)
+        image.load()
+    # Поворачиваем по EXIF Orientation, дальше метаданные не нужны
+    image = ImageOps.exif_transpose(image)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.info.clear()
+    return image
+
+
+def generate_variants(photo):
+    """
+    Строит уменьшенные копии фото в WebP и JPEG без EXIF и возвращает
+    описание для UserPhoto.variants: {size: {format: path, width, height}}.
+    """
+    image = load_image(photo.photo)
+    variants = {}
+
+    for size, longest_side in VARIANT_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((longest_side, longest_side), Image.LANCZOS)
+        variant = {'width': resized.width, 'height': resized.height}
+
+        for fmt, (pil_format, options) in VARIANT_FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, pil_format, **options)
+            path = variant_path(photo.pk, size, fmt)
+            if default_storage.exists(path):
+                default_storage.delete(path)
+            variant[fmt] = default_storage.save(path, ContentFile(buffer.getvalue()))
+
+        variants[size] = variant
+
+    return variants
+
+
+def delete_variants(variants):
+    for variant in (variants or {}).values():
+        for fmt in VARIANT_FORMATS:
+            path = variant.get(fmt)
+            if path and default_storage.exists(path):
+                default_storage.delete(path)
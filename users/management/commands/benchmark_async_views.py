@@ -0,0 +1,164 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+from io import StringIO
+
+from django.core.asgi import get_asgi_application
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+from core.loadtest import percentiles
+from users.models import User
+
+
+# Синхронные view и их async-варианты (имя URL с суффиксом -async)
+VIEWS = ['user-list', 'random-user', 'matches', 'received-likes', 'view-history']
+
+BenchmarkResult = namedtuple('BenchmarkResult', ['timings', 'errors', 'elapsed', 'peak_threads'])
+
+
+async def asgi_get(application, path, token):
+    """GET через ASGI-приложение в процессе, без сети; код ответа."""
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'host', b'localhost'), (b'authorization', f'Bearer {token}'.encode())],
+        'client': ('127.0.0.1', 0),
+        'server': ('localhost', 80),
+    }
+    response = {}
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+
+    await application(scope, receive, send)
+    return response['status']
+
+
+async def run_view(application, path, tokens, requests, concurrency):
+    """
+    requests запросов, не больше concurrency одновременно, по кругу от имени
+    клиентов tokens. Первый запрос каждого клиента прогревает кэши и не учитывается.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    timings, errors = [], []
+
+    async def call(token, measured=True):
+        async with semaphore:
+            started = time.perf_counter()
+            status = await asgi_get(application, path, token)
+            if measured:
+                timings.append((time.perf_counter() - started) * 1000)
+                if status >= 400:
+                    errors.append(status)
+
+    await asyncio.gather(*(call(token, measured=False) for token in tokens))
+
+    # Django держит на каждый запрос ASGI поток для синхронного кода - считаем пик
+    peak_threads = threading.active_count()
+    done = asyncio.Event()
+
+    async def sample_threads():
+        nonlocal peak_threads
+        while not done.is_set():
+            peak_threads = max(peak_threads, threading.active_count())
+            await asyncio.sleep(0.002)
+
+    sampler = asyncio.ensure_future(sample_threads())
+    started = time.perf_counter()
+    await asyncio.gather(*(call(tokens[index % len(tokens)]) for index in range(requests)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await sampler
+    return BenchmarkResult(timings, errors, elapsed, peak_threads)
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed mock data and compare the read-heavy sync views with their async variants under the '
+        'Django ASGI handler: throughput, latency percentiles and peak threads at the same concurrency'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000, help='Mock users to have in the database')
+        parser.add_argument('--interactions', type=int, default=20000, help='Swipes to generate with the users')
+        parser.add_argument('--clients', type=int, default=50, help='Distinct users sending requests')
+        parser.add_argument('--concurrency', type=int, default=50,
+                            help='Requests in flight at once (each holds a database connection)')
+        parser.add_argument('--requests', type=int, default=1000, help='Measured requests per view')
+        parser.add_argument('--views', default='', help=f'Comma-separated URL names from: {", ".join(VIEWS)}')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Mock data generator processes')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        views = VIEWS
+        if options['views']:
+            views = [name.strip() for name in options['views'].split(',')]
+            unknown = set(views) - set(VIEWS)
+            if unknown:
+                raise CommandError(f'Unknown views: {", ".join(sorted(unknown))}')
+
+        self.seed_data(options)
+        rng = random.Random(options['seed'])
+        users = rng.sample(
+            list(User.objects.filter(username__startswith='mock', is_active=True)), options['clients']
+        )
+        tokens = [str(RefreshToken.for_user(user).access_token) for user in users]
+
+        application = get_asgi_application()
+        failures = []
+        for name in views:
+            results = {}
+            for variant, url_name in (('sync', name), ('async', f'{name}-async')):
+                results[variant] = asyncio.run(run_view(
+                    application, reverse(url_name), tokens, options['requests'], options['concurrency']
+                ))
+                self.report(name, variant, results[variant])
+                if results[variant].errors:
+                    failures.append(f'{url_name}: {len(results[variant].errors)} error responses')
+            ratio = (results['sync'].elapsed / max(results['async'].elapsed, 1e-9))
+            self.stdout.write(f'{name:<16} async/sync throughput x{ratio:.2f}')
+
+        if failures:
+            raise CommandError('; '.join(failures))
+
+    def seed_data(self, options):
+        existing = User.objects.filter(username__startswith='mock').count()
+        missing = options['users'] - existing
+        if missing > 0:
+            call_command(
+                'generate_mock_data',
+                users=missing,
+                interactions=options['interactions'] * missing // options['users'],
+                seed=options['seed'],
+                workers=options['workers'],
+                stdout=self.stdout if options['verbosity'] > 1 else StringIO(),
+            )
+        self.stdout.write(
+            f'Mock users: {max(existing, options["users"])}, clients: {options["clients"]}, '
+            f'concurrency: {options["concurrency"]}'
+        )
+
+    def report(self, name, variant, result):
+        p50, p95, p99 = percentiles(result.timings)
+        self.stdout.write(
+            f'{name:<16} {variant:<5} {len(result.timings):>5} req '
+            f'{len(result.timings) / max(result.elapsed, 1e-9):>7.1f} req/s  '
+            f'p50 {p50:>7.1f}  p95 {p95:>7.1f}  p99 {p99:>7.1f} ms  '
+            f'peak threads {result.peak_threads:>4}'
+        )
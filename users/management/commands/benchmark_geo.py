@@ -0,0 +1,138 @@
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from users.geo import bounding_box, covering_cells, encode_geohash_many, haversine_km, nearby_user_ids
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Benchmark radius search: full haversine scan vs geohash neighbour-cell pruning'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', type=int, default=1_000_000, help='Number of user locations')
+        parser.add_argument('--queries', type=int, default=200, help='Number of radius queries')
+        parser.add_argument('--radius', type=float, default=25, help='Search radius, km')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--db', action='store_true',
+            help='Also insert the points into users_user (rolled back) and query through the ORM'
+        )
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        latitudes, longitudes = self.make_points(rng, options['points'])
+        started = time.perf_counter()
+        geohashes = encode_geohash_many(latitudes, longitudes)
+        self.stdout.write(
+            f'{len(latitudes)} points, geohash encoding {time.perf_counter() - started:.2f} s'
+        )
+
+        picks = rng.integers(0, len(latitudes), options['queries'])
+        origins = list(zip(latitudes[picks], longitudes[picks]))
+        radius = options['radius']
+
+        full_scan, full_counts = self.measure(
+            origins, lambda lat, lng: np.flatnonzero(haversine_km(lat, lng, latitudes, longitudes) <= radius)
+        )
+
+        # Отсортированный массив geohash - аналог B-tree индекса в базе
+        order = np.argsort(geohashes)
+        sorted_hashes = geohashes[order]
+        pruned, pruned_counts = self.measure(
+            origins, lambda lat, lng: self.pruned_search(
+                lat, lng, radius, sorted_hashes, order, latitudes, longitudes
+            )
+        )
+
+        if full_counts != pruned_counts:
+            self.stdout.write(self.style.ERROR('Pruned search returned different results'))
+            return
+        self.stdout.write(f'Radius {radius} km, {len(origins)} queries, mean hits {statistics.mean(full_counts):.1f}')
+        self.report('full scan', full_scan)
+        self.report('geohash pruning', pruned)
+        self.stdout.write(self.style.SUCCESS(
+            f'Speedup (mean): {statistics.mean(full_scan) / statistics.mean(pruned):.1f}x'
+        ))
+
+        if options['db']:
+            self.benchmark_database(latitudes, longitudes, geohashes, origins, radius)
+
+    def make_points(self, rng, count):
+        # Пользователи сгруппированы вокруг городов, а не равномерно по карте
+        centers = np.column_stack([rng.uniform(42, 68, 300), rng.uniform(20, 140, 300)])
+        weights = rng.pareto(1.2, len(centers)) + 1
+        picks = rng.choice(len(centers), count, p=weights / weights.sum())
+        spread = rng.uniform(0.05, 0.4, len(centers))[picks]
+        latitudes = np.clip(centers[picks, 0] + rng.normal(0, 1, count) * spread, -90, 90)
+        longitudes = (centers[picks, 1] + rng.normal(0, 1, count) * spread * 1.8 + 180) % 360 - 180
+        return latitudes, longitudes
+
+    def pruned_search(self, lat, lng, radius, sorted_hashes, order, latitudes, longitudes):
+        candidates = []
+        for cell in covering_cells(lat, lng, radius):
+            start = np.searchsorted(sorted_hashes, cell, side='left')
+            end = np.searchsorted(sorted_hashes, cell + '~', side='left')
+            candidates.append(order[start:end])
+        candidates = np.concatenate(candidates) if candidates else np.arange(len(latitudes))
+        min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius)
+        cand_lat = latitudes[candidates]
+        candidates = candidates[(cand_lat >= min_lat) & (cand_lat <= max_lat)]
+        distances = haversine_km(lat, lng, latitudes[candidates], longitudes[candidates])
+        return np.sort(candidates[distances <= radius])
+
+    def measure(self, origins, search):
+        timings = []
+        counts = []
+        for lat, lng in origins:
+            started = time.perf_counter()
+            found = search(lat, lng)
+            timings.append((time.perf_counter() - started) * 1000)
+            counts.append(len(found))
+        return timings, counts
+
+    def benchmark_database(self, latitudes, longitudes, geohashes, origins, radius):
+        suffix = int(time.time() * 1000)
+        # Все данные бенчмарка живут в одной транзакции и откатываются в конце
+        with transaction.atomic():
+            started = time.perf_counter()
+            batch = []
+            for i, (lat, lng, geohash) in enumerate(zip(latitudes, longitudes, geohashes)):
+                batch.append(User(
+                    username=f'geo-{suffix}-{i}',
+                    email=f'geo-{suffix}-{i}@bench.local',
+                    first_name='Geo',
+                    last_name=str(i),
+                    gender='M' if i % 2 else 'F',
+                    age=30,
+                    city='Bench',
+                    latitude=float(lat),
+                    longitude=float(lng),
+                    geohash=geohash,
+                ))
+                if len(batch) == 10000:
+                    User.objects.bulk_create(batch)
+                    batch = []
+            User.objects.bulk_create(batch)
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(f'ANALYZE {User._meta.db_table}')
+            self.stdout.write(f'Inserted {len(latitudes)} users in {time.perf_counter() - started:.1f} s')
+
+            queryset = User.objects.filter(username__startswith=f'geo-{suffix}-')
+            indexed, _ = self.measure(
+                origins, lambda lat, lng: nearby_user_ids(queryset, float(lat), float(lng), radius)
+            )
+            self.report('database + index', indexed)
+            transaction.set_rollback(True)
+        self.stdout.write(f'Database: {connection.vendor}')
+
+    def report(self, label, timings):
+        ordered = sorted(timings)
+        p95 = ordered[int(len(ordered) * 0.95) - 1]
+        self.stdout.write(
+            f'{label:>16}: mean {statistics.mean(timings):.3f} ms, '
+            f'p50 {statistics.median(timings):.3f} ms, p95 {p95:.3f} ms'
+        )
@@ -0,0 +1,142 @@
+import random
+import statistics
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from faker import Faker
+from users.models import User, UserProfile, UserSearchDocument
+from users.search import memory_index, search_users, update_search_documents
+
+
+class Command(BaseCommand):
+    help = 'Benchmark ranked full-text user search against icontains scans and report index size'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50000, help='Number of temporary users')
+        parser.add_argument('--queries', type=int, default=100, help='Number of search queries per query length')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        fake = Faker('ru_RU')
+        fake.seed_instance(options['seed'])
+        vocabulary = list({fake.word() for _ in range(3000)})
+
+        # Все данные бенчмарка живут в одной транзакции и откатываются в конце
+        with transaction.atomic():
+            started = time.perf_counter()
+            user_ids = self.create_users(options['users'], vocabulary, rng)
+            self.stdout.write(f'Created {len(user_ids)} users in {time.perf_counter() - started:.1f} s')
+
+            started = time.perf_counter()
+            memory_index.reset()
+            for start in range(0, len(user_ids), 5000):
+                update_search_documents(user_ids[start:start + 5000])
+            memory_index.ensure_built()
+            if connection.vendor == 'postgresql':
+                # Вставленные пачкой строки лежат в pending list GIN и просматриваются
+                # каждым запросом, пока их не перенесет autovacuum - переносим сразу
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT gin_clean_pending_list('users_usersearchdocument_vector_gin')")
+                    cursor.execute(f'ANALYZE {UserSearchDocument._meta.db_table}')
+                    cursor.execute(f'ANALYZE {User._meta.db_table}')
+            self.stdout.write(f'Indexed in {time.perf_counter() - started:.1f} s')
+
+            queryset = User.objects.all()
+            self.stdout.write(f'Database: {connection.vendor}')
+            # Одно слово ищется по префиксу, и совпадений у него намного больше, чем у двух
+            for words in (1, 2):
+                queries = [' '.join(rng.sample(vocabulary, words)) for _ in range(options['queries'])]
+                indexed = self.measure(queries, lambda q: list(
+                    search_users(q, queryset).order_by('-rank', '-id').values_list('id', flat=True)[:20]
+                ))
+                scan = self.measure(queries, lambda q: list(
+                    self.icontains_search(q, queryset).order_by('-id').values_list('id', flat=True)[:20]
+                ))
+                self.stdout.write(f'{words}-word queries: {len(queries)}')
+                self.report('ranked search', indexed)
+                self.report('icontains scan', scan)
+                self.stdout.write(self.style.SUCCESS(
+                    f'Speedup (mean): {statistics.mean(scan) / statistics.mean(indexed):.1f}x'
+                ))
+            self.report_index_size()
+            transaction.set_rollback(True)
+        memory_index.reset()
+
+    def create_users(self, count, vocabulary, rng):
+        suffix = int(time.time() * 1000)
+        users = [
+            User(
+                username=f'search-{suffix}-{i}',
+                email=f'search-{suffix}-{i}@bench.local',
+                first_name='Search',
+                last_name=str(i),
+                gender='M' if i % 2 else 'F',
+                age=30,
+                city='Bench',
+                hobbies=', '.join(rng.sample(vocabulary, rng.randint(3, 8))),
+            )
+            for i in range(count)
+        ]
+        User.objects.bulk_create(users, batch_size=5000)
+        user_ids = list(
+            User.objects.filter(username__startswith=f'search-{suffix}-').order_by('id').values_list('id', flat=True)
+        )
+        UserProfile.objects.bulk_create([
+            UserProfile(
+                user_id=user_id,
+                bio=' '.join(rng.sample(vocabulary, 20)),
+                profession=rng.choice(vocabulary) if rng.random() < 0.5 else '',
+                relationship_goals=' '.join(rng.sample(vocabulary, 5)),
+            )
+            for user_id in user_ids
+        ], batch_size=5000)
+        return user_ids
+
+    def icontains_search(self, query, queryset):
+        # Прежний способ искать по тексту: ILIKE по всем полям, без ранжирования
+        for term in query.split():
+            queryset = queryset.filter(
+                Q(hobbies__icontains=term) | Q(profile__bio__icontains=term)
+                | Q(profile__profession__icontains=term) | Q(profile__relationship_goals__icontains=term)
+            )
+        return queryset
+
+    def measure(self, queries, search):
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            search(query)
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def report_index_size(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT pg_relation_size(%s), pg_total_relation_size(%s)',
+                    ['users_usersearchdocument_vector_gin', UserSearchDocument._meta.db_table]
+                )
+                gin_size, total_size = cursor.fetchone()
+            self.stdout.write(
+                f'GIN index: {gin_size / 2 ** 20:.1f} MiB, documents with indexes: {total_size / 2 ** 20:.1f} MiB'
+            )
+            return
+        postings = memory_index.postings or {}
+        size = sys.getsizeof(postings) + sum(
+            sys.getsizeof(token) + sys.getsizeof(entries) for token, entries in postings.items()
+        )
+        self.stdout.write(
+            f'In-memory index: {len(postings)} terms, ~{size / 2 ** 20:.1f} MiB (posting dicts, shallow)'
+        )
+
+    def report(self, label, timings):
+        ordered = sorted(timings)
+        p95 = ordered[int(len(ordered) * 0.95) - 1]
+        self.stdout.write(
+            f'{label:>16}: mean {statistics.mean(timings):.3f} ms, '
+            f'p50 {statistics.median(timings):.3f} ms, p95 {p95:.3f} ms'
+        )
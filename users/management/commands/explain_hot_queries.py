@@ -0,0 +1,136 @@
+import difflib
+import json
+import os
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from core.plans import HOT_QUERIES, explain, plan_differences
+from interactions.models import DateInvitation, Interaction, Match, ViewHistory
+from users.models import User
+
+
+VIEW_HISTORY_SQL = '''
+    INSERT INTO {view_history} (viewer_id, viewed_user_id, viewed_at)
+    SELECT from_user_id, to_user_id, created_at FROM {interactions} WHERE TRUE
+    ON CONFLICT (viewer_id, viewed_user_id) DO NOTHING
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN the ORM query behind each list and discovery view on a generated dataset, '
+        'flag sequential scans and sorts, suggest composite/partial indexes and compare plan shapes '
+        'with the stored snapshots'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=400, help='Mock users to have in the database')
+        parser.add_argument('--interactions', type=int, default=8000, help='Swipes to generate with the users')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--workers', type=int, default=1, help='Mock data generator processes')
+        parser.add_argument('--queries', default='', help='Comma-separated query names, e.g. "matches,liked-users"')
+        parser.add_argument('--snapshot-dir', default=os.path.join(settings.BASE_DIR, 'core', 'plan_snapshots'))
+        parser.add_argument('--update-snapshots', action='store_true', help='Store the current plan shapes')
+        parser.add_argument('--check', action='store_true', help='Fail when a plan differs from its snapshot')
+
+    def handle(self, *args, **options):
+        dataset = {key: options[key] for key in ('users', 'interactions', 'seed')}
+        self.seed_data(options)
+        with connection.cursor() as cursor:
+            # Свежая статистика: план зависит от нее не меньше, чем от индексов
+            cursor.execute('ANALYZE')
+
+        hot_queries = HOT_QUERIES
+        if options['queries']:
+            names = {name.strip() for name in options['queries'].split(',')}
+            hot_queries = [hot_query for hot_query in HOT_QUERIES if hot_query.name in names]
+
+        user = self.pick_user()
+        shapes = {}
+        for hot_query in hot_queries:
+            report = explain(hot_query, user)
+            shapes[hot_query.name] = report.shape
+            self.report(report, options['verbosity'])
+
+        path = os.path.join(options['snapshot_dir'], f'{connection.vendor}.json')
+        if options['update_snapshots']:
+            os.makedirs(options['snapshot_dir'], exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as snapshot:
+                json.dump({'dataset': dataset, 'plans': shapes}, snapshot, ensure_ascii=False, indent=2)
+                snapshot.write('\n')
+            self.stdout.write(f'Stored {len(shapes)} plans in {path}')
+        elif options['check']:
+            self.check_snapshot(path, dataset, shapes)
+
+    def seed_data(self, options):
+        existing = User.objects.filter(username__startswith='mock').count()
+        missing = options['users'] - existing
+        if missing > 0:
+            call_command(
+                'generate_mock_data',
+                users=missing,
+                interactions=options['interactions'] * missing // options['users'],
+                seed=options['seed'],
+                workers=options['workers'],
+                stdout=self.stdout if options['verbosity'] > 1 else StringIO(),
+            )
+        # Генератор не пишет историю просмотров и приглашения: каждый свайп - просмотр,
+        # в каждом мэтче одно приглашение
+        if not ViewHistory.objects.exists():
+            with connection.cursor() as cursor:
+                cursor.execute(VIEW_HISTORY_SQL.format(
+                    view_history=ViewHistory._meta.db_table, interactions=Interaction._meta.db_table
+                ))
+        if not DateInvitation.objects.exists():
+            DateInvitation.objects.bulk_create([
+                DateInvitation(
+                    from_user_id=user1_id, to_user_id=user2_id, message='Кофе в субботу?',
+                    proposed_date=created_at + timedelta(days=3)
+                )
+                for user1_id, user2_id, created_at in Match.objects.values_list('user1_id', 'user2_id', 'created_at')
+            ], batch_size=5000)
+
+    def pick_user(self):
+        # Самый активный пользователь: у него самые длинные списки
+        top = (
+            Interaction.objects.values('from_user').annotate(swipes=Count('id'))
+            .order_by('-swipes', 'from_user').first()
+        )
+        if top is None:
+            raise CommandError('No interactions to explain, generate data first')
+        return User.objects.get(id=top['from_user'])
+
+    def report(self, report, verbosity):
+        timing = f' {report.execution_ms:.2f} ms, {report.buffers} buffers' if report.execution_ms is not None else ''
+        status = self.style.WARNING('WARN') if report.warnings else 'ok'
+        self.stdout.write(f'{report.query.name:<18} {status}{timing}')
+        if verbosity > 1 or report.warnings:
+            for line in report.shape:
+                self.stdout.write(f'    {line}')
+        for warning in report.warnings:
+            self.stdout.write(f'  ! {warning}')
+        for suggestion in report.suggestions:
+            self.stdout.write(f'  + index {suggestion}')
+
+    def check_snapshot(self, path, dataset, shapes):
+        try:
+            with open(path, encoding='utf-8') as snapshot:
+                stored = json.load(snapshot)
+        except FileNotFoundError:
+            raise CommandError(f'No plan snapshot for {connection.vendor}: run with --update-snapshots')
+        if stored['dataset'] != dataset:
+            raise CommandError(f'Snapshot was recorded on dataset {stored["dataset"]}, got {dataset}')
+        expected = {name: plan for name, plan in stored['plans'].items() if name in shapes}
+        changed = plan_differences(expected, shapes)
+        for name in changed:
+            self.stdout.write(self.style.ERROR(f'{name}: plan changed'))
+            for line in difflib.unified_diff(expected.get(name, []), shapes.get(name, []), 'snapshot', 'current', lineterm=''):
+                self.stdout.write(f'    {line}')
+        if changed:
+            raise CommandError('Plans changed: ' + ', '.join(changed) + ' (review and run with --update-snapshots)')
+        self.stdout.write(self.style.SUCCESS(f'{len(shapes)} plans match the snapshot'))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+from users.counters import flush_likes_counters
+
+
+class Command(BaseCommand):
+    help = 'Fold pending likes counter shards into User.likes_count'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep flushing every N seconds (0 - flush once and exit)')
+    
+    def handle(self, *args, **options):
+        interval = options['interval']
+        
+        while True:
+            flushed = flush_likes_counters()
+            self.stdout.write(f'Flushed likes counters for {flushed} users')
+            if not interval:
+                break
+            time.sleep(interval)
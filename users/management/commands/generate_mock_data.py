@@ -1,108 +1,179 @@
-from django.core.management.base import BaseCommand
+import io
+import os
+import random
+import time
+
 from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
 from faker import Faker
-import random
-from users.models import User, UserPhoto, UserProfile
-from interactions.models import Interaction, ViewHistory, Match
+from users.cities import resolve_city
+from users.counters import reconcile_likes_counters
+from users.mock_data import (
+    INTERACTION_COLUMNS, PROFILE_COLUMNS, USER_COLUMNS, USER_TAG_COLUMNS,
+    generate_interactions, generate_users, make_context, run_chunks, vocabulary
+)
+from users.models import User, UserProfile, UserTag
+from users.search import update_search_documents
+from users.tags import get_or_create_tags, parse_hobbies
+from interactions.memberships import backfill_match_memberships
+from interactions.models import Interaction, Match
+
+# Взаимные лайки одним выражением: пара берется один раз, со стороны меньшего id
+MATCHES_SQL = '''
+    INSERT INTO {matches} (user1_id, user2_id, created_at, is_active)
+    SELECT a.from_user_id, a.to_user_id,
+           CASE WHEN a.created_at > b.created_at THEN a.created_at ELSE b.created_at END,
+           TRUE
+    FROM {interactions} a
+    JOIN {interactions} b
+      ON b.from_user_id = a.to_user_id AND b.to_user_id = a.from_user_id AND b.action = 'like'
+    WHERE a.action = 'like' AND a.from_user_id < a.to_user_id
+      AND a.from_user_id BETWEEN %s AND %s
+    ON CONFLICT (user1_id, user2_id) DO NOTHING
+'''
+
 
 class Command(BaseCommand):
-    help = 'Generate mock data for the dating app'
-    
+    help = 'Generate mock users, profiles, swipes and matches (streams chunks, scales to millions of rows)'
+
     def add_arguments(self, parser):
         parser.add_argument('--users', type=int, default=1000, help='Number of users to create')
         parser.add_argument('--interactions', type=int, default=5000, help='Number of interactions to create')
-    
+        parser.add_argument('--seed', type=int, default=42, help='Same seed - same users, pairs and actions')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Generator processes (1 - generate in this process)')
+        parser.add_argument('--chunk-size', type=int, default=20000, help='Users per generation task')
+        parser.add_argument('--cities', type=int, default=100, help='Number of distinct cities')
+
     def handle(self, *args, **options):
-        fake = Faker('ru_RU')
         user_count = options['users']
-        interaction_count = options['interactions']
-        
+        # Больше, чем пар пользователей, уникальных свайпов не бывает
+        interaction_count = min(options['interactions'], user_count * (user_count - 1))
+        chunk_size = options['chunk_size']
+        workers = options['workers']
+        # На Postgres пачки грузятся через COPY, на остальных базах - bulk_create
+        fmt = 'csv' if connection.vendor == 'postgresql' else 'rows'
+
+        first_id = (User.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        last_id = first_id + user_count - 1
+        chunks = [
+            (index, start, min(start + chunk_size, last_id + 1) - 1)
+            for index, start in enumerate(range(first_id, last_id + 1, chunk_size))
+        ]
+        context = self.make_context(options)
+        if workers > 1:
+            # Открытые соединения с базой нельзя делить с дочерними процессами
+            connections.close_all()
+
         self.stdout.write(f'Creating {user_count} users...')
-        
-        # Создаем пользователей
-        users = []
-        for i in range(user_count):
-            gender = random.choice(['M', 'F'])
-            first_name = fake.first_name_male() if gender == 'M' else fake.first_name_female()
-            last_name = fake.last_name_male() if gender == 'M' else fake.last_name_female()
-            
-            user = User(
-                email=fake.unique.email(),
-                first_name=first_name,
-                last_name=last_name,
-                gender=gender,
-                age=random.randint(18, 65),
-                city=fake.city(),
-                hobbies=', '.join(fake.words(nb=random.randint(3, 8))),
-                status=random.choice(['looking', 'relationship', 'married', 'complicated']),
-                privacy_settings=random.choice(['public', 'private', 'friends_only']),
-                password=make_password('password123'),
-            )
-            users.append(user)
-        
-        User.objects.bulk_create(users, batch_size=100)
-        self.stdout.write(f'Created {user_count} users')
-        
-        # Создаем профили для пользователей
-        profiles = []
-        for user in User.objects.all():
-            profile = UserProfile(
-                user=user,
-                bio=fake.text(max_nb_chars=200),
-                height=random.randint(150, 200) if random.random() > 0.3 else None,
-                education=fake.word() if random.random() > 0.5 else '',
-                profession=fake.job() if random.random() > 0.5 else '',
-                smoking=random.random() > 0.7,
-                drinking=random.random() > 0.5,
-                relationship_goals=fake.text(max_nb_chars=100) if random.random() > 0.3 else '',
-            )
-            profiles.append(profile)
-        
-        UserProfile.objects.bulk_create(profiles, batch_size=100)
-        self.stdout.write('Created user profiles')
-        
-        # Создаем взаимодействия
+        started = time.perf_counter()
+        tasks = ((index, start, end - start + 1, context, fmt) for index, start, end in chunks)
+        done = 0
+        for result in run_chunks(generate_users, tasks, workers):
+            with transaction.atomic():
+                self.load(User, USER_COLUMNS, result['users'])
+                self.load(UserProfile, PROFILE_COLUMNS, result['profiles'])
+                self.load(UserTag, USER_TAG_COLUMNS, result['user_tags'])
+            done += result['rows']
+            self.report('users', done, user_count, started, options['verbosity'])
+        with connection.cursor() as cursor:
+            # id пользователей заданы явно - последовательность нужно догнать
+            for sql in connection.ops.sequence_reset_sql(no_style(), [User]):
+                cursor.execute(sql)
+        self.stdout.write(f'Created {user_count} users {self.throughput(user_count, started)}')
+
         self.stdout.write(f'Creating {interaction_count} interactions...')
-        interactions = []
-        all_users = list(User.objects.all())
-        
-        for _ in range(interaction_count):
-            from_user = random.choice(all_users)
-            to_user = random.choice([u for u in all_users if u != from_user])
-            action = random.choice(['like', 'dislike', 'super_like'])
-            
-            interaction = Interaction(
-                from_user=from_user,
-                to_user=to_user,
-                action=action,
+        started = time.perf_counter()
+        tasks = (
+            (
+                index, start, end,
+                # Доля свайпов пачки пропорциональна числу ее пользователей
+                interaction_count * (end - first_id + 1) // user_count
+                - interaction_count * (start - first_id) // user_count,
+                first_id, last_id, context, fmt,
             )
-            interactions.append(interaction)
-        
-        Interaction.objects.bulk_create(interactions, batch_size=100)
-        self.stdout.write(f'Created {interaction_count} interactions')
-        
-        # Создаем мэтчи на основе взаимных лайков
-        self.stdout.write('Creating matches...')
-        likes = Interaction.objects.filter(action='like')
-        matches_created = 0
-        
-        for like in likes:
-            mutual_like = Interaction.objects.filter(
-                from_user=like.to_user,
-                to_user=like.from_user,
-                action='like'
-            ).exists()
-            
-            if mutual_like:
-                user1 = min(like.from_user, like.to_user, key=lambda u: u.id)
-                user2 = max(like.from_user, like.to_user, key=lambda u: u.id)
-                
-                match, created = Match.objects.get_or_create(
-                    user1=user1,
-                    user2=user2
+            for index, start, end in chunks
+        )
+        done = 0
+        for result in run_chunks(generate_interactions, tasks, workers):
+            with transaction.atomic():
+                self.load(Interaction, INTERACTION_COLUMNS, result['interactions'])
+            done += result['rows']
+            self.report('interactions', done, interaction_count, started, options['verbosity'])
+        self.stdout.write(f'Created {done} interactions {self.throughput(done, started)}')
+
+        self.derive(chunks)
+        self.stdout.write(self.style.SUCCESS('Successfully generated mock data'))
+
+    def make_context(self, options):
+        rng = random.Random(options['seed'])
+        fake = Faker('ru_RU')
+        fake.seed_instance(options['seed'])
+
+        # Города и теги создаются заранее: COPY и bulk_create не вызывают сигналы
+        names = []
+        while len(names) < options['cities']:
+            name = fake.city_name()
+            if name not in names:
+                names.append(name)
+        cities = []
+        for name in names:
+            city = resolve_city(name)
+            cities.append((city.name, city.id, rng.uniform(43, 68), rng.uniform(30, 135)))
+        hobbies = get_or_create_tags(parse_hobbies(', '.join(vocabulary(options['seed'])['words'][:300])))
+
+        # Хэш пароля считается один раз - PBKDF2 на каждого пользователя дороже всей генерации
+        return make_context(options['seed'], timezone.now(), make_password('password123'), cities, hobbies)
+
+    def load(self, model, columns, payload):
+        if not payload:
+            return
+        if isinstance(payload, str):
+            # csv.writer пишет None как "" - для nullable-колонок это NULL
+            nullable = [field.column for field in model._meta.concrete_fields if field.null and field.column in columns]
+            options = f', FORCE_NULL ({", ".join(nullable)})' if nullable else ''
+            with connection.cursor() as cursor:
+                cursor.copy_expert(
+                    f'COPY {connection.ops.quote_name(model._meta.db_table)} ({", ".join(columns)}) '
+                    f'FROM STDIN WITH (FORMAT csv{options})',
+                    io.StringIO(payload)
                 )
-                if created:
-                    matches_created += 1
-        
-        self.stdout.write(f'Created {matches_created} matches')
-        self.stdout.write(self.style.SUCCESS('Successfully generated mock data'))
\ No newline at end of file
+        else:
+            model.objects.bulk_create([model(**dict(zip(columns, row))) for row in payload], batch_size=1000)
+
+    def derive(self, chunks):
+        # Счетчики, мэтчи и поисковые документы - set-based выражениями по диапазонам id
+        started = time.perf_counter()
+        reconcile_likes_counters()
+        self.stdout.write(f'Recomputed likes counters in {time.perf_counter() - started:.1f} s')
+
+        started = time.perf_counter()
+        matches = 0
+        first_match_id = (Match.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        sql = MATCHES_SQL.format(matches=Match._meta.db_table, interactions=Interaction._meta.db_table)
+        for _, start, end in chunks:
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [start, end])
+                matches += cursor.rowcount
+        last_match_id = Match.objects.aggregate(last=Max('id'))['last'] or 0
+        backfill_match_memberships(first_match_id, last_match_id)
+        self.stdout.write(f'Created {matches} matches {self.throughput(matches, started)}')
+
+        if connection.vendor == 'postgresql':
+            # Без Postgres поиск строит индекс в памяти сам при первом запросе
+            started = time.perf_counter()
+            for _, start, end in chunks:
+                update_search_documents(range(start, end + 1))
+            self.stdout.write(f'Built search documents in {time.perf_counter() - started:.1f} s')
+
+    def throughput(self, rows, started):
+        elapsed = time.perf_counter() - started
+        return f'in {elapsed:.1f} s ({rows / max(elapsed, 1e-9):,.0f} rows/s)'
+
+    def report(self, phase, done, total, started, verbosity):
+        if verbosity > 0:
+            self.stdout.write(f'  {phase}: {done}/{total} {self.throughput(done, started)}')
@@ -0,0 +1,101 @@
+import os
+import random
+import shutil
+import tempfile
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from core.loadtest import (
+    ENDPOINTS, LoadClient, budget_violations, endpoint_budget, endpoint_label, percentiles, run_endpoint
+)
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed mock data, drive every API endpoint with concurrent clients and report latency, '
+        'throughput and SQL queries; fails when an endpoint exceeds its query or latency budget'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000, help='Mock users to have in the database')
+        parser.add_argument('--interactions', type=int, default=20000, help='Swipes to generate with the users')
+        parser.add_argument('--clients', type=int, default=8, help='Concurrent simulated clients (threads)')
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per endpoint')
+        parser.add_argument('--endpoints', default='', help='Comma-separated labels, e.g. "GET matches,POST interact"')
+        parser.add_argument('--latency-scale', type=float, default=1.0,
+                            help='Multiplier for latency budgets (0 - check query budgets only)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Mock data generator processes')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.seed_data(options)
+
+        endpoints = ENDPOINTS
+        if options['endpoints']:
+            labels = {label.strip() for label in options['endpoints'].split(',')}
+            endpoints = [endpoint for endpoint in ENDPOINTS if endpoint_label(endpoint) in labels]
+
+        population = list(User.objects.filter(is_active=True).values_list('id', flat=True))
+        client_users = rng.sample(
+            list(User.objects.filter(username__startswith='mock', is_active=True)),
+            options['clients']
+        )
+        # Запас кандидатов на свайпы: одиночные, пачки по 10 и прогревочные
+        swipes = (options['requests'] // options['clients'] + 2) * 11
+        clients = [LoadClient(user, population, rng, swipes) for user in client_users]
+
+        media_root = tempfile.mkdtemp()
+        failures = {}
+        started = time.perf_counter()
+        try:
+            # Загруженные фото не должны оставаться в MEDIA_ROOT
+            with override_settings(MEDIA_ROOT=media_root):
+                for endpoint in endpoints:
+                    result = run_endpoint(endpoint, clients, options['requests'])
+                    violations = budget_violations(result, options['latency_scale'])
+                    if violations:
+                        failures[endpoint_label(endpoint)] = violations
+                    self.report(result, violations)
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+        self.stdout.write(f'{len(endpoints)} endpoints in {time.perf_counter() - started:.1f} s')
+
+        if failures:
+            raise CommandError('Budgets exceeded: ' + '; '.join(
+                f'{label}: {", ".join(violations)}' for label, violations in failures.items()
+            ))
+        self.stdout.write(self.style.SUCCESS('All endpoints within budget'))
+
+    def seed_data(self, options):
+        existing = User.objects.filter(username__startswith='mock').count()
+        missing = options['users'] - existing
+        if missing > 0:
+            call_command(
+                'generate_mock_data',
+                users=missing,
+                interactions=options['interactions'] * missing // options['users'],
+                seed=options['seed'],
+                workers=options['workers'],
+                stdout=self.stdout if options['verbosity'] > 1 else StringIO(),
+            )
+        self.stdout.write(f'Mock users: {max(existing, options["users"])}, clients: {options["clients"]}')
+
+    def report(self, result, violations):
+        p50, p95, p99 = percentiles(result.timings)
+        max_queries, p95_ms = endpoint_budget(result.endpoint)
+        queries = f'{sum(result.queries) / max(len(result.queries), 1):.1f}/{max(result.queries, default=0)}'
+        line = (
+            f'{endpoint_label(result.endpoint):<24} {len(result.timings):>5} req '
+            f'{len(result.timings) / max(result.elapsed, 1e-9):>7.1f} req/s  '
+            f'p50 {p50:>7.1f}  p95 {p95:>7.1f}  p99 {p99:>7.1f} ms  '
+            f'queries {queries:>8} (budget {max_queries}, p95 {p95_ms} ms)'
+        )
+        if violations:
+            self.stdout.write(self.style.ERROR(f'{line}  FAIL: {", ".join(violations)}'))
+        else:
+            self.stdout.write(line)
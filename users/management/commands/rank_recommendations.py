@@ -0,0 +1,36 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from users.recommendations import refresh_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Precompute top-N recommended candidates for users whose data changed (or for everyone with --full)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Re-rank all active users, not only stale ones')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Ranking processes (1 - rank in this process)')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Users per ranking task')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep refreshing every N seconds (0 - refresh once and exit)')
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+
+        while True:
+            started = time.perf_counter()
+            ranked = refresh_recommendations(
+                full=options['full'],
+                workers=options['workers'],
+                chunk_size=options['chunk_size'],
+                progress=self.report_progress if options['verbosity'] > 1 else None,
+            )
+            self.stdout.write(f'Ranked {ranked} users in {time.perf_counter() - started:.1f} s')
+            if not interval:
+                break
+            time.sleep(interval)
+
+    def report_progress(self, done, total):
+        self.stdout.write(f'  chunk {done}/{total}')
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+from users.counters import reconcile_likes_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute User.likes_count from Interaction in chunks'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Users per UPDATE statement')
+    
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        processed = reconcile_likes_counters(chunk_size=options['chunk_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Reconciled likes_count for {processed} users in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_likescountershard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userphoto',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,65 @@
+from django.db import migrations, transaction
+from django.db.models import Count
+
+from users.cities import KNOWN_ALIASES, normalize_city
+
+
+CHUNK_SIZE = 10000
+
+
+def backfill_city_ref(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    City = apps.get_model('users', 'City')
+    CityAlias = apps.get_model('users', 'CityAlias')
+
+    # Справочник из различающихся написаний; название города - самое частое написание
+    spellings = {}
+    counts = User.objects.order_by().values_list('city').annotate(total=Count('id'))
+    for city, total in counts.iterator():
+        normalized = normalize_city(city)
+        if normalized:
+            canonical = normalize_city(KNOWN_ALIASES.get(normalized, '')) or normalized
+            spellings.setdefault(canonical, {})[city] = total
+
+    known_names = {normalize_city(name): name for name in KNOWN_ALIASES.values()}
+    alias_city_ids = dict(CityAlias.objects.values_list('normalized_name', 'city_id'))
+    for canonical, raw_names in spellings.items():
+        city_id = alias_city_ids.get(canonical)
+        if city_id is None:
+            name = known_names.get(canonical) or max(raw_names, key=raw_names.get)
+            city_id = City.objects.create(name=' '.join(name.split()), normalized_name=canonical).id
+        for normalized in {canonical} | {normalize_city(raw) for raw in raw_names}:
+            if normalized not in alias_city_ids:
+                CityAlias.objects.create(city_id=city_id, normalized_name=normalized)
+                alias_city_ids[normalized] = city_id
+
+    # Пользователей привязываем диапазонами id, по транзакции на диапазон
+    last_id = 0
+    while True:
+        rows = list(
+            User.objects.filter(id__gt=last_id, city_ref__isnull=True)
+            .order_by('id').values_list('id', 'city')[:CHUNK_SIZE]
+        )
+        if not rows:
+            break
+        by_city = {}
+        for user_id, city in rows:
+            city_id = alias_city_ids.get(normalize_city(city))
+            if city_id is not None:
+                by_city.setdefault(city_id, []).append(user_id)
+        with transaction.atomic():
+            for city_id, user_ids in by_city.items():
+                User.objects.filter(id__in=user_ids).update(city_ref_id=city_id)
+        last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('users', '0005_city'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_city_ref, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+
+
+# Индекс для LIKE '%...%' по алиасам есть только в Postgres с pg_trgm;
+# префиксный поиск покрывает *_like индекс уникального поля
+CREATE_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS users_cityalias_normalized_trgm '
+    'ON users_cityalias USING gin (normalized_name gin_trgm_ops)',
+]
+
+DROP_SQL = [
+    'DROP INDEX IF EXISTS users_cityalias_normalized_trgm',
+]
+
+
+def trigram_available(connection):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def create_trigram_index(apps, schema_editor):
+    if trigram_available(schema_editor.connection):
+        for statement in CREATE_SQL:
+            schema_editor.execute(statement)
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for statement in DROP_SQL:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_backfill_city_ref'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
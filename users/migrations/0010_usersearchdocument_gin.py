@@ -0,0 +1,58 @@
+from django.db import migrations
+
+
+CHUNK_SIZE = 10000
+
+CREATE_INDEX_SQL = (
+    'CREATE INDEX IF NOT EXISTS users_usersearchdocument_vector_gin '
+    'ON users_usersearchdocument USING gin (search_vector)'
+)
+
+DROP_INDEX_SQL = 'DROP INDEX IF EXISTS users_usersearchdocument_vector_gin'
+
+BACKFILL_SQL = '''
+    INSERT INTO users_usersearchdocument (user_id, search_vector, updated_at)
+    SELECT u.id,
+           setweight(to_tsvector('russian', coalesce(u.hobbies, '')), 'A') ||
+           setweight(to_tsvector('russian', coalesce(p.profession, '')), 'B') ||
+           setweight(to_tsvector('russian', coalesce(p.bio, '')), 'C') ||
+           setweight(to_tsvector('russian', coalesce(p.relationship_goals, '')), 'D'),
+           now()
+    FROM users_user u
+    LEFT JOIN users_userprofile p ON p.user_id = u.id
+    WHERE u.id > %s AND u.id <= %s
+    ON CONFLICT (user_id) DO NOTHING
+'''
+
+
+def create_search_index(apps, schema_editor):
+    # GIN и tsvector есть только в Postgres; на SQLite работает индекс в памяти
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    User = apps.get_model('users', 'User')
+    last_id = 0
+    while True:
+        chunk = list(User.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:CHUNK_SIZE])
+        if not chunk:
+            break
+        schema_editor.execute(BACKFILL_SQL, [last_id, chunk[-1]])
+        last_id = chunk[-1]
+    schema_editor.execute(CREATE_INDEX_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_INDEX_SQL)
+
+
+class Migration(migrations.Migration):
+    # Каждая пачка заполнения коммитится сама, индекс строится после заполнения
+    atomic = False
+
+    dependencies = [
+        ('users', '0009_usersearchdocument'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,59 @@
+from django.db import migrations, transaction
+
+from users.tags import parse_hobbies
+
+
+CHUNK_SIZE = 10000
+
+
+def backfill_user_tags(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Tag = apps.get_model('users', 'Tag')
+    UserTag = apps.get_model('users', 'UserTag')
+
+    tag_ids = dict(Tag.objects.values_list('normalized_name', 'id'))
+    # Пользователей разбираем диапазонами id, по транзакции на диапазон
+    last_id = 0
+    while True:
+        rows = list(
+            User.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'hobbies')[:CHUNK_SIZE]
+        )
+        if not rows:
+            break
+        parsed = [(user_id, parse_hobbies(hobbies)) for user_id, hobbies in rows]
+        with transaction.atomic():
+            missing = {}
+            for _, tags in parsed:
+                for normalized, name in tags.items():
+                    if normalized not in tag_ids:
+                        missing.setdefault(normalized, name)
+            if missing:
+                Tag.objects.bulk_create(
+                    [Tag(name=name, normalized_name=normalized) for normalized, name in missing.items()],
+                    ignore_conflicts=True
+                )
+                tag_ids.update(
+                    Tag.objects.filter(normalized_name__in=list(missing)).values_list('normalized_name', 'id')
+                )
+            UserTag.objects.bulk_create(
+                [
+                    UserTag(user_id=user_id, tag_id=tag_ids[normalized])
+                    for user_id, tags in parsed
+                    for normalized in tags
+                ],
+                batch_size=CHUNK_SIZE,
+                ignore_conflicts=True
+            )
+        last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('users', '0011_tag'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_user_tags, migrations.RunPython.noop),
+    ]
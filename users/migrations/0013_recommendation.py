@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_backfill_user_tags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Recommendation',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recommendation', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('candidate_ids', models.JSONField(default=list)),
+                ('computed_at', models.DateTimeField()),
+                ('invalidated_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
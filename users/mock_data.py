@@ -0,0 +1,215 @@
+import csv
+import io
+import random
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+from faker import Faker
+
+from .geo import encode_geohash_many
+
+
+# Порядок колонок совпадает для COPY (Postgres) и bulk_create (остальные базы)
+USER_COLUMNS = (
+    'id', 'password', 'is_superuser', 'username', 'first_name', 'last_name', 'email',
+    'is_staff', 'is_active', 'date_joined', 'gender', 'age', 'city', 'city_ref_id',
+    'latitude', 'longitude', 'geohash', 'hobbies', 'status', 'privacy_settings',
+    'likes_count', 'is_verified', 'created_at', 'updated_at',
+)
+PROFILE_COLUMNS = (
+    'user_id', 'bio', 'height', 'education', 'profession', 'smoking', 'drinking', 'relationship_goals',
+)
+USER_TAG_COLUMNS = ('user_id', 'tag_id')
+INTERACTION_COLUMNS = ('from_user_id', 'to_user_id', 'action', 'created_at')
+
+STATUSES = ['looking', 'relationship', 'married', 'complicated']
+PRIVACY_SETTINGS = ['public', 'private', 'friends_only']
+ACTIONS = ['like', 'dislike', 'super_like']
+
+VOCABULARY_SIZE = 500
+USER_AGE_DAYS = 365
+INTERACTION_AGE_DAYS = 90
+
+_vocabulary = {}
+
+
+def vocabulary(seed):
+    """
+    Словари имен, слов и профессий из Faker. Faker слишком медленный для
+    миллионов строк, поэтому вызывается только здесь, один раз на процесс;
+    строки собираются случайным выбором из словарей.
+    """
+    if seed not in _vocabulary:
+        fake = Faker('ru_RU')
+        fake.seed_instance(seed)
+        _vocabulary[seed] = {
+            'M': (
+                sorted({fake.first_name_male() for _ in range(VOCABULARY_SIZE)}),
+                sorted({fake.last_name_male() for _ in range(VOCABULARY_SIZE)}),
+            ),
+            'F': (
+                sorted({fake.first_name_female() for _ in range(VOCABULARY_SIZE)}),
+                sorted({fake.last_name_female() for _ in range(VOCABULARY_SIZE)}),
+            ),
+            'words': sorted({fake.word() for _ in range(VOCABULARY_SIZE * 4)}),
+            'jobs': sorted({fake.job() for _ in range(VOCABULARY_SIZE)}),
+        }
+    return _vocabulary[seed]
+
+
+def make_context(seed, now, password, cities, hobbies):
+    """
+    Общие для всех пачек параметры генерации. cities - список
+    (название, id города, широта, долгота), hobbies - {хобби: id тега}.
+    """
+    return {
+        'seed': seed,
+        'now': now,
+        'password': password,
+        'cities': cities,
+        # Крупные города заметно населеннее мелких
+        'city_weights': 1 / np.arange(1, len(cities) + 1),
+        'hobbies': sorted(hobbies.items()),
+    }
+
+
+def timestamps(rng, now, max_age_days, size):
+    """size случайных моментов за последние max_age_days дней в формате ISO."""
+    offsets = rng.integers(0, max_age_days * 24 * 60 * 60, size)
+    return [(now - timedelta(seconds=int(offset))).isoformat() for offset in offsets]
+
+
+def encode_rows(rows, fmt):
+    """CSV для COPY или список кортежей для bulk_create."""
+    if fmt != 'csv':
+        return rows
+    buffer = io.StringIO()
+    # Строки в кавычках: COPY прочитает "" как пустую строку, а не NULL
+    csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(rows)
+    return buffer.getvalue()
+
+
+def generate_users(task):
+    """Пользователи с id first_id..first_id+count-1, их профили и теги."""
+    chunk_index, first_id, count, context, fmt = task
+    seed = context['seed']
+    rng = random.Random(f'{seed}:users:{chunk_index}')
+    np_rng = np.random.default_rng([seed, 1, chunk_index])
+    words = vocabulary(seed)
+    cities = context['cities']
+    hobbies = context['hobbies']
+
+    city_weights = context['city_weights']
+    city_indexes = np_rng.choice(len(cities), count, p=city_weights / city_weights.sum())
+    centers = np.array([(city[2], city[3]) for city in cities])[city_indexes]
+    latitudes = np.round(centers[:, 0] + np_rng.normal(0, 0.1, count), 6)
+    longitudes = np.round(centers[:, 1] + np_rng.normal(0, 0.15, count), 6)
+    geohashes = encode_geohash_many(latitudes, longitudes)
+    joined = timestamps(np_rng, context['now'], USER_AGE_DAYS, count)
+
+    users, profiles, user_tags = [], [], []
+    for offset in range(count):
+        user_id = first_id + offset
+        gender = rng.choice('MF')
+        first_names, last_names = words[gender]
+        city_name, city_id = cities[city_indexes[offset]][:2]
+        user_hobbies = rng.sample(hobbies, rng.randint(3, 8))
+        users.append((
+            user_id, context['password'], False, f'mock{user_id}',
+            rng.choice(first_names), rng.choice(last_names), f'mock{user_id}@example.com',
+            False, True, joined[offset], gender, rng.randint(18, 65), city_name, city_id,
+            float(latitudes[offset]), float(longitudes[offset]), str(geohashes[offset]),
+            ', '.join(name for name, _ in user_hobbies),
+            rng.choice(STATUSES), rng.choice(PRIVACY_SETTINGS), 0, False, joined[offset], joined[offset],
+        ))
+        profiles.append((
+            user_id,
+            ' '.join(rng.choices(words['words'], k=rng.randint(10, 30))).capitalize() + '.',
+            rng.randint(150, 200) if rng.random() > 0.3 else None,
+            rng.choice(words['words']) if rng.random() > 0.5 else '',
+            rng.choice(words['jobs']) if rng.random() > 0.5 else '',
+            rng.random() > 0.7,
+            rng.random() > 0.5,
+            ' '.join(rng.choices(words['words'], k=rng.randint(5, 15))).capitalize() + '.'
+            if rng.random() > 0.3 else '',
+        ))
+        user_tags.extend((user_id, tag_id) for _, tag_id in user_hobbies)
+
+    return {
+        'users': encode_rows(users, fmt),
+        'profiles': encode_rows(profiles, fmt),
+        'user_tags': encode_rows(user_tags, fmt),
+        'rows': count,
+    }
+
+
+def generate_interactions(task):
+    """
+    Свайпы пользователей first_from..last_from. Каждый свайпает свой набор
+    различных получателей, а пачки не пересекаются по from_user - поэтому
+    пары (from, to) уникальны без проверок в базе.
+    """
+    chunk_index, first_from, last_from, total, first_id, last_id, context, fmt = task
+    seed = context['seed']
+    rng = random.Random(f'{seed}:interactions:{chunk_index}')
+    np_rng = np.random.default_rng([seed, 2, chunk_index])
+    population = last_id - first_id + 1
+    swipers = last_from - first_from + 1
+
+    # Активность пользователей сильно различается - логнормальное распределение
+    weights = np_rng.lognormal(0, 1, swipers)
+    per_user = np_rng.multinomial(total, weights / weights.sum())
+    while True:
+        # Больше population - 1 получателей не бывает, излишек достается остальным
+        room = population - 1 - per_user
+        excess = int(-room[room < 0].sum())
+        if not excess:
+            break
+        per_user = np.minimum(per_user, population - 1)
+        room = np.maximum(room, 0)
+        per_user += np_rng.multinomial(excess, room / room.sum())
+    count = int(per_user.sum())
+    actions = np_rng.integers(0, len(ACTIONS), count)
+    created = timestamps(np_rng, context['now'], INTERACTION_AGE_DAYS, count)
+
+    rows = []
+    for offset, swipes in enumerate(per_user.tolist()):
+        if not swipes:
+            continue
+        from_id = first_from + offset
+        position = from_id - first_id
+        for target in rng.sample(range(population - 1), swipes):
+            # Номера после самого пользователя сдвигаются на один: себя не свайпают
+            to_id = first_id + target + (target >= position)
+            index = len(rows)
+            rows.append((from_id, to_id, ACTIONS[actions[index]], created[index]))
+
+    if fmt == 'csv':
+        # Только числа и фиксированные строки - кавычки не нужны, а join быстрее csv.writer
+        payload = ''.join(f'{row[0]},{row[1]},{row[2]},{row[3]}\n' for row in rows)
+    else:
+        payload = rows
+    return {'interactions': payload, 'rows': count}
+
+
+def run_chunks(func, tasks, workers, window=None):
+    """
+    Результаты func по задачам в исходном порядке. В работе не больше
+    window задач, чтобы готовые пачки не копились в памяти, пока
+    загрузка отстает от генерации.
+    """
+    if workers < 2:
+        for task in tasks:
+            yield func(task)
+        return
+
+    window = window or workers * 2
+    with ProcessPoolExecutor(workers) as pool:
+        pending = []
+        for task in tasks:
+            pending.append(pool.submit(func, task))
+            if len(pending) >= window:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
@@ -1,7 +1,35 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
+from .geo import encode_geohash
+
+
+class City(models.Model):
+    name = models.CharField(max_length=100)
+    normalized_name = models.CharField(max_length=100, unique=True)
+    
+    def __str__(self):
+        return self.name
+
+
+class CityAlias(models.Model):
+    """Вариант написания города; каноническое название тоже хранится как алиас."""
+    city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='aliases')
+    normalized_name = models.CharField(max_length=100, unique=True)
+    
+    def __str__(self):
+        return f"{self.normalized_name} -> {self.city}"
+
+
+class Tag(models.Model):
+    """Увлечение из справочника; в профиле хобби по-прежнему вводятся строкой."""
+    name = models.CharField(max_length=100)
+    normalized_name = models.CharField(max_length=100, unique=True)
+    
+    def __str__(self):
+        return self.name
 
 
 class User(AbstractUser):
@@ -31,7 +59,27 @@ class User(AbstractUser):
         validators=[MinValueValidator(18), MaxValueValidator(100)]
     )
     city = models.CharField(max_length=100)
+    city_ref = models.ForeignKey(
+        City,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='users'
+    )
+    # Координаты необязательны; geohash считается при сохранении для поиска рядом
+    latitude = models.FloatField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(-90), MaxValueValidator(90)]
+    )
+    longitude = models.FloatField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(-180), MaxValueValidator(180)]
+    )
+    geohash = models.CharField(max_length=12, blank=True, db_index=True)
     hobbies = models.TextField(blank=True)
+    tags = models.ManyToManyField(Tag, through='UserTag', blank=True, related_name='users')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='looking')
     privacy_settings = models.CharField(max_length=20, choices=PRIVACY_CHOICES, default='public')
     likes_count = models.PositiveIntegerField(default=0)
@@ -42,21 +90,79 @@ class User(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
     
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        # Город из базы: save сверяет его со справочником, только если он изменился
+        if 'city' in field_names:
+            user._loaded_city = values[field_names.index('city')]
+        return user
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        if 'city' not in self.get_deferred_fields():
+            self._loaded_city = self.city
+
+    def city_changed(self):
+        if 'city' in self.get_deferred_fields():
+            return False
+        return self._state.adding or getattr(self, '_loaded_city', None) != self.city
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if (update_fields is None or 'city' in update_fields) and self.city_changed():
+            # Привязываем введенное название к справочнику городов
+            from .cities import resolve_city
+            self.city_ref = resolve_city(self.city)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'city_ref'}
+        if update_fields is None or {'latitude', 'longitude'} & set(update_fields):
+            if self.latitude is None or self.longitude is None:
+                self.geohash = ''
+            else:
+                self.geohash = encode_geohash(self.latitude, self.longitude)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'geohash'}
+        super().save(*args, **kwargs)
+        if 'city' not in self.get_deferred_fields():
+            self._loaded_city = self.city
+    
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.email})"
 
 
+class UserTag(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='user_tags')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='user_tags')
+    
+    class Meta:
+        unique_together = ['user', 'tag']
+    
+    def __str__(self):
+        return f"{self.user} - {self.tag}"
+
+
 class UserPhoto(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='photos')
     photo = models.ImageField(upload_to='user_photos/')
     is_main = models.BooleanField(default=False)
+    variants = models.JSONField(default=dict, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     
     def save(self, *args, **kwargs):
-        if self.is_main:
-            # Снимаем флаг is_main с других фото этого пользователя
-            UserPhoto.objects.filter(user=self.user, is_main=True).update(is_main=False)
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if self.is_main:
+                # Снимаем флаг is_main с других фото этого пользователя в той же
+                # транзакции: один UPDATE по индексу, и главным остается последнее
+                UserPhoto.objects.filter(
+                    user_id=self.user_id, is_main=True
+                ).exclude(pk=self.pk).update(is_main=False)
     
     def __str__(self):
         return f"Photo of {self.user}"
@@ -73,4 +179,55 @@ class UserProfile(models.Model):
     relationship_goals = models.TextField(blank=True)
     
     def __str__(self):
-        return f"Profile of {self.user}"
\ No newline at end of file
+        return f"Profile of {self.user}"
+
+
+class LikesCounterShard(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='likes_counter_shards')
+    shard = models.PositiveSmallIntegerField()
+    delta = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['user', 'shard']
+    
+    def __str__(self):
+        return f"Likes shard {self.shard} of {self.user}: {self.delta:+d}"
+
+
+class UserSearchDocument(models.Model):
+    """
+    Поисковый документ пользователя: tsvector из hobbies, profession, bio и
+    relationship_goals с весами A-D. Заполняется только на Postgres.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document'
+    )
+    search_vector = SearchVectorField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Search document of {self.user}"
+
+
+class Recommendation(models.Model):
+    """
+    Заранее посчитанный top-N кандидатов пользователя (команда
+    rank_recommendations). Запись устарела, если invalidated_at позже
+    computed_at: пользователь изменил профиль или кто-то с ним
+    провзаимодействовал после расчета.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='recommendation'
+    )
+    candidate_ids = models.JSONField(default=list)
+    computed_at = models.DateTimeField()
+    invalidated_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Recommendations for {self.user}"
@@ -0,0 +1,377 @@
+import random
+import threading
+import time
+import uuid
+from collections import Counter, namedtuple
+
+from django.conf import settings
+
+from .cities import matching_city_names, normalize_city
+from .models import User
+
+
+POOL_DEFAULTS = {
+    'BACKEND': 'memory',
+    'AGE_BUCKET': 5,
+    'REBUILD_INTERVAL': 60 * 5,
+    'BUILD_CHUNK_SIZE': 10000,
+    'SEGMENTS_TTL': 30,
+}
+
+Segment = namedtuple('Segment', ['gender', 'age_bucket', 'city', 'status'])
+
+
+def pool_setting(name):
+    return getattr(settings, 'CANDIDATE_POOLS', {}).get(name, POOL_DEFAULTS[name])
+
+
+def segment_for(gender, age, city_name, status):
+    # city_name - нормализованное каноническое название из справочника городов
+    return Segment(gender, age // pool_setting('AGE_BUCKET'), city_name, status)
+
+
+def user_city_name(user):
+    return user.city_ref.normalized_name if user.city_ref_id else normalize_city(user.city)
+
+
+class IndexedSet:
+    """Множество со случайным выбором и удалением элемента за O(1)."""
+
+    def __init__(self):
+        self.items = []
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def add(self, item):
+        if item not in self.positions:
+            self.positions[item] = len(self.items)
+            self.items.append(item)
+
+    def discard(self, item):
+        position = self.positions.pop(item, None)
+        if position is None:
+            return
+        last = self.items.pop()
+        if position < len(self.items):
+            self.items[position] = last
+            self.positions[last] = position
+
+    def sample(self, count):
+        if count >= len(self.items):
+            return list(self.items)
+        return random.sample(self.items, count)
+
+
+class MemoryPoolBackend:
+    """Пулы в памяти процесса, периодически пересобираются из базы."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.pools = {}
+        self.members = {}
+        self.built_at = None
+
+    def is_built(self):
+        return self.built_at is not None and (
+            time.monotonic() - self.built_at < pool_setting('REBUILD_INTERVAL')
+        )
+
+    def load(self, rows):
+        pools = {}
+        members = {}
+        for user_id, segment, age in rows:
+            pools.setdefault(segment, IndexedSet()).add(user_id)
+            members[user_id] = (segment, age)
+        with self.lock:
+            self.pools = pools
+            self.members = members
+            self.built_at = time.monotonic()
+
+    def add(self, user_id, segment, age):
+        with self.lock:
+            self.remove(user_id)
+            self.pools.setdefault(segment, IndexedSet()).add(user_id)
+            self.members[user_id] = (segment, age)
+
+    def remove(self, user_id):
+        with self.lock:
+            current = self.members.pop(user_id, None)
+            if current is not None:
+                self.pools[current[0]].discard(user_id)
+
+    def segments(self):
+        with self.lock:
+            return [segment for segment, pool in self.pools.items() if pool]
+
+    def sizes(self, segments):
+        with self.lock:
+            return {segment: len(self.pools[segment]) for segment in segments if self.pools.get(segment)}
+
+    def sample_many(self, counts):
+        drawn = []
+        with self.lock:
+            for segment, count in counts.items():
+                pool = self.pools.get(segment)
+                if pool:
+                    drawn += [(segment, user_id) for user_id in pool.sample(count)]
+        return drawn
+
+    def ages(self, user_ids):
+        with self.lock:
+            return {
+                user_id: self.members[user_id][1]
+                for user_id in user_ids
+                if user_id in self.members
+            }
+
+
+class RedisPoolBackend:
+    """Пулы в Redis: общие для всех процессов, обновляются сигналами любого из них."""
+
+    def __init__(self):
+        import redis
+
+        self.client = redis.Redis.from_url(settings.REDIS_URL)
+        self.prefix = 'candidate-pool'
+
+    def _pool_key(self, segment):
+        return f'{self.prefix}:{"|".join(str(part) for part in segment)}'
+
+    def _parse_segment(self, key):
+        gender, age_bucket, city, status = key.decode()[len(self.prefix) + 1:].split('|', 3)
+        return Segment(gender, int(age_bucket), city, status)
+
+    def is_built(self):
+        return bool(self.client.exists(f'{self.prefix}:built'))
+
+    def load(self, rows):
+        # Новые пулы собираются во временных ключах и подменяют старые одной
+        # транзакцией: пользователи, сменившие сегмент или ушедшие, не остаются в старых
+        staging = f'{self.prefix}:staging:{uuid.uuid4().hex}'
+        pool_keys = set()
+        pipe = self.client.pipeline(transaction=False)
+        for user_id, segment, age in rows:
+            pool_key = self._pool_key(segment)
+            pool_keys.add(pool_key)
+            pipe.sadd(f'{staging}:{pool_key}', user_id)
+            pipe.hset(f'{staging}:members', user_id, f'{pool_key}#{age}')
+            if len(pipe) >= 2 * pool_setting('BUILD_CHUNK_SIZE'):
+                pipe.execute()
+        pipe.execute()
+
+        stale_keys = {key.decode() for key in self.client.smembers(f'{self.prefix}:segments')} - pool_keys
+        pipe = self.client.pipeline()
+        for key in stale_keys:
+            pipe.delete(key)
+        for key in pool_keys:
+            pipe.rename(f'{staging}:{key}', key)
+        pipe.delete(f'{self.prefix}:segments')
+        if pool_keys:
+            pipe.sadd(f'{self.prefix}:segments', *pool_keys)
+            pipe.rename(f'{staging}:members', f'{self.prefix}:members')
+        else:
+            pipe.delete(f'{self.prefix}:members')
+        pipe.set(f'{self.prefix}:built', 1, ex=pool_setting('REBUILD_INTERVAL'))
+        pipe.execute()
+
+    def add(self, user_id, segment, age):
+        self.remove(user_id)
+        pipe = self.client.pipeline()
+        pipe.sadd(self._pool_key(segment), user_id)
+        pipe.sadd(f'{self.prefix}:segments', self._pool_key(segment))
+        pipe.hset(f'{self.prefix}:members', user_id, f'{self._pool_key(segment)}#{age}')
+        pipe.execute()
+
+    def remove(self, user_id):
+        current = self.client.hget(f'{self.prefix}:members', user_id)
+        if current is not None:
+            pool_key = current.decode().rsplit('#', 1)[0]
+            pipe = self.client.pipeline()
+            pipe.srem(pool_key, user_id)
+            pipe.hdel(f'{self.prefix}:members', user_id)
+            pipe.execute()
+
+    def segments(self):
+        return [self._parse_segment(key) for key in self.client.smembers(f'{self.prefix}:segments')]
+
+    def sizes(self, segments):
+        segments = list(segments)
+        pipe = self.client.pipeline(transaction=False)
+        for segment in segments:
+            pipe.scard(self._pool_key(segment))
+        return {segment: size for segment, size in zip(segments, pipe.execute()) if size}
+
+    def sample_many(self, counts):
+        segments = list(counts)
+        pipe = self.client.pipeline(transaction=False)
+        for segment in segments:
+            pipe.srandmember(self._pool_key(segment), counts[segment])
+        return [
+            (segment, int(user_id))
+            for segment, user_ids in zip(segments, pipe.execute())
+            for user_id in user_ids
+        ]
+
+    def ages(self, user_ids):
+        user_ids = list(user_ids)
+        values = self.client.hmget(f'{self.prefix}:members', user_ids) if user_ids else []
+        return {
+            user_id: int(value.decode().rsplit('#', 1)[1])
+            for user_id, value in zip(user_ids, values)
+            if value is not None
+        }
+
+
+class CandidatePoolIndex:
+    """
+    Индекс id пользователей, разбитых на сегменты пол × возрастная корзина ×
+    нормализованный город × статус. Фильтрованная случайная выборка - это
+    выбор подходящих сегментов и случайная выборка из них, без обхода таблицы.
+    """
+
+    def __init__(self):
+        self._backend = None
+        self._build_lock = threading.Lock()
+        self._segments = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            if pool_setting('BACKEND') == 'redis':
+                self._backend = RedisPoolBackend()
+            else:
+                self._backend = MemoryPoolBackend()
+        return self._backend
+
+    def reset(self):
+        self._backend = None
+        self._segments = None
+
+    def ensure_built(self):
+        if self.backend.is_built():
+            return
+        with self._build_lock:
+            if not self.backend.is_built():
+                self.rebuild()
+
+    def rebuild(self):
+        rows = User.objects.filter(is_active=True).values_list(
+            'id', 'gender', 'age', 'city', 'city_ref__normalized_name', 'status'
+        ).iterator(chunk_size=pool_setting('BUILD_CHUNK_SIZE'))
+        self.backend.load(
+            (user_id, segment_for(gender, age, city_name or normalize_city(city), status), age)
+            for user_id, gender, age, city, city_name, status in rows
+        )
+        self._segments = None
+
+    def update(self, user):
+        # Изменения применяются и до сборки: иначе они пропадут, если пулы
+        # уже лежат в Redis, а ключ built истек перед пересборкой
+        if user.is_active:
+            segment = segment_for(user.gender, user.age, user_city_name(user), user.status)
+            self.backend.add(user.id, segment, user.age)
+            cached = self._segments
+            if cached is not None and segment not in cached[1]:
+                self._segments = None
+        else:
+            self.backend.remove(user.id)
+
+    def remove(self, user_id):
+        self.backend.remove(user_id)
+
+    def refresh(self, user_id):
+        """Перечитывает пользователя из базы, если пул отдал его по устаревшему сегменту."""
+        user = User.objects.filter(id=user_id).select_related('city_ref').first()
+        if user is None:
+            self.remove(user_id)
+        else:
+            self.update(user)
+
+    def segments(self):
+        # Список всех сегментов в Redis - SMEMBERS по индексу сегментов; он
+        # меняется редко и кэшируется в процессе на SEGMENTS_TTL. Новые
+        # сегменты этого процесса сбрасывают кэш сразу, других - по истечении
+        cached = self._segments
+        now = time.monotonic()
+        if cached is None or now - cached[0] >= pool_setting('SEGMENTS_TTL'):
+            cached = self._segments = (now, frozenset(self.backend.segments()))
+        return cached[1]
+
+    def matching_segments(self, filters):
+        """{сегмент: размер} для сегментов под фильтры; размеры запрашиваются только у них."""
+        bucket = pool_setting('AGE_BUCKET')
+        min_age = int(filters['min_age']) if filters.get('min_age') else None
+        max_age = int(filters['max_age']) if filters.get('max_age') else None
+        city_names = matching_city_names(filters['city']) if filters.get('city') else None
+
+        matching = []
+        for segment in self.segments():
+            if filters.get('gender') and segment.gender != filters['gender']:
+                continue
+            if filters.get('status') and segment.status != filters['status']:
+                continue
+            if city_names is not None and segment.city not in city_names:
+                continue
+            if min_age is not None and (segment.age_bucket + 1) * bucket <= min_age:
+                continue
+            if max_age is not None and segment.age_bucket * bucket > max_age:
+                continue
+            matching.append(segment)
+        return self.backend.sizes(matching) if matching else {}
+
+    def sample(self, filters, count, exclude=(), max_rounds=5):
+        """Возвращает до count случайных id пользователей, подходящих под фильтры."""
+        self.ensure_built()
+        segments = self.matching_segments(filters)
+        if not segments:
+            return []
+
+        bucket = pool_setting('AGE_BUCKET')
+        min_age = int(filters['min_age']) if filters.get('min_age') else None
+        max_age = int(filters['max_age']) if filters.get('max_age') else None
+        exclude = set(exclude)
+        segment_list = list(segments)
+        weights = [segments[segment] for segment in segment_list]
+        picked = []
+        picked_set = set()
+
+        for _ in range(max_rounds):
+            needed = count - len(picked)
+            if needed <= 0:
+                break
+            # Сегмент выбирается с вероятностью, пропорциональной его размеру
+            counts = Counter(random.choices(segment_list, weights=weights, k=needed * 2))
+            drawn = self.backend.sample_many(counts)
+            random.shuffle(drawn)
+
+            # Крайние корзины возраста перепроверяем по точному возрасту
+            boundary_ids = [
+                user_id for segment, user_id in drawn
+                if (min_age is not None and segment.age_bucket * bucket < min_age)
+                or (max_age is not None and (segment.age_bucket + 1) * bucket - 1 > max_age)
+            ]
+            ages = self.backend.ages(boundary_ids) if boundary_ids else {}
+
+            for segment, user_id in drawn:
+                if user_id in exclude or user_id in picked_set:
+                    continue
+                age = ages.get(user_id)
+                if age is not None and (
+                    (min_age is not None and age < min_age)
+                    or (max_age is not None and age > max_age)
+                ):
+                    continue
+                picked.append(user_id)
+                picked_set.add(user_id)
+                if len(picked) >= count:
+                    break
+
+        return picked
+
+
+candidate_pools = CandidatePoolIndex()
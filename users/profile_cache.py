@@ -0,0 +1,174 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+PROFILE_CACHE_DEFAULTS = {
+    'BACKEND': 'memory',
+    'MAX_ENTRIES': 10000,
+    'TTL': 60,
+}
+
+
+def profile_cache_setting(name):
+    return getattr(settings, 'PROFILE_CACHE', {}).get(name, PROFILE_CACHE_DEFAULTS[name])
+
+
+def new_version():
+    return time.time_ns()
+
+
+class MemoryProfileCacheBackend:
+    """
+    Отрисованные профили в LRU-кэше процесса, версии - в общем кэше Django,
+    чтобы сохранение в любом процессе делало устаревшими записи во всех.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.prefix = 'profile-card-version'
+
+    def _version_key(self, user_id):
+        return f'{self.prefix}:{user_id}'
+
+    def versions(self, user_ids):
+        keys = {self._version_key(user_id): user_id for user_id in user_ids}
+        found = cache.get_many(list(keys))
+        versions = {keys[key]: version for key, version in found.items()}
+        # Недостающие версии заводятся одной записью; при гонке с другим
+        # процессом запись одного из них просто не совпадет и отрисуется заново
+        missing = {user_id: new_version() for user_id in user_ids if user_id not in versions}
+        if missing:
+            cache.set_many({self._version_key(user_id): version for user_id, version in missing.items()}, timeout=None)
+            versions.update(missing)
+        return versions
+
+    def get_many(self, user_ids, variant):
+        versions = self.versions(user_ids)
+        now = time.monotonic()
+        found = {}
+        with self.lock:
+            for user_id in user_ids:
+                entry = self.entries.get((variant, user_id))
+                if entry is None:
+                    continue
+                version, expires_at, data = entry
+                if version == versions[user_id] and expires_at > now:
+                    self.entries.move_to_end((variant, user_id))
+                    found[user_id] = data
+        return found, versions
+
+    def set_many(self, items, versions, variant):
+        expires_at = time.monotonic() + profile_cache_setting('TTL')
+        max_entries = profile_cache_setting('MAX_ENTRIES')
+        with self.lock:
+            for user_id, data in items.items():
+                self.entries[(variant, user_id)] = (versions[user_id], expires_at, data)
+                self.entries.move_to_end((variant, user_id))
+            while len(self.entries) > max_entries:
+                self.entries.popitem(last=False)
+
+    def bump(self, user_ids):
+        cache.set_many({self._version_key(user_id): new_version() for user_id in user_ids}, timeout=None)
+
+
+class RedisProfileCacheBackend:
+    """Версии и отрисованные профили в Redis: версии и записи читаются одним конвейером."""
+
+    def __init__(self):
+        import redis
+
+        self.client = redis.Redis.from_url(settings.REDIS_URL)
+        self.prefix = 'profile-card'
+
+    def _entry_key(self, variant, user_id):
+        return f'{self.prefix}:{variant}:{user_id}'
+
+    def get_many(self, user_ids, variant):
+        user_ids = list(user_ids)
+        pipe = self.client.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.hsetnx(f'{self.prefix}:versions', user_id, new_version())
+        pipe.hmget(f'{self.prefix}:versions', user_ids)
+        pipe.mget([self._entry_key(variant, user_id) for user_id in user_ids])
+        *_, raw_versions, raw_entries = pipe.execute()
+
+        versions = {}
+        found = {}
+        for user_id, version, raw in zip(user_ids, raw_versions, raw_entries):
+            versions[user_id] = int(version)
+            if raw is None:
+                continue
+            entry = json.loads(raw)
+            if entry['v'] == versions[user_id]:
+                found[user_id] = entry['data']
+        return found, versions
+
+    def set_many(self, items, versions, variant):
+        pipe = self.client.pipeline(transaction=False)
+        for user_id, data in items.items():
+            entry = json.dumps({'v': versions[user_id], 'data': data})
+            pipe.set(self._entry_key(variant, user_id), entry, ex=profile_cache_setting('TTL'))
+        pipe.execute()
+
+    def bump(self, user_ids):
+        self.client.hset(
+            f'{self.prefix}:versions',
+            mapping={user_id: new_version() for user_id in user_ids}
+        )
+
+
+class ProfileCache:
+    """
+    Кэш отрисованного JSON профилей по id пользователя и версии. Версию
+    меняют сигналы сохранения User, UserProfile и UserPhoto; запись со
+    старой версией считается промахом. Счетчик лайков версию не меняет и
+    может отставать на время жизни записи (TTL).
+
+    variant отделяет разные представления одного профиля: карточку и
+    полный профиль, формат фото, хост в абсолютных ссылках.
+    """
+
+    def __init__(self):
+        self._backend = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            if profile_cache_setting('BACKEND') == 'redis':
+                self._backend = RedisProfileCacheBackend()
+            else:
+                self._backend = MemoryProfileCacheBackend()
+        return self._backend
+
+    def reset(self):
+        self._backend = None
+
+    def get_or_render(self, user_ids, variant, render):
+        """
+        Возвращает {user_id: data}: попадания берутся из кэша за одно
+        обращение, промахи отрисовывает render(missing_ids) -> {user_id: data}.
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return {}
+        found, versions = self.backend.get_many(user_ids, variant)
+        missing = [user_id for user_id in user_ids if user_id not in found]
+        if missing:
+            rendered = render(missing)
+            self.backend.set_many(rendered, versions, variant)
+            found.update(rendered)
+        return found
+
+    def invalidate(self, user_ids):
+        user_ids = [user_id for user_id in user_ids if user_id is not None]
+        if user_ids:
+            self.backend.bump(user_ids)
+
+
+profile_cache = ProfileCache()
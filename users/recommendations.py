@@ -0,0 +1,248 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from interactions.models import Interaction
+from interactions.seen import SeenSet
+from .compatibility import compatibility_index, rank_candidates
+from .models import Recommendation, User
+from .pools import candidate_pools
+
+
+RECOMMENDATION_DEFAULTS = {
+    'TOP_N': 100,
+    'CHUNK_SIZE': 500,
+    'MAX_AGE': 60 * 60 * 24,
+    'AGE_WINDOW': 10,
+    'AGE_SCALE': 5,
+    'CANDIDATE_LIMIT': 5000,
+    'WEIGHTS': {
+        'age': 1.0,
+        'city': 1.0,
+        'tags': 2.0,
+        'popularity': 0.5,
+        'reciprocal': 2.0,
+    },
+}
+
+LIKE_ACTIONS = ('like', 'super_like')
+
+
+def recommendation_setting(name):
+    return getattr(settings, 'RECOMMENDATIONS', {}).get(name, RECOMMENDATION_DEFAULTS[name])
+
+
+def mark_stale(user_ids):
+    Recommendation.objects.filter(user_id__in=list(user_ids)).update(invalidated_at=timezone.now())
+
+
+class RankingSnapshot:
+    """
+    Признаки всех активных пользователей в массивах NumPy, индексированных
+    позицией пользователя (id по возрастанию). Собирается один раз на запуск
+    и наследуется воркерами пула при fork без копирования.
+    """
+
+    def __init__(self):
+        rows = list(
+            User.objects.filter(is_active=True).order_by('id')
+            .values_list('id', 'gender', 'age', 'city_ref_id', 'likes_count')
+        )
+        ids, genders, ages, city_ids, likes = zip(*rows) if rows else ((), (), (), (), ())
+        self.user_ids = np.array(ids, dtype=np.int64)
+        self.genders = np.array(genders, dtype='U1')
+        self.ages = np.array(ages, dtype=np.float64)
+        self.city_ids = np.array([city_id or 0 for city_id in city_ids], dtype=np.int64)
+        popularity = np.log1p(np.array(likes, dtype=np.float64))
+        self.popularity = popularity / popularity.max() if len(popularity) and popularity.max() > 0 else popularity
+
+        # Склонность отвечать лайком: доля лайков среди свайпов со сглаживанием Лапласа
+        self.like_rate = np.full(len(self.user_ids), 0.5)
+        stats = np.array(list(
+            Interaction.objects.order_by().values('from_user_id')
+            .annotate(total=Count('id'), likes=Count('id', filter=Q(action__in=LIKE_ACTIONS)))
+            .values_list('from_user_id', 'total', 'likes')
+        ), dtype=np.int64).reshape(-1, 3)
+        positions, found = self.locate(stats[:, 0])
+        self.like_rate[positions[found]] = (stats[found, 2] + 1) / (stats[found, 1] + 2)
+
+        # Кандидаты по умолчанию - жители того же города
+        order = np.argsort(self.city_ids, kind='stable')
+        cities, starts = np.unique(self.city_ids[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        self.city_members = {
+            int(city_id): order[start:end]
+            for city_id, start, end in zip(cities, starts, ends)
+            if city_id
+        }
+        compatibility_index.rebuild()
+
+    def position(self, user_id):
+        positions = self.positions([user_id])
+        return int(positions[0]) if len(positions) else None
+
+    def locate(self, user_ids):
+        """Позиции пользователей и маска тех, кто есть в снимке."""
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        if not len(self.user_ids):
+            return np.zeros(len(user_ids), dtype=np.int64), np.zeros(len(user_ids), dtype=bool)
+        positions = np.minimum(np.searchsorted(self.user_ids, user_ids), len(self.user_ids) - 1)
+        return positions, self.user_ids[positions] == user_ids
+
+    def positions(self, user_ids):
+        positions, found = self.locate(list(user_ids))
+        return positions[found]
+
+    def rank(self, viewer_id, swiped_ids=(), liked_ids=(), liker_ids=()):
+        """top-N id кандидатов для зрителя по убыванию взвешенной оценки."""
+        viewer = self.position(viewer_id)
+        if viewer is None:
+            return []
+        likers = self.positions(liker_ids)
+        groups = [likers]
+        if self.city_ids[viewer]:
+            groups.append(self.city_members[int(self.city_ids[viewer])])
+        candidates = np.unique(np.concatenate(groups))
+
+        is_liker = np.isin(candidates, likers)
+        age_gap = np.abs(self.ages[candidates] - self.ages[viewer])
+        keep = is_liker | (age_gap <= recommendation_setting('AGE_WINDOW'))
+        keep &= ~np.isin(candidates, np.append(self.positions(swiped_ids), viewer))
+        liked = self.positions(liked_ids)
+        if len(liked):
+            # Пол кандидатов - тот, который зритель уже лайкал
+            keep &= np.isin(self.genders[candidates], np.unique(self.genders[liked]))
+        candidates, is_liker, age_gap = candidates[keep], is_liker[keep], age_gap[keep]
+        if not len(candidates):
+            return []
+
+        weights = recommendation_setting('WEIGHTS')
+        scores = (
+            weights['age'] * np.exp(-age_gap / recommendation_setting('AGE_SCALE'))
+            + weights['city'] * (self.city_ids[candidates] == self.city_ids[viewer])
+            + weights['popularity'] * self.popularity[candidates]
+            + weights['reciprocal'] * np.where(is_liker, 1.0, self.like_rate[candidates])
+        )
+        # Совместимость по тегам - самая дорогая часть, считаем ее только для лучших по остальным признакам
+        limit = recommendation_setting('CANDIDATE_LIMIT')
+        if len(candidates) > limit:
+            best = np.argpartition(-scores, limit - 1)[:limit]
+            candidates, scores = candidates[best], scores[best]
+        viewer_tags = compatibility_index.user_tags(viewer_id)
+        scores = scores + weights['tags'] * compatibility_index.score(
+            viewer_tags, self.user_ids[candidates], 'jaccard'
+        )
+
+        top_n = min(recommendation_setting('TOP_N'), len(candidates))
+        top = np.argpartition(-scores, top_n - 1)[:top_n]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return self.user_ids[candidates[top]].tolist()
+
+
+# Снимок текущего запуска; воркеры пула получают его через fork
+_snapshot = None
+
+
+def rank_chunk(viewer_ids):
+    """Ранжирует пачку зрителей: [(viewer_id, [candidate_id, ...]), ...]."""
+    viewer_ids = list(viewer_ids)
+    swiped = {}
+    liked = {}
+    rows = Interaction.objects.filter(from_user_id__in=viewer_ids).values_list('from_user_id', 'to_user_id', 'action')
+    for from_id, to_id, action in rows:
+        swiped.setdefault(from_id, []).append(to_id)
+        if action in LIKE_ACTIONS:
+            liked.setdefault(from_id, []).append(to_id)
+    likers = {}
+    rows = Interaction.objects.filter(to_user_id__in=viewer_ids, action__in=LIKE_ACTIONS).values_list(
+        'to_user_id', 'from_user_id'
+    )
+    for to_id, from_id in rows:
+        likers.setdefault(to_id, []).append(from_id)
+    return [
+        (viewer_id, _snapshot.rank(
+            viewer_id, swiped.get(viewer_id, ()), liked.get(viewer_id, ()), likers.get(viewer_id, ())
+        ))
+        for viewer_id in viewer_ids
+    ]
+
+
+def stale_user_ids():
+    """Активные пользователи без рекомендаций, с устаревшими или старше MAX_AGE."""
+    expired = timezone.now() - timedelta(seconds=recommendation_setting('MAX_AGE'))
+    return User.objects.filter(is_active=True).filter(
+        Q(recommendation__isnull=True)
+        | Q(recommendation__invalidated_at__gte=F('recommendation__computed_at'))
+        | Q(recommendation__computed_at__lt=expired)
+    ).order_by('id').values_list('id', flat=True)
+
+
+def save_recommendations(results, computed_at):
+    Recommendation.objects.bulk_create(
+        [
+            Recommendation(user_id=viewer_id, candidate_ids=candidate_ids, computed_at=computed_at)
+            for viewer_id, candidate_ids in results
+        ],
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['candidate_ids', 'computed_at'],
+    )
+
+
+def refresh_recommendations(full=False, workers=0, chunk_size=None, progress=None):
+    """
+    Пересчитывает top-N для устаревших пользователей (full - для всех) и
+    возвращает их число. Пачки по chunk_size зрителей ранжируются в пуле из
+    workers процессов; при workers < 2 - в текущем процессе.
+    """
+    global _snapshot
+
+    # Время начала: отметки устаревания во время расчета останутся позже computed_at
+    computed_at = timezone.now()
+    viewer_ids = list(
+        User.objects.filter(is_active=True).order_by('id').values_list('id', flat=True)
+        if full else stale_user_ids()
+    )
+    if not viewer_ids:
+        return 0
+    chunk_size = chunk_size or recommendation_setting('CHUNK_SIZE')
+    chunks = [viewer_ids[start:start + chunk_size] for start in range(0, len(viewer_ids), chunk_size)]
+
+    _snapshot = RankingSnapshot()
+    try:
+        if workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            # Открытые соединения с базой нельзя делить с дочерними процессами
+            connections.close_all()
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork')) as pool:
+                results = pool.map(rank_chunk, chunks)
+                for done, chunk_results in enumerate(results, 1):
+                    save_recommendations(chunk_results, computed_at)
+                    if progress:
+                        progress(done, len(chunks))
+        else:
+            for done, chunk in enumerate(chunks, 1):
+                save_recommendations(rank_chunk(chunk), computed_at)
+                if progress:
+                    progress(done, len(chunks))
+    finally:
+        _snapshot = None
+    return len(viewer_ids)
+
+
+def recommended_user_ids(viewer, limit):
+    """
+    Непросмотренные кандидаты из заранее посчитанного списка. Пока
+    пользователь не попал в расчет - выборка из пулов, упорядоченная по
+    совместимости тегов.
+    """
+    candidate_ids = Recommendation.objects.filter(user=viewer).values_list('candidate_ids', flat=True).first()
+    if candidate_ids is None:
+        sample = candidate_pools.sample({}, recommendation_setting('TOP_N'), exclude={viewer.id})
+        candidate_ids = rank_candidates(viewer.id, sample)
+    return SeenSet.for_viewer(viewer.id).filter_unseen(candidate_ids)[:limit]
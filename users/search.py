@@ -0,0 +1,204 @@
+import math
+import re
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast
+
+from .models import User, UserProfile, UserSearchDocument
+
+
+SEARCH_DEFAULTS = {
+    'CONFIG': 'russian',
+    'MAX_TERMS': 8,
+}
+
+# Поле -> вес: совпадение в хобби важнее, чем в описании
+SEARCH_FIELDS = (
+    ('hobbies', 'A'),
+    ('profile__profession', 'B'),
+    ('profile__bio', 'C'),
+    ('profile__relationship_goals', 'D'),
+)
+
+# Веса D, C, B, A как у ts_rank по умолчанию
+WEIGHT_VALUES = {'A': 1.0, 'B': 0.4, 'C': 0.2, 'D': 0.1}
+
+UPDATE_DOCUMENTS_SQL = '''
+    INSERT INTO {documents} (user_id, search_vector, updated_at)
+    SELECT u.id,
+           setweight(to_tsvector(%(config)s::regconfig, coalesce(u.hobbies, '')), 'A') ||
+           setweight(to_tsvector(%(config)s::regconfig, coalesce(p.profession, '')), 'B') ||
+           setweight(to_tsvector(%(config)s::regconfig, coalesce(p.bio, '')), 'C') ||
+           setweight(to_tsvector(%(config)s::regconfig, coalesce(p.relationship_goals, '')), 'D'),
+           now()
+    FROM {users} u
+    LEFT JOIN {profiles} p ON p.user_id = u.id
+    WHERE u.id = ANY(%(user_ids)s)
+    ON CONFLICT (user_id) DO UPDATE
+    SET search_vector = EXCLUDED.search_vector, updated_at = EXCLUDED.updated_at
+'''
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def search_setting(name):
+    return getattr(settings, 'USER_SEARCH', {}).get(name, SEARCH_DEFAULTS[name])
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').replace('ё', 'е').replace('Ё', 'Е').casefold())
+
+
+def query_terms(query):
+    return list(dict.fromkeys(tokenize(query)))[:search_setting('MAX_TERMS')]
+
+
+def raw_tsquery(terms):
+    # По префиксу ищется только последнее, недописанное слово: префикс от
+    # основы слова совпадает с тысячами документов, и все их нужно ранжировать
+    return ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+
+
+def update_search_documents(user_ids):
+    """Пересчитывает поисковые документы пользователей одним выражением (Postgres) или в памяти."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    if connection.vendor != 'postgresql':
+        memory_index.update(user_ids)
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(UPDATE_DOCUMENTS_SQL.format(
+            documents=UserSearchDocument._meta.db_table,
+            users=User._meta.db_table,
+            profiles=UserProfile._meta.db_table,
+        ), {'config': search_setting('CONFIG'), 'user_ids': user_ids})
+
+
+class MemorySearchIndex:
+    """
+    Инвертированный индекс в памяти процесса для баз без tsvector (SQLite
+    в тестах и локально): терм -> {user_id: взвешенная частота}. Последний
+    терм запроса ищется по префиксу, как term:* в tsquery.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.postings = None
+        self.documents = {}
+
+    def reset(self):
+        with self.lock:
+            self.postings = None
+            self.documents = {}
+
+    def rows(self, user_ids=None):
+        queryset = User.objects.all()
+        if user_ids is not None:
+            queryset = queryset.filter(id__in=user_ids)
+        return queryset.values_list('id', *(field for field, _ in SEARCH_FIELDS)).iterator()
+
+    def ensure_built(self):
+        with self.lock:
+            if self.postings is None:
+                self.postings = {}
+                for row in self.rows():
+                    self._add(row[0], row[1:])
+
+    def update(self, user_ids):
+        with self.lock:
+            if self.postings is None:
+                return
+            for user_id in user_ids:
+                self._remove(user_id)
+            for row in self.rows(user_ids):
+                self._add(row[0], row[1:])
+
+    def remove(self, user_id):
+        with self.lock:
+            if self.postings is not None:
+                self._remove(user_id)
+
+    def _add(self, user_id, texts):
+        weights = Counter()
+        for text, (_, weight) in zip(texts, SEARCH_FIELDS):
+            for token in tokenize(text):
+                weights[token] += WEIGHT_VALUES[weight]
+        self.documents[user_id] = weights
+        for token, value in weights.items():
+            self.postings.setdefault(token, {})[user_id] = value
+
+    def _remove(self, user_id):
+        for token in self.documents.pop(user_id, ()):
+            postings = self.postings.get(token)
+            if postings is not None:
+                postings.pop(user_id, None)
+                if not postings:
+                    del self.postings[token]
+
+    def search(self, terms):
+        """{user_id: ранг} для документов, содержащих все термы запроса."""
+        self.ensure_built()
+        with self.lock:
+            total = max(len(self.documents), 1)
+            scores = None
+            for index, term in enumerate(terms):
+                matched = Counter()
+                if index == len(terms) - 1:
+                    for token, postings in self.postings.items():
+                        if token.startswith(term):
+                            for user_id, value in postings.items():
+                                matched[user_id] = max(matched[user_id], value)
+                else:
+                    matched.update(self.postings.get(term, {}))
+                idf = math.log(1 + total / (1 + len(matched)))
+                term_scores = {user_id: value * idf for user_id, value in matched.items()}
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {
+                        user_id: score + term_scores[user_id]
+                        for user_id, score in scores.items()
+                        if user_id in term_scores
+                    }
+                if not scores:
+                    return {}
+            return scores or {}
+
+
+memory_index = MemorySearchIndex()
+
+
+def search_users(query, queryset=None):
+    """
+    Пользователи, у которых есть все слова запроса (последнее - по
+    префиксу), с аннотацией rank. Пустой запрос дает пустой результат.
+    """
+    if queryset is None:
+        queryset = User.objects.all()
+    terms = query_terms(query)
+    if not terms:
+        return queryset.none().annotate(rank=Value(0.0, output_field=FloatField()))
+
+    if connection.vendor == 'postgresql':
+        tsquery = SearchQuery(
+            raw_tsquery(terms),
+            search_type='raw',
+            config=search_setting('CONFIG'),
+        )
+        # double precision, чтобы ранг из курсора точно совпадал при сравнении
+        return queryset.filter(search_document__search_vector=tsquery).annotate(
+            rank=Cast(SearchRank(F('search_document__search_vector'), tsquery), FloatField())
+        )
+
+    scores = memory_index.search(terms)
+    return queryset.filter(id__in=list(scores)).annotate(rank=Case(
+        *[When(id=user_id, then=Value(score)) for user_id, score in scores.items()],
+        default=Value(0.0),
+        output_field=FloatField(),
+    ))
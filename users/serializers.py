@@ -1,12 +1,73 @@
+import uuid
+
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
+from django.core.files.storage import default_storage
+from django.db.models import OuterRef, Subquery
+from core.celery import enqueue
+from core.serializers import query_param_list
+from .images import VARIANT_FORMATS, VARIANT_SIZES
 from .models import User, UserPhoto, UserProfile
+from .profile_cache import profile_cache
+from .tasks import create_user_profile
+
+
+def requested_photo_format(request):
+    if request is None:
+        return 'jpeg'
+    fmt = request.query_params.get('photo_format')
+    if fmt in VARIANT_FORMATS:
+        return fmt
+    return 'webp' if 'image/webp' in request.META.get('HTTP_ACCEPT', '') else 'jpeg'
+
+
+def media_url(request, path):
+    url = default_storage.url(path)
+    return request.build_absolute_uri(url) if request else url
+
+
+def profile_cache_variant(kind, request):
+    # Отрисованный профиль зависит от формата и размера фото и хоста в ссылках
+    if request is None:
+        return f'{kind}:jpeg::'
+    size = request.query_params.get('photo_size', '')
+    size = size if size in VARIANT_SIZES else ''
+    return f'{kind}:{requested_photo_format(request)}:{size}:{request.get_host()}'
 
 
 class UserPhotoSerializer(serializers.ModelSerializer):
+    """
+    Кроме оригинала отдает ссылки на уменьшенные варианты. Клиент выбирает
+    размер параметром ?photo_size=thumb|card|full (тогда photo указывает на
+    вариант), формат - ?photo_format=webp|jpeg или заголовком Accept.
+    """
+    variants = serializers.SerializerMethodField()
+    
     class Meta:
         model = UserPhoto
-        fields = ['id', 'photo', 'is_main', 'uploaded_at']
+        fields = ['id', 'photo', 'is_main', 'variants', 'uploaded_at']
+    
+    def get_requested_size(self):
+        request = self.context.get('request')
+        size = request.query_params.get('photo_size') if request else None
+        return size if size in VARIANT_SIZES else None
+    
+    def get_variants(self, obj):
+        request = self.context.get('request')
+        size = self.get_requested_size()
+        fmt = requested_photo_format(request)
+        return {
+            name: media_url(request, variant[fmt])
+            for name, variant in (obj.variants or {}).items()
+            if not size or name == size
+        }
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        size = self.get_requested_size()
+        if size and data['variants'].get(size):
+            data['photo'] = data['variants'][size]
+        return data
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
@@ -16,17 +77,166 @@ class UserProfileSerializer(serializers.ModelSerializer):
                  'smoking', 'drinking', 'relationship_goals']
 
 
+class CachedUserListSerializer(serializers.ListSerializer):
+    """Список полных профилей: готовый JSON берется из profile_cache, отрисовываются только промахи."""
+    
+    def to_representation(self, data):
+        users = list(data.all() if hasattr(data, 'all') else data)
+        by_id = {user.id: user for user in users}
+        rendered = profile_cache.get_or_render(
+            list(by_id), profile_cache_variant('full', self.context.get('request')),
+            lambda user_ids: render_users([by_id[user_id] for user_id in user_ids], self.context)
+        )
+        return [rendered[user.id] for user in users]
+
+
 class UserSerializer(serializers.ModelSerializer):
     photos = UserPhotoSerializer(many=True, read_only=True)
     profile = UserProfileSerializer(read_only=True)
     
     class Meta:
         model = User
+        list_serializer_class = CachedUserListSerializer
         fields = ['id', 'email', 'first_name', 'last_name', 'gender', 
                  'age', 'city', 'hobbies', 'status', 'privacy_settings',
                  'likes_count', 'is_verified', 'photos', 'profile', 
-                 'created_at']
+                 'latitude', 'longitude', 'created_at']
         read_only_fields = ['likes_count', 'is_verified', 'created_at']
+        # Точные координаты другим пользователям не показываем
+        extra_kwargs = {
+            'latitude': {'write_only': True},
+            'longitude': {'write_only': True},
+        }
+
+
+class UserCardSerializer(serializers.Serializer):
+    """
+    Компактная карточка пользователя для вложенных ответов. Сериализует
+    строки из card_rows() - словари .values(), без создания моделей.
+    """
+    id = serializers.IntegerField(read_only=True)
+    first_name = serializers.CharField(read_only=True)
+    age = serializers.IntegerField(read_only=True)
+    city = serializers.CharField(read_only=True)
+    photo = serializers.SerializerMethodField()
+    
+    @staticmethod
+    def card_rows(user_ids):
+        return UserCardSerializer.card_values(User.objects.filter(id__in=user_ids))
+    
+    @staticmethod
+    def card_values(queryset, *extra_fields):
+        # Главное фото, а если его нет - последнее загруженное
+        photo = UserPhoto.objects.filter(user=OuterRef('pk')).order_by('-is_main', '-uploaded_at')
+        return queryset.annotate(
+            photo=Subquery(photo.values('photo')[:1]),
+            photo_variants=Subquery(photo.values('variants')[:1]),
+        ).values('id', 'first_name', 'age', 'city', 'photo', 'photo_variants', *extra_fields)
+    
+    def get_photo(self, row):
+        if not row['photo']:
+            return None
+        request = self.context.get('request')
+        variants = row['photo_variants'] or {}
+        if 'card' in variants:
+            return media_url(request, variants['card'][requested_photo_format(request)])
+        return media_url(request, row['photo'])
+
+
+class UserSearchResultSerializer(UserCardSerializer):
+    rank = serializers.FloatField(read_only=True)
+
+
+class UserCardField(serializers.Field):
+    """
+    Вложенный пользователь по id внешнего ключа (source='from_user_id').
+    По умолчанию отдается карточка, ?expand=<имя поля> - полный UserSerializer.
+    Данные для всех полей и строк страницы загружаются пачкой, см. load_user_cards.
+    """
+    expand_query_param = 'expand'
+    
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+    
+    def is_expanded(self):
+        return self.field_name in query_param_list(self.context.get('request'), self.expand_query_param)
+    
+    def get_attribute(self, instance):
+        user_id = super().get_attribute(instance)
+        if user_id is not None and user_id not in self.cache():
+            # Одиночный объект: загружаем пользователей всех полей разом
+            load_user_cards(self.parent, [instance])
+        return user_id
+    
+    def cache(self):
+        key = 'expanded_users' if self.is_expanded() else 'user_cards'
+        return self.context.setdefault(key, {})
+    
+    def to_representation(self, user_id):
+        return self.cache().get(user_id)
+
+
+def load_user_cards(serializer, instances):
+    """Одним запросом на вид данных заполняет кэш карточек в контексте сериализатора."""
+    wanted = {False: set(), True: set()}
+    for field in serializer.fields.values():
+        if isinstance(field, UserCardField):
+            ids = wanted[field.is_expanded()]
+            for instance in instances:
+                ids.add(serializers.Field.get_attribute(field, instance))
+    
+    context = serializer.context
+    request = context.get('request')
+    cards = context.setdefault('user_cards', {})
+    missing = wanted[False] - set(cards) - {None}
+    if missing:
+        cards.update(dict.fromkeys(missing))
+        cards.update(profile_cache.get_or_render(
+            missing, profile_cache_variant('card', request),
+            lambda user_ids: render_user_cards(user_ids, context)
+        ))
+    
+    expanded = context.setdefault('expanded_users', {})
+    missing = wanted[True] - set(expanded) - {None}
+    if missing:
+        expanded.update(dict.fromkeys(missing))
+        expanded.update(profile_cache.get_or_render(
+            missing, profile_cache_variant('full', request),
+            lambda user_ids: render_users(
+                User.objects.filter(id__in=user_ids).select_related('profile').prefetch_related('photos'),
+                context
+            )
+        ))
+
+
+def render_user_cards(user_ids, context):
+    rows = UserCardSerializer.card_rows(user_ids)
+    return {card['id']: card for card in UserCardSerializer(rows, many=True, context=context).data}
+
+
+def render_users(users, context):
+    return {user.id: UserSerializer(user, context=context).data for user in users}
+
+
+class UserCardListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        data = list(data.all() if hasattr(data, 'all') else data)
+        load_user_cards(self.child, data)
+        return super().to_representation(data)
+
+
+def username_for_email(email):
+    """
+    Вход по email, но username уникален и не может оставаться пустым.
+    Email уникален, поэтому помещающийся в поле используется как есть;
+    длинный обрезается, а уникальность сохраняет случайный суффикс.
+    """
+    max_length = User._meta.get_field('username').max_length
+    if len(email) <= max_length:
+        return email
+    suffix = '-' + uuid.uuid4().hex[:12]
+    return email[:max_length - len(suffix)] + suffix
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -45,9 +255,10 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         validated_data.pop('password_confirm')
+        validated_data.setdefault('username', username_for_email(validated_data['email']))
         user = User.objects.create_user(**validated_data)
-        # Создаем профиль пользователя
-        UserProfile.objects.create(user=user)
+        # Профиль пользователя создается в фоне
+        enqueue(create_user_profile, user.id)
         return user
 
 
@@ -55,4 +266,5 @@ class UserUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['first_name', 'last_name', 'age', 'city', 
-                 'hobbies', 'status', 'privacy_settings']
\ No newline at end of file
+                 'hobbies', 'status', 'privacy_settings',
+                 'latitude', 'longitude']
\ No newline at end of file
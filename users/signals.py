@@ -0,0 +1,96 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.celery import enqueue
+from .images import delete_variants
+from .models import User, UserPhoto, UserProfile
+from .pools import candidate_pools
+from .recommendations import mark_stale
+from .profile_cache import profile_cache
+from .search import memory_index, update_search_documents
+from .tags import sync_user_tags
+from .tasks import generate_photo_variants
+
+
+POOL_FIELDS = {'gender', 'age', 'city', 'status', 'is_active'}
+USER_SEARCH_FIELDS = {'hobbies'}
+TAG_FIELDS = {'hobbies'}
+RECOMMENDATION_FIELDS = {'gender', 'age', 'city', 'hobbies', 'status', 'is_active'}
+
+
+@receiver(post_save, sender=User)
+def update_candidate_pools(sender, instance, update_fields=None, **kwargs):
+    # Сохранение last_login при входе и подобные не меняют сегмент
+    if update_fields is not None and not POOL_FIELDS & set(update_fields):
+        return
+    candidate_pools.update(instance)
+
+
+@receiver(post_delete, sender=User)
+def remove_from_candidate_pools(sender, instance, **kwargs):
+    candidate_pools.remove(instance.id)
+
+
+@receiver(post_save, sender=UserPhoto)
+def schedule_photo_variants(sender, instance, created, **kwargs):
+    if created and instance.photo:
+        enqueue(generate_photo_variants, instance.pk)
+
+
+@receiver(post_delete, sender=UserPhoto)
+def delete_photo_variants(sender, instance, **kwargs):
+    # Оригинал удаляет django_cleanup, варианты - мы
+    transaction.on_commit(lambda: delete_variants(instance.variants))
+
+
+def invalidate_profile(user_id):
+    # Сразу - для чтений в этой же транзакции, после коммита - чтобы
+    # параллельный запрос не закэшировал старые данные под новой версией
+    profile_cache.invalidate([user_id])
+    transaction.on_commit(lambda: profile_cache.invalidate([user_id]))
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_profile(sender, instance, update_fields=None, **kwargs):
+    # last_login при входе в профиль не попадает
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    invalidate_profile(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+@receiver([post_save, post_delete], sender=UserPhoto)
+def invalidate_related_profile(sender, instance, **kwargs):
+    invalidate_profile(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def update_user_search_document(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not USER_SEARCH_FIELDS & set(update_fields):
+        return
+    update_search_documents([instance.pk])
+
+
+@receiver(post_save, sender=User)
+def update_user_tags(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not TAG_FIELDS & set(update_fields):
+        return
+    sync_user_tags(instance)
+
+
+@receiver(post_save, sender=User)
+def invalidate_recommendations(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and not RECOMMENDATION_FIELDS & set(update_fields)):
+        return
+    mark_stale([instance.pk])
+
+
+@receiver(post_save, sender=UserProfile)
+def update_profile_search_document(sender, instance, **kwargs):
+    update_search_documents([instance.user_id])
+
+
+@receiver(post_delete, sender=User)
+def remove_from_search_index(sender, instance, **kwargs):
+    memory_index.remove(instance.pk)
@@ -0,0 +1,53 @@
+import re
+
+from django.db import transaction
+
+from .models import Tag, UserTag
+
+
+HOBBY_SEPARATORS = re.compile(r'[,;\n]')
+
+
+def normalize_tag(name):
+    return ' '.join((name or '').replace('ё', 'е').replace('Ё', 'Е').casefold().split())
+
+
+def parse_hobbies(hobbies):
+    """Нормализованное название -> написание, в порядке появления в строке хобби."""
+    tags = {}
+    for name in HOBBY_SEPARATORS.split(hobbies or ''):
+        normalized = normalize_tag(name)[:100]
+        if normalized:
+            tags.setdefault(normalized, ' '.join(name.split())[:100])
+    return tags
+
+
+def get_or_create_tags(names):
+    """{normalized_name: tag_id} для словаря из parse_hobbies, недостающие теги создаются одним запросом."""
+    tag_ids = dict(Tag.objects.filter(normalized_name__in=list(names)).values_list('normalized_name', 'id'))
+    missing = [
+        Tag(name=name, normalized_name=normalized)
+        for normalized, name in names.items()
+        if normalized not in tag_ids
+    ]
+    if missing:
+        # Тот же тег мог параллельно создать другой запрос
+        Tag.objects.bulk_create(missing, ignore_conflicts=True)
+        tag_ids.update(
+            Tag.objects.filter(normalized_name__in=[tag.normalized_name for tag in missing])
+            .values_list('normalized_name', 'id')
+        )
+    return tag_ids
+
+
+def sync_user_tags(user):
+    """Приводит теги пользователя в соответствие строке hobbies и возвращает их id."""
+    tag_ids = set(get_or_create_tags(parse_hobbies(user.hobbies)).values())
+    with transaction.atomic():
+        UserTag.objects.filter(user=user).exclude(tag_id__in=tag_ids).delete()
+        current = set(UserTag.objects.filter(user=user).values_list('tag_id', flat=True))
+        UserTag.objects.bulk_create(
+            [UserTag(user=user, tag_id=tag_id) for tag_id in tag_ids - current],
+            ignore_conflicts=True
+        )
+    return tag_ids
@@ -0,0 +1,37 @@
+from core.celery import RETRY_POLICY, app
+from .counters import flush_likes_counters
+from .images import generate_variants
+from .models import UserPhoto, UserProfile
+from .profile_cache import profile_cache
+
+
+@app.task(**RETRY_POLICY)
+def create_user_profile(user_id):
+    UserProfile.objects.get_or_create(user_id=user_id)
+
+
+@app.task(**RETRY_POLICY)
+def generate_photo_variants(photo_id):
+    photo = UserPhoto.objects.filter(pk=photo_id).first()
+    if photo is None or not photo.photo:
+        return
+    # Повторный запуск перезаписывает те же файлы вариантов
+    try:
+        variants = generate_variants(photo)
+    except OSError:
+        # Файла нет или это не изображение - отдаем оригинал как есть
+        return
+    UserPhoto.objects.filter(pk=photo_id).update(variants=variants)
+    profile_cache.invalidate([photo.user_id])
+
+
+@app.task(**RETRY_POLICY)
+def refill_discovery_deck(viewer_id, filters):
+    from .discovery import DiscoveryDeck
+
+    DiscoveryDeck(viewer_id, filters)._locked_refill()
+
+
+@app.task(**RETRY_POLICY)
+def flush_likes_counters_task():
+    return flush_likes_counters()
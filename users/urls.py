@@ -6,7 +6,12 @@ urlpatterns = [
     path('login/', views.login_view, name='login'),
     path('profile/', views.UserProfileView.as_view(), name='profile'),
     path('users/', views.UserListView.as_view(), name='user-list'),
+    path('users/async/', views.AsyncUserListView.as_view(), name='user-list-async'),
+    path('users/search/', views.UserSearchView.as_view(), name='user-search'),
     path('random-user/', views.RandomUserView.as_view(), name='random-user'),
+    path('random-user/async/', views.AsyncRandomUserView.as_view(), name='random-user-async'),
+    path('recommended/', views.RecommendedUsersView.as_view(), name='recommended-users'),
     path('photos/', views.UserPhotoView.as_view(), name='user-photos'),
     path('photos/<int:pk>/set-main/', views.SetMainPhotoView.as_view(), name='set-main-photo'),
+    path('cities/autocomplete/', views.city_autocomplete_view, name='city-autocomplete'),
 ]
\ No newline at end of file
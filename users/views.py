@@ -2,15 +2,20 @@ from rest_framework import generics, status, permissions
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.parsers import MultiPartParser, FormParser
-from django.db.models import Q
+from asgiref.sync import sync_to_async
 from django.contrib.auth import authenticate
 from rest_framework_simplejwt.tokens import RefreshToken
+from core.async_views import AsyncAPIView, AsyncListAPIView
 from .models import User, UserPhoto
 from .serializers import (
     UserSerializer, UserRegistrationSerializer, 
-    UserUpdateSerializer, UserPhotoSerializer
+    UserUpdateSerializer, UserPhotoSerializer, UserCardSerializer,
+    UserSearchResultSerializer
 )
-from interactions.models import ViewHistory
+from .cities import autocomplete_cities
+from .discovery import DiscoveryDeck, apply_discovery_filters, get_discovery_filters
+from .recommendations import recommendation_setting, recommended_user_ids
+from .search import search_users
 
 
 class UserRegistrationView(generics.CreateAPIView):
@@ -35,75 +40,86 @@ class UserListView(generics.ListAPIView):
         queryset = User.objects.exclude(id=self.request.user.id)
         
         # Фильтрация по параметрам
-        gender = self.request.query_params.get('gender')
-        min_age = self.request.query_params.get('min_age')
-        max_age = self.request.query_params.get('max_age')
-        city = self.request.query_params.get('city')
-        status = self.request.query_params.get('status')
-        
-        if gender:
-            queryset = queryset.filter(gender=gender)
-        if min_age:
-            queryset = queryset.filter(age__gte=min_age)
-        if max_age:
-            queryset = queryset.filter(age__lte=max_age)
-        if city:
-            queryset = queryset.filter(city__icontains=city)
-        if status:
-            queryset = queryset.filter(status=status)
+        filters = get_discovery_filters(self.request.query_params, viewer=self.request.user)
+        queryset = apply_discovery_filters(queryset, filters)
         
         return queryset.select_related('profile').prefetch_related('photos')
 
 
+class UserSearchView(generics.ListAPIView):
+    """
+    Полнотекстовый поиск по хобби, профессии, описанию и целям знакомства.
+    Результаты упорядочены по релевантности и отдаются курсорными страницами.
+    """
+    serializer_class = UserSearchResultSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = ('-rank', '-id')
+    
+    def get_queryset(self):
+        queryset = User.objects.filter(is_active=True).exclude(id=self.request.user.id)
+        results = search_users(self.request.query_params.get('q', ''), queryset)
+        return UserCardSerializer.card_values(results, 'rank')
+
+
 class RandomUserView(generics.RetrieveAPIView):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_object(self):
-        # Получаем пользователей, которых еще не просматривали
-        viewed_users = ViewHistory.objects.filter(
-            viewer=self.request.user
-        ).values_list('viewed_user_id', flat=True)
-        
-        # Фильтруем по параметрам
-        queryset = User.objects.exclude(
-            Q(id=self.request.user.id) | Q(id__in=viewed_users)
-        )
-        
-        # Применяем фильтры из запроса
-        gender = self.request.query_params.get('gender')
-        min_age = self.request.query_params.get('min_age')
-        max_age = self.request.query_params.get('max_age')
-        city = self.request.query_params.get('city')
-        status = self.request.query_params.get('status')
-        
-        if gender:
-            queryset = queryset.filter(gender=gender)
-        if min_age:
-            queryset = queryset.filter(age__gte=min_age)
-        if max_age:
-            queryset = queryset.filter(age__lte=max_age)
-        if city:
-            queryset = queryset.filter(city__icontains=city)
-        if status:
-            queryset = queryset.filter(status=status)
-        
-        random_user = queryset.order_by('?').first()
-        
-        if random_user:
-            # Добавляем в историю просмотров
-            ViewHistory.objects.create(
-                viewer=self.request.user,
-                viewed_user=random_user
-            )
-        
-        return random_user
+        # Берем следующего кандидата из заранее подготовленной колоды,
+        # кандидат сразу попадает в историю просмотров
+        return self.get_deck().pop()
+
+    def get_deck(self):
+        filters = get_discovery_filters(self.request.query_params, viewer=self.request.user)
+        return DiscoveryDeck(self.request.user.id, filters)
+
+
+class AsyncUserListView(AsyncListAPIView):
+    view_class = UserListView
+
+    async def aget_queryset(self, view):
+        # Фильтр по радиусу заранее выбирает id соседей запросом к базе
+        return await sync_to_async(view.get_queryset)()
+
+
+class AsyncRandomUserView(AsyncAPIView):
+    view_class = RandomUserView
+
+    async def aget_data(self, view):
+        user = await view.get_deck().apop()
+        return await sync_to_async(lambda: view.get_serializer(user).data)()
+
+
+class RecommendedUsersView(generics.ListAPIView):
+    """
+    Кандидаты из заранее посчитанного top-N (команда rank_recommendations)
+    в порядке убывания оценки, без уже просмотренных и лайкнутых.
+    Количество - ?limit=, не больше TOP_N.
+    """
+    serializer_class = UserCardSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None
+    
+    def get_queryset(self):
+        try:
+            limit = int(self.request.query_params.get('limit', 20))
+        except ValueError:
+            limit = 20
+        limit = min(max(limit, 1), recommendation_setting('TOP_N'))
+        candidate_ids = recommended_user_ids(self.request.user, limit)
+        rows = {
+            row['id']: row
+            for row in UserCardSerializer.card_values(User.objects.filter(id__in=candidate_ids, is_active=True))
+        }
+        return [rows[user_id] for user_id in candidate_ids if user_id in rows]
 
 
 class UserPhotoView(generics.ListCreateAPIView):
     serializer_class = UserPhotoSerializer
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
+    keyset_ordering = ('-uploaded_at', '-id')
     
     def get_queryset(self):
         return UserPhoto.objects.filter(user=self.request.user)
@@ -145,4 +161,11 @@ def login_view(request):
     return Response(
         {'error': 'Invalid credentials'}, 
         status=status.HTTP_401_UNAUTHORIZED
-    )
\ No newline at end of file
+    )
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def city_autocomplete_view(request):
+    # Подсказки городов по справочнику; доступны и при регистрации
+    return Response(autocomplete_cities(request.query_params.get('q', '')))